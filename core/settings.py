@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 
 from pathlib import Path
 
+from core.database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,10 +42,12 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
-    'users',
+    'users.apps.UserConfig',
 ]
 
 MIDDLEWARE = [
+    'users.middleware.MetricsMiddleware',
+    'users.middleware.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,18 +80,56 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
+# Configured from DATABASE_* environment variables, see core/database.py.
+# Without DATABASE_URL a local SQLite file in WAL mode is used.
+
+DATABASES = database_settings(BASE_DIR)
+
+DATABASE_ROUTERS = ['users.replicas.ReplicaRouter']
 
-DATABASES = {
+# Aliases the read-only views may read from.
+USERS_DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# After a write, the client keeps reading from the primary for this many
+# seconds. The pin is also stored in this CACHES alias, which should be
+# shared by every worker.
+USERS_DATABASE_PIN_SECONDS = 5
+USERS_DATABASE_PIN_CACHE_ALIAS = 'default'
+
+# 'default' is local to each process. 'shared' lives in the database, so
+# every worker sees it, create its table with manage.py createcachetable.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'users_cache',
+    },
 }
 
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
+PASSWORD_HASHERS = [
+    'users.hashing.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# Cost of the PBKDF2 hasher, passwords hashed with another value are
+# rehashed after the next successful login.
+USERS_PBKDF2_ITERATIONS = 216000
+
+# Threads that hash passwords for async views and background rehashes.
+USERS_PASSWORD_HASH_WORKERS = 4
+
+# Rehash outdated passwords on the pool instead of before the login
+# response is sent.
+USERS_PASSWORD_REHASH_IN_BACKGROUND = True
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -103,12 +145,160 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# JSON is encoded and decoded with orjson when it is installed, see
+# users.api.encoding. The browsable API is only offered while debugging.
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.api.authentication.ExpiringTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'users.api.renderers.FastJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'users.api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# Token authentication cache
+# Authenticated tokens are kept in an in-process LRU of this many entries
+# for USERS_TOKEN_CACHE_LOCAL_TTL seconds, the longest a revoked token
+# keeps working on the other workers.
+USERS_TOKEN_CACHE_SIZE = 10000
+USERS_TOKEN_CACHE_LOCAL_TTL = 5
+
+# Optional alias from CACHES shared by every worker, where the tokens are
+# kept for USERS_TOKEN_CACHE_TTL seconds and revoked by bumping a version
+# of their user.
+USERS_TOKEN_CACHE_ALIAS = None
+USERS_TOKEN_CACHE_TTL = 300
+
+# Bulk user import
+# Rows are validated, hashed and inserted in chunks of this size.
+USERS_BULK_IMPORT_BATCH_SIZE = 500
+
+# Processes used to hash the passwords of each chunk, 0 hashes them
+# on the request thread.
+USERS_BULK_IMPORT_HASH_WORKERS = 4
+
+# User directory
+# Default and maximum number of users in a page of GET /users/.
+USERS_DIRECTORY_PAGE_SIZE = 50
+USERS_DIRECTORY_MAX_PAGE_SIZE = 500
+
+# User export
+# Rows fetched from the database and written to the response at a time.
+USERS_EXPORT_CHUNK_SIZE = 2000
+
+# Async views
+# Threads the async views run their queries on, 0 uses the
+# thread-sensitive executor shared with sync code.
+USERS_ASYNC_DB_WORKERS = 8
+
+# Department catalog
+# Optional alias from CACHES holding the catalog version, so a change
+# made by one worker is seen by all of them. Without it each worker
+# rebuilds its list once it is USERS_DEPARTMENT_CACHE_LOCAL_TTL seconds old.
+USERS_DEPARTMENT_CACHE_ALIAS = None
+USERS_DEPARTMENT_CACHE_LOCAL_TTL = 5
+
+# Department deletion
+# Members of a deleted department are removed this many per transaction,
+# on the request or, with ?background=true, by an in-process job.
+USERS_DEPARTMENT_DELETE_BATCH_SIZE = 1000
+
+# User deletion
+# DELETE /users/<pk>/delete/ only deactivates the user, purge_users deletes
+# the users deleted at least USERS_PURGE_AFTER_DAYS ago, this many per
+# transaction.
+USERS_PURGE_AFTER_DAYS = 30
+USERS_PURGE_BATCH_SIZE = 1000
+
+# API tokens
+# Tokens issued at login expire USERS_TOKEN_TTL seconds after their last
+# use. sweep_tokens deletes the expired ones this many per transaction.
+USERS_TOKEN_TTL = 14 * 24 * 3600
+USERS_TOKEN_SWEEP_BATCH_SIZE = 1000
+
+# Login and password change limits
+# Requests allowed per sliding window, as '<count>/<window>' where the
+# window is s, m, h or d with an optional multiplier ('5/15m'). A scope set
+# to None is not limited. Counters are kept in this process, at most
+# USERS_THROTTLE_MAX_KEYS of them, unless USERS_THROTTLE_CACHE_ALIAS names
+# an alias from CACHES shared by every worker.
+USERS_THROTTLE_RATES = {
+    'login_ip': '30/m',
+    'login_email': '10/15m',
+    'password_change_ip': '30/m',
+    'password_change_user': '5/15m',
+}
+USERS_THROTTLE_CACHE_ALIAS = None
+USERS_THROTTLE_MAX_KEYS = 100000
+
+# User search
+# 'memory' searches a trigram index of the users held by each process,
+# read again once older than USERS_SEARCH_INDEX_MAX_AGE seconds. On SQLite
+# 'fts5' searches a full text table kept up to date by triggers instead.
+# Users match with at least USERS_SEARCH_MIN_SIMILARITY of the trigrams
+# of the query.
+USERS_SEARCH_BACKEND = 'memory'
+USERS_SEARCH_INDEX_MAX_AGE = 300
+USERS_SEARCH_MIN_SIMILARITY = 0.6
+USERS_SEARCH_MAX_RESULTS = 50
+
+# Audit log
+# Events are written once USERS_AUDIT_BATCH_SIZE of them wait or every
+# USERS_AUDIT_FLUSH_INTERVAL seconds, at most USERS_AUDIT_BUFFER_SIZE wait
+# in memory. With USERS_AUDIT_SPOOL_DIR set they are also appended to a
+# file there until written, see manage.py replay_audit_spool.
+USERS_AUDIT_BATCH_SIZE = 500
+USERS_AUDIT_FLUSH_INTERVAL = 1.0
+USERS_AUDIT_BUFFER_SIZE = 10000
+USERS_AUDIT_SPOOL_DIR = None
+
+# Admin
+# Unfiltered user lists larger than this many rows show the database's
+# estimated count instead of an exact one (PostgreSQL and MySQL).
+USERS_ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Registration idempotency
+# Alias from CACHES remembering the responses of POST /users/create sent
+# with an Idempotency-Key header, and for how many seconds. It must be
+# shared by every worker, or a retry reaching another worker runs again,
+# so a per-process cache such as LocMemCache fails the system checks.
+USERS_IDEMPOTENCY_CACHE_ALIAS = 'shared'
+USERS_IDEMPOTENCY_TTL = 86400
+
+# Request metrics
+# Fraction of the requests measured by MetricsMiddleware, from 0 to 1.
+USERS_METRICS_SAMPLE_RATE = 1.0
+
+# Also log each sampled request as a JSON line on the
+# users.metrics.requests logger, see manage.py metrics_report.
+USERS_METRICS_JSON_LOG = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'metrics': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'users.metrics.requests': {
+            'handlers': ['metrics'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 
@@ -2,15 +2,25 @@ from django.contrib import admin
 from django.urls import path, include
 from users.api.viewsets import UsersViewSet
 from users.api.viewsets import CreateProfile
+from users.api.viewsets import BulkCreateProfile
+from users.api.viewsets import UserExport
+from users.api.viewsets import UserSearch
 from users.api.viewsets import DepartmentsViewSet
 from users.api.viewsets import ReadProfileList
 from users.api.viewsets import ReadProfileDetail
+from users.api.viewsets import RetrieveProfile
+from users.api.viewsets import RetrieveProfileDetail
 from users.api.viewsets import UserUpdateProfile
 from users.api.viewsets import UserChangePassword
 from users.api.viewsets import UserDeleteProfile
+from users.api.viewsets import DepartmentUsers
 from users.api.viewsets import DepartmentDeleteProfile
+from users.api.viewsets import DepartmentDeletionJobDetail
+from users.api.viewsets import Metrics
+from users.api.viewsets import AuditEventList
+from users.api.viewsets import ObtainToken
+from users.api import async_views
 from rest_framework import routers
-from rest_framework.authtoken import views
 
 router = routers.DefaultRouter()
 router.register('users', UsersViewSet, basename='Users')
@@ -18,13 +28,26 @@ router.register('departments', DepartmentsViewSet, basename='Departments')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('users/export/', UserExport.as_view()),
+    path('users/search/', UserSearch.as_view()),
     path('', include(router.urls) ),
     path('users/create', CreateProfile.as_view()),
+    path('users/bulk_create', BulkCreateProfile.as_view()),
     path('users/<int:pk>/profile/', ReadProfileList.as_view()),
     path('users/<int:pk>/detail/', ReadProfileDetail.as_view()),
+    path('profiles/<int:pk>/', RetrieveProfile.as_view()),
+    path('profiles/<int:pk>/detail/', RetrieveProfileDetail.as_view()),
     path('users/<int:pk>/update/', UserUpdateProfile.as_view()),
     path('users/<int:pk>/change_password/', UserChangePassword.as_view()),
     path('users/<int:pk>/delete/', UserDeleteProfile.as_view()),
+    path('departments/<int:pk>/users/', DepartmentUsers.as_view()),
     path('departments/<int:pk>/delete/', DepartmentDeleteProfile.as_view()),
-    path('api-token-auth/', views.obtain_auth_token)
+    path('departments/jobs/<int:pk>/', DepartmentDeletionJobDetail.as_view()),
+    path('api-token-auth/', ObtainToken.as_view()),
+    path('metrics/', Metrics.as_view()),
+    path('audit/events/', AuditEventList.as_view()),
+    path('async/profiles/<int:pk>/', async_views.read_profile),
+    path('async/profiles/<int:pk>/detail/', async_views.read_profile_detail),
+    path('async/departments/', async_views.list_departments),
+    path('async/api-token-auth/', async_views.obtain_auth_token),
 ]
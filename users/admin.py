@@ -1,18 +1,71 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 
 from users.forms import UserCreationForm, UserChangeForm
-from users.models import User
+from users.lifecycle import update_users
+from users.models import AuditEvent, AuthToken, Department, DepartmentDeletionJob, User
+
+ESTIMATE_QUERIES = {
+    'postgresql': 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+    'mysql': ('SELECT table_rows FROM information_schema.tables '
+              'WHERE table_schema = DATABASE() AND table_name = %s'),
+}
+
+
+def estimated_count(model, using):
+    """The planner's estimate of the rows of a table, None when the
+    database has none."""
+    connection = connections[using]
+    sql = ESTIMATE_QUERIES.get(connection.vendor)
+    if sql is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [model._meta.db_table])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts an unfiltered changelist from the table statistics once the
+    table is larger than USERS_ADMIN_EXACT_COUNT_LIMIT rows, instead of
+    scanning it on every page load. Filtered changelists are counted
+    exactly."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > getattr(settings, 'USERS_ADMIN_EXACT_COUNT_LIMIT', 10000):
+                return estimate
+        return super().count
+
+
+class UserActionForm(ActionForm):
+    department = forms.ModelChoiceField(
+        queryset=Department.objects.order_by('department'), required=False,
+        help_text='Department to move the selected users to.')
 
 
 class UserAdmin(UserAdmin):
     add_form = UserCreationForm
     form = UserChangeForm
     model = User
-    list_display = ('email', 'is_staff', 'is_active',)
-    list_filter = ('email', 'is_staff', 'is_active',)
+    list_display = ('email', 'full_name', 'department', 'is_staff', 'is_active',)
+    list_filter = ('is_staff', 'is_active', 'department',)
+    list_select_related = ('department',)
+    autocomplete_fields = ('department',)
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
+        ('Profile', {'fields': ('full_name', 'department')}),
         ('Permissions', {'fields': ('is_staff', 'is_active')}),
     )
     add_fieldsets = (
@@ -21,8 +74,90 @@ class UserAdmin(UserAdmin):
             'fields': ('email', 'password1', 'password2', 'is_staff', 'is_active')}
         ),
     )
-    search_fields = ('email',)
+    # Prefix matches, see get_search_results
+    search_fields = ('email', 'full_name',)
     ordering = ('email',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = UserActionForm
+    actions = ('activate_users', 'deactivate_users', 'move_to_department',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Matches the emails and names starting with the search term,
+        ignoring case like the default search, rather than scanning the
+        table for a substring. The expression indexes of migration 0010
+        serve it on SQLite and PostgreSQL."""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return queryset.filter(Q(email__istartswith=term) | Q(full_name__istartswith=term)), False
+
+    def activate_users(self, request, queryset):
+        updated = update_users(queryset.filter(is_active=False), is_active=True, deleted_at=None)
+        self.message_user(request, '%d users activated.' % updated, messages.SUCCESS)
+    activate_users.short_description = 'Activate selected users'
+
+    def deactivate_users(self, request, queryset):
+        updated = update_users(queryset.filter(is_active=True), is_active=False)
+        self.message_user(request, '%d users deactivated.' % updated, messages.SUCCESS)
+    deactivate_users.short_description = 'Deactivate selected users'
+
+    def move_to_department(self, request, queryset):
+        try:
+            department = self.action_form.base_fields['department'].clean(request.POST.get('department'))
+        except ValidationError:
+            department = None
+        if department is None:
+            self.message_user(request, 'Choose the department to move the users to.', messages.ERROR)
+            return
+        updated = update_users(queryset.exclude(department=department), department_id=department.pk)
+        self.message_user(request, '%d users moved to %s.' % (updated, department), messages.SUCCESS)
+    move_to_department.short_description = 'Move selected users to the department'
+
+
+class DepartmentAdmin(admin.ModelAdmin):
+    list_display = ('department', 'member_count',)
+    search_fields = ('department',)
+    ordering = ('department',)
+
+
+class DepartmentDeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('department_name', 'status', 'deleted', 'total', 'created_at', 'finished_at',)
+    list_filter = ('status',)
+    readonly_fields = ('department_id', 'department_name', 'status', 'total', 'deleted',
+                       'error', 'created_at', 'started_at', 'finished_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+class AuthTokenAdmin(admin.ModelAdmin):
+    list_display = ('key', 'user', 'created', 'expires_at',)
+    readonly_fields = ('key', 'user', 'created', 'expires_at',)
+    search_fields = ('user__email',)
+    ordering = ('-created',)
+
+    def has_add_permission(self, request):
+        return False
+
+
+class AuditEventAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'action', 'actor_id', 'target_type', 'target_id',)
+    list_filter = ('action', 'target_type',)
+    readonly_fields = ('event_id', 'actor_id', 'action', 'target_type', 'target_id', 'data', 'created_at',)
+    ordering = ('-created_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 admin.site.register(User, UserAdmin)
+admin.site.register(Department, DepartmentAdmin)
+admin.site.register(DepartmentDeletionJob, DepartmentDeletionJobAdmin)
+admin.site.register(AuditEvent, AuditEventAdmin)
+admin.site.register(AuthToken, AuthTokenAdmin)
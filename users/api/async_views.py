@@ -0,0 +1,225 @@
+"""ASGI-native versions of the hot read endpoints and of token login.
+
+Django 3.1 has no async ORM, so database work runs on a dedicated,
+bounded thread pool (USERS_ASYNC_DB_WORKERS) instead of the single
+thread-sensitive executor sync views share. Password checks go through
+the hashing pool, and a cached token never touches the database at all.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework import exceptions
+from users.hashing import check_password_async, make_password_async
+from users.models import User
+from users.replicas import replica_reads
+from users.tokens import is_expired, issue_token, needs_extension
+
+from .authentication import ExpiringTokenAuthentication, token_cache
+from .catalog import department_catalog
+from .parsers import FastJSONParser
+from .plans import plan_for
+from .renderers import FastJSONRenderer
+from .serializers import ProfileDetailSerializer, ProfileListSerializer
+from .throttling import login_wait
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    """Returns the thread pool async views run their queries on.
+
+    Returns:
+        ThreadPoolExecutor: The pool, or None when USERS_ASYNC_DB_WORKERS
+        is 0 and queries go through the thread-sensitive executor
+    """
+    global _db_pool
+    workers = getattr(settings, 'USERS_ASYNC_DB_WORKERS', 8)
+    if not workers:
+        return None
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='async-db')
+    return _db_pool
+
+
+def _run_on_db_thread(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args, **kwargs):
+    """Runs a function that uses the ORM without blocking the event loop."""
+    pool = get_db_pool()
+    if pool is None:
+        return await sync_to_async(func)(*args, **kwargs)
+
+    # The pool thread runs in a copy of the caller's context, so it sees
+    # replica_reads() and the request's write tracking.
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        pool, functools.partial(context.run, _run_on_db_thread, func, *args, **kwargs))
+
+
+def render(data, status=200, headers=None):
+    response = HttpResponse(
+        FastJSONRenderer().render(data), status=status, content_type='application/json')
+    for header, value in (headers or {}).items():
+        response[header] = value
+    return response
+
+
+def error(exc):
+    """Renders an APIException the way DRF's exception handler does."""
+    headers = {}
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        headers['WWW-Authenticate'] = ExpiringTokenAuthentication.keyword
+    if isinstance(exc, exceptions.Throttled) and exc.wait is not None:
+        headers['Retry-After'] = '%d' % exc.wait
+    return render({'detail': exc.detail}, status=exc.status_code, headers=headers)
+
+
+async def authenticate(request):
+    """Authenticates the Authorization: Token <key> header.
+
+    Returns:
+        User: The authenticated user
+
+    Raises:
+        NotAuthenticated: When no token was sent
+        AuthenticationFailed: When the token is invalid, expired or its user inactive
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '').split()
+    keyword = ExpiringTokenAuthentication.keyword
+    if not header or header[0].lower() != keyword.lower():
+        raise exceptions.NotAuthenticated()
+    if len(header) != 2:
+        raise exceptions.AuthenticationFailed('Invalid token header.')
+
+    key = header[1]
+    pair = token_cache.get(key)
+    if pair is None or is_expired(pair[1]) or needs_extension(pair[1]):
+        pair = await run_db(ExpiringTokenAuthentication().authenticate_credentials, key)
+    return pair[0]
+
+
+def _serialize_profile(serializer_class, pk):
+    data = plan_for(serializer_class).serialize(User.objects.filter(pk=pk))
+    return data[0] if data else None
+
+
+async def _read_profile(request, pk, serializer_class):
+    if request.method != 'GET':
+        return render({'detail': 'Method "%s" not allowed.' % request.method}, status=405)
+    with replica_reads():
+        try:
+            await authenticate(request)
+        except exceptions.APIException as exc:
+            return error(exc)
+        data = await run_db(_serialize_profile, serializer_class, pk)
+    if data is None:
+        return render({'detail': 'Not found.'}, status=404)
+    return render(data)
+
+
+async def read_profile(request, pk):
+    """ Displaying only full name, and profile identifier """
+    return await _read_profile(request, pk, ProfileListSerializer)
+
+
+async def read_profile_detail(request, pk):
+    """ Displaying all info about an user """
+    return await _read_profile(request, pk, ProfileDetailSerializer)
+
+
+async def list_departments(request):
+    """ Displaying all departments, staff members only """
+    if request.method != 'GET':
+        return render({'detail': 'Method "%s" not allowed.' % request.method}, status=405)
+    try:
+        with replica_reads():
+            user = await authenticate(request)
+    except exceptions.APIException as exc:
+        return error(exc)
+    if not user.is_staff:
+        return error(exceptions.PermissionDenied())
+
+    snapshot = await run_db(department_catalog.get)
+    if snapshot.etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.payload, content_type='application/json')
+    response['ETag'] = snapshot.etag
+    return response
+
+
+def _parse_credentials(request):
+    if request.content_type == 'application/json':
+        return FastJSONParser().parse(request)
+    return request.POST
+
+
+def _get_login_user(email):
+    return User.objects.filter(email=email).first()
+
+
+async def obtain_auth_token(request):
+    """Issues a new expiring token, like the api-token-auth view.
+
+    The password is checked on the hashing pool so the event loop keeps
+    serving other clients meanwhile, once the login limits let it through.
+    """
+    if request.method != 'POST':
+        return render({'detail': 'Method "%s" not allowed.' % request.method}, status=405)
+    try:
+        data = _parse_credentials(request)
+    except exceptions.ParseError as exc:
+        return error(exc)
+    if not isinstance(data, dict):
+        return render({'non_field_errors': [
+            'Invalid data. Expected a dictionary, but got %s.' % type(data).__name__]}, status=400)
+
+    username = data.get('username')
+    password = data.get('password')
+    errors = {}
+    for field, value in (('username', username), ('password', password)):
+        if not value:
+            errors[field] = ['This field is required.']
+    if errors:
+        return render(errors, status=400)
+
+    wait = await run_db(login_wait, request, username)
+    if wait is not None:
+        return error(exceptions.Throttled(wait))
+
+    user = await run_db(_get_login_user, username)
+    if user is None:
+        # Spend the same time as a wrong password so emails can't be probed.
+        await make_password_async(password)
+        valid = False
+    else:
+        valid = await check_password_async(user, password) and user.is_active
+
+    if not valid:
+        return render(
+            {'non_field_errors': ['Unable to log in with provided credentials.']}, status=400)
+
+    token = await run_db(issue_token, user)
+    return render({'token': token.key})
+
+
+# csrf_exempt would wrap the coroutine in a sync function on Django 3.1
+obtain_auth_token.csrf_exempt = True
@@ -0,0 +1,210 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from users import tokens
+from users.models import AuthToken
+
+CACHE_KEY_PREFIX = 'users:auth:token:'
+VERSION_KEY_PREFIX = 'users:auth:version:'
+
+
+class TokenCache:
+    """Two level cache of authenticated (user, token) pairs.
+
+    The first level is an in-process LRU bounded by USERS_TOKEN_CACHE_SIZE.
+    Other workers can't evict it, so its entries live for at most
+    USERS_TOKEN_CACHE_LOCAL_TTL seconds, the longest revoked credentials
+    keep working on another worker.
+
+    When USERS_TOKEN_CACHE_ALIAS names a Django cache, it is used as a
+    second level shared by every worker. Its entries carry the version of
+    their user at the time they were cached; invalidate_user bumps that
+    version atomically, which retires every entry of the user at once.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'USERS_TOKEN_CACHE_TTL', 300)
+
+    @property
+    def local_ttl(self):
+        return min(self.ttl, getattr(settings, 'USERS_TOKEN_CACHE_LOCAL_TTL', 5))
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'USERS_TOKEN_CACHE_SIZE', 10000)
+
+    @property
+    def shared(self):
+        alias = getattr(settings, 'USERS_TOKEN_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        """Looks a token key up.
+
+        Args:
+            key (str): The token key sent by the client
+
+        Returns:
+            tuple: A (user, token) pair, or None on a miss or an expired entry
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, user, token = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return copy.copy(user), token
+                self._discard(key)
+
+        shared = self.shared
+        if shared is None:
+            return None
+        entry = shared.get(CACHE_KEY_PREFIX + key)
+        if entry is None:
+            return None
+        user, token, version = entry
+        if version != shared.get(VERSION_KEY_PREFIX + str(user.pk)):
+            return None
+        self._store_local(key, user, token)
+        return copy.copy(user), token
+
+    def set(self, key, user, token):
+        """Caches the result of a successful authentication."""
+        self._store_local(key, user, token)
+
+        shared = self.shared
+        if shared is not None:
+            version = shared.get(VERSION_KEY_PREFIX + str(user.pk))
+            shared.set(CACHE_KEY_PREFIX + key, (user, token, version), self.ttl)
+
+    def invalidate(self, key):
+        """Forgets a single token, e.g. after it is deleted."""
+        with self._lock:
+            self._discard(key)
+        shared = self.shared
+        if shared is not None:
+            shared.delete(CACHE_KEY_PREFIX + key)
+
+    def invalidate_user(self, user_pk):
+        """Forgets every token of a user, e.g. after a password change
+        or a deactivation."""
+        with self._lock:
+            for key in list(self._user_keys.get(user_pk, ())):
+                self._discard(key)
+
+        shared = self.shared
+        if shared is None:
+            return
+        version_key = VERSION_KEY_PREFIX + str(user_pk)
+        try:
+            shared.incr(version_key)
+        except ValueError:
+            # First invalidation, or the version was evicted. A new start
+            # from the clock never matches the version of an older entry.
+            if not shared.add(version_key, time.time_ns(), None):
+                shared.incr(version_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _store_local(self, key, user, token):
+        expires = time.monotonic() + self.local_ttl
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (expires, user, token)
+            self._user_keys.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_pk = entry[1].pk
+        keys = self._user_keys.get(user_pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_pk]
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that skips the Token + User query for
+    recently seen keys.
+
+    Entries are dropped when the token is deleted or its user is saved,
+    which covers deactivation and password changes (see users.signals).
+    Tokens of inactive users are filtered out by the query itself.
+
+    Tokens are always read from the primary, even inside replica_reads():
+    a lagging replica would refuse a token just issued or rotated and
+    accept one just revoked.
+    """
+
+    def authenticate_credentials(self, key):
+        pair = token_cache.get(key)
+        if pair is not None:
+            return pair
+
+        model = self.get_model()
+        try:
+            token = model.objects.using(DEFAULT_DB_ALIAS).select_related('user').get(
+                key=key, user__is_active=True)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        token_cache.set(key, token.user, token)
+        return (token.user, token)
+
+
+class ExpiringTokenAuthentication(CachedTokenAuthentication):
+    """Authenticates the expiring tokens of users.tokens, falling back to
+    the tokens of rest_framework.authtoken.
+
+    Cached entries are checked for expiry too, and a token in use has its
+    expiry pushed back (see users.tokens.extend_token).
+    """
+
+    def authenticate_credentials(self, key):
+        if len(key) != AuthToken.KEY_LENGTH:
+            return super().authenticate_credentials(key)
+
+        pair = token_cache.get(key)
+        if pair is None:
+            try:
+                token = AuthToken.objects.using(DEFAULT_DB_ALIAS).select_related('user').get(
+                    key=key, user__is_active=True)
+            except AuthToken.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            pair = (token.user, token)
+            token_cache.set(key, *pair)
+
+        user, token = pair
+        now = timezone.now()
+        if tokens.is_expired(token, now):
+            token_cache.invalidate(key)
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        if tokens.extend_token(token, now):
+            token_cache.set(key, user, token)
+        return pair
@@ -0,0 +1,196 @@
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ParseError
+from users import audit
+from users.departments import add_members
+from users.hashing import get_process_pool, hash_passwords
+from users.models import Department, User
+from users.search import user_index
+
+from .serializers import UserSerializer
+from .validators import EMAIL_MESSAGE, email_validator
+
+
+class BulkImportReport:
+    """ Collects the outcome of a bulk import, row by row """
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, row, errors):
+        self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+
+class BulkUserImporter:
+    """Validates, hashes and inserts users in chunks.
+
+    Every chunk goes through UserSerializer.validate_batch and the email
+    validator column by column, while the field checks that would cost one
+    query per row (department lookup and email uniqueness) are resolved
+    once per chunk. A bad row is reported and skipped, it never aborts the
+    rest of the batch. Each created user is audited as a registration by
+    actor, in the transaction that inserts him.
+    """
+
+    def __init__(self, batch_size=None, hash_workers=None, actor=None):
+        if batch_size is None:
+            batch_size = getattr(settings, 'USERS_BULK_IMPORT_BATCH_SIZE', 500)
+        if hash_workers is None:
+            hash_workers = getattr(settings, 'USERS_BULK_IMPORT_HASH_WORKERS', 0)
+        self.batch_size = max(1, int(batch_size))
+        self.hash_workers = hash_workers
+        self.actor = actor
+        self.executor = get_process_pool(hash_workers)
+        self.departments = {}
+        self.seen_emails = set()
+
+    def run(self, rows):
+        """Imports every row.
+
+        Args:
+            rows (iterable): dicts with full_name, email, password and department
+
+        Returns:
+            BulkImportReport: Count of created users and the errors of each row
+        """
+        report = BulkImportReport()
+        numbered = enumerate(rows, start=1)
+        while True:
+            chunk = list(islice(numbered, self.batch_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk, report)
+        return report
+
+    def _import_chunk(self, chunk, report):
+        rows = []
+        for number, row in chunk:
+            if isinstance(row, ParseError):
+                report.add_error(number, {'non_field_errors': [str(row.detail)]})
+            elif not isinstance(row, dict):
+                report.add_error(number, {'non_field_errors': ['Each row must be an object.']})
+            else:
+                rows.append((number, row))
+
+        self._resolve_departments(row for number, row in rows)
+        emails = [User.objects.normalize_email(row['email']) if isinstance(row.get('email'), str) else ''
+                  for number, row in rows]
+        valid_emails = email_validator.validate_many(emails)
+        taken = set(User.all_objects.filter(email__in=emails).values_list('email', flat=True))
+
+        checked = []
+        for (number, row), email, email_ok in zip(rows, emails, valid_emails):
+            checked.append((number, email, row, self._validate_row(row, email, email_ok, taken)))
+        rule_errors = iter(UserSerializer.validate_batch(
+            [self._rule_data(row) for number, email, row, errors in checked if not errors]))
+
+        pending = []
+        for number, email, row, errors in checked:
+            if not errors:
+                errors = next(rule_errors)
+            if errors:
+                report.add_error(number, errors)
+                continue
+            self.seen_emails.add(email)
+            pending.append((number, email, row))
+
+        if not pending:
+            return
+        passwords = hash_passwords(
+            [row['password'] for number, email, row in pending], self.executor, self.hash_workers)
+        users = [
+            User(email=email,
+                 full_name=row['full_name'],
+                 department=self.departments[self._department_id(row)],
+                 password=password)
+            for (number, email, row), password in zip(pending, passwords)]
+        self._insert(pending, users, report)
+
+    def _resolve_departments(self, rows):
+        wanted = {self._department_id(row) for row in rows} - set(self.departments)
+        wanted.discard(None)
+        if wanted:
+            self.departments.update(Department.objects.in_bulk(wanted))
+
+    @staticmethod
+    def _department_id(row):
+        try:
+            return int(row.get('department'))
+        except (TypeError, ValueError):
+            return None
+
+    def _validate_row(self, row, email, email_ok, taken):
+        errors = {}
+        for field in ('full_name', 'email', 'password'):
+            if not row.get(field):
+                errors[field] = ['This field is required.']
+            elif not isinstance(row[field], str):
+                errors[field] = ['Not a valid string.']
+        if errors:
+            return errors
+
+        if len(row['full_name']) > User._meta.get_field('full_name').max_length:
+            errors['full_name'] = ['Ensure this field has no more than 60 characters.']
+        if not email_ok:
+            errors['email'] = [EMAIL_MESSAGE]
+        elif email in taken or email in self.seen_emails:
+            errors['email'] = ['user with this email already exists.']
+
+        department_id = self._department_id(row)
+        if row.get('department') not in (None, '') and department_id not in self.departments:
+            errors['department'] = ['Invalid pk "%s" - object does not exist.' % row['department']]
+        return errors or None
+
+    def _rule_data(self, row):
+        data = {'full_name': row['full_name'], 'password': row['password']}
+        department_id = self._department_id(row)
+        if department_id is not None:
+            data['department'] = self.departments[department_id]
+        return data
+
+    def _record(self, users):
+        if any(user.pk is None for user in users):
+            # The primary keys aren't set on every database
+            pks = dict(User.all_objects.filter(email__in=[user.email for user in users])
+                       .values_list('email', 'pk'))
+            for user in users:
+                user.pk = pks[user.email]
+        for user in users:
+            audit.record(self.actor, 'user.create', 'user', user.pk)
+
+    def _insert(self, pending, users, report):
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users, batch_size=self.batch_size)
+                # bulk_create sends no post_save, count the new members here
+                for department_id, count in Counter(user.department_id for user in users).items():
+                    add_members(department_id, count)
+                self._record(users)
+            # The primary keys aren't set on every database
+            user_index.refresh([user.email for user in users], field='email')
+            report.created += len(users)
+            return
+        except IntegrityError:
+            pass
+
+        # Another writer took one of the emails after the chunk was checked,
+        # fall back to row by row inserts to find out which.
+        for (number, email, row), user in zip(pending, users):
+            try:
+                with transaction.atomic():
+                    user.save(force_insert=True)
+                    self._record([user])
+                report.created += 1
+            except IntegrityError:
+                report.add_error(number, {'email': ['user with this email already exists.']})
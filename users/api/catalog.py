@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from users.models import Department
+
+from .plans import plan_for
+from .renderers import FastJSONRenderer
+from .serializers import DepartmentSerializer
+
+VERSION_KEY = 'users:departments:version'
+
+Snapshot = namedtuple('Snapshot', ['version', 'data', 'payload', 'etag', 'built_at'])
+
+
+class DepartmentCatalog:
+    """Versioned cache of the serialized department list.
+
+    The list is serialized and rendered once per version. Writes bump the
+    version, locally and, when USERS_DEPARTMENT_CACHE_ALIAS names a Django
+    cache, in that cache too so every worker rebuilds its snapshot.
+
+    Without that cache other workers never see the local bumps, so their
+    snapshots are rebuilt once older than USERS_DEPARTMENT_CACHE_LOCAL_TTL
+    seconds, the longest a change takes to reach every worker.
+    """
+
+    def __init__(self):
+        self._local_version = 1
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        alias = getattr(settings, 'USERS_DEPARTMENT_CACHE_ALIAS', None)
+        return caches[alias] if alias else None
+
+    def version(self):
+        shared = self.shared
+        if shared is None:
+            return self._local_version
+
+        version = shared.get(VERSION_KEY)
+        if version is None:
+            shared.add(VERSION_KEY, 1, None)
+            version = shared.get(VERSION_KEY, 1)
+        return version
+
+    def _current(self, snapshot, version):
+        if snapshot is None or snapshot.version != version:
+            return False
+        if self.shared is not None:
+            return True
+        max_age = getattr(settings, 'USERS_DEPARTMENT_CACHE_LOCAL_TTL', 5)
+        return time.monotonic() - snapshot.built_at < max_age
+
+    def get(self):
+        """Returns the current snapshot, building it if the version moved
+        or, without a shared cache, once it is too old.
+
+        Returns:
+            Snapshot: Serialized data, rendered JSON payload and its ETag
+        """
+        version = self.version()
+        snapshot = self._snapshot
+        if self._current(snapshot, version):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if self._current(snapshot, version):
+                return snapshot
+
+            # Built from the primary, a lagging replica would keep serving
+            # a stale list until the next write.
+            departments = Department.objects.using(DEFAULT_DB_ALIAS)
+            data = plan_for(DepartmentSerializer).serialize(departments)
+            payload = FastJSONRenderer().render(data)
+            etag = '"%s"' % hashlib.md5(payload).hexdigest()
+            self._snapshot = Snapshot(version, data, payload, etag, time.monotonic())
+            return self._snapshot
+
+    def invalidate(self):
+        """Moves to a new version right away and again once the current
+        transaction commits, so a snapshot built from rows that were not
+        committed yet never outlives the write."""
+        self._bump()
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        with self._lock:
+            self._local_version += 1
+            self._snapshot = None
+
+        shared = self.shared
+        if shared is not None:
+            try:
+                shared.incr(VERSION_KEY)
+            except ValueError:
+                shared.add(VERSION_KEY, 2, None)
+
+
+department_catalog = DepartmentCatalog()
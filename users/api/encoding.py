@@ -0,0 +1,100 @@
+"""JSON encoding of the API, with orjson when it is installed.
+
+dumps writes the same JSON as rest_framework's JSONRenderer with the
+default settings: compact, UTF-8, U+2028 and U+2029 escaped, and dates,
+decimals, lazy strings and querysets encoded by DRF's JSONEncoder. orjson
+calls back into that encoder for the types it leaves alone. Data orjson
+refuses, such as integers over 64 bits, and environments without orjson
+go through the standard library instead.
+
+orjson spells floats differently (1e20 rather than 1e+20) and writes
+NaN and infinity as null where JSONRenderer raises, so documents with
+floats are encoded by the standard library too. Floats are only looked
+for in dicts, lists and tuples, the API's serializers have no float
+fields.
+"""
+import json
+import re
+
+from rest_framework.compat import SHORT_SEPARATORS
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # Dates go to DRF's encoder, which trims microseconds and writes UTC as Z
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_encoder = encoders.JSONEncoder()
+
+# Every float orjson writes with an exponent or as null matches one of them
+_FLOAT_SUSPECTS = re.compile(rb'null|[0-9]e')
+
+
+def _has_floats(data):
+    pending = [data]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, float):
+            return True
+        if isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+    return False
+
+
+def _escape(content):
+    # Valid JSON but not valid JavaScript, JSONRenderer escapes them too
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+def dumps(data):
+    """Encodes data as compact UTF-8 JSON.
+
+    Args:
+        data: Anything JSONRenderer can render
+
+    Returns:
+        bytes: The JSON document
+    """
+    if orjson is not None:
+        try:
+            content = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+        else:
+            if not (_FLOAT_SUSPECTS.search(content) and _has_floats(data)):
+                return _escape(content)
+    content = json.dumps(
+        data, cls=encoders.JSONEncoder, ensure_ascii=False,
+        allow_nan=not api_settings.STRICT_JSON, separators=SHORT_SEPARATORS)
+    return _escape(content.encode('utf-8'))
+
+
+def loads(content):
+    """Decodes a JSON document.
+
+    Args:
+        content (bytes or str): UTF-8 JSON
+
+    Raises:
+        ValueError: With the standard library's message when the document
+            is invalid
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # Reported, or read when orjson only refused a large number,
+            # the way json does
+            pass
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return json.loads(content)
@@ -0,0 +1,109 @@
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.crypto import salted_hmac
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# How long a request may hold its key before a retry is allowed to run
+PENDING_TTL = 60
+
+
+def _cache():
+    return caches[getattr(settings, 'USERS_IDEMPOTENCY_CACHE_ALIAS', 'shared')]
+
+
+def _cache_key(scope, request, key):
+    user_id = request.user.pk if request.user.is_authenticated else ''
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return 'users:idempotency:%s:%s:%s' % (scope, user_id, digest)
+
+
+def _fingerprint(request):
+    """Digest of the request payload, keyed with SECRET_KEY so the stored
+    value says nothing about the password it was computed from."""
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return salted_hmac('users.api.idempotency', payload).hexdigest()
+
+
+def idempotent(scope):
+    """Replays the response of a view method when a client retries it
+    with the same Idempotency-Key header.
+
+    The first request holds the key while it runs. A retry arriving
+    meanwhile gets 409, a later one with a different payload gets 422 and
+    any other retry gets the stored response back, so the view does not
+    run twice. Server errors are not stored and can be retried.
+
+    Args:
+        scope (str): Name of the operation, keys are unique per scope and user
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return method(self, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'detail': '%s must have at most %d characters.' % (HEADER, MAX_KEY_LENGTH)},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+            cache = _cache()
+            cache_key = _cache_key(scope, request, key)
+            fingerprint = _fingerprint(request)
+
+            if not cache.add(cache_key, {'state': 'pending', 'fingerprint': fingerprint}, PENDING_TTL):
+                record = cache.get(cache_key)
+                if record is not None:
+                    return _replay(record, fingerprint)
+                # The key expired between add and get, take it over.
+                cache.set(cache_key, {'state': 'pending', 'fingerprint': fingerprint}, PENDING_TTL)
+
+            try:
+                response = method(self, request, *args, **kwargs)
+            except Exception as exc:
+                # Validation and other API errors are stored like any response
+                try:
+                    response = self.handle_exception(exc)
+                except Exception:
+                    cache.delete(cache_key)
+                    raise
+
+            if response.status_code >= 500:
+                cache.delete(cache_key)
+            else:
+                cache.set(cache_key, {
+                    'state': 'done',
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, getattr(settings, 'USERS_IDEMPOTENCY_TTL', 86400))
+            return response
+        return wrapper
+    return decorator
+
+
+def _replay(record, fingerprint):
+    if record['state'] == 'pending':
+        return Response(
+            {'detail': 'A request with this %s is still being processed.' % HEADER},
+            status=status.HTTP_409_CONFLICT)
+    if record['fingerprint'] != fingerprint:
+        return Response(
+            {'detail': '%s was already used with a different payload.' % HEADER},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    response = Response(record['data'], status=record['status'])
+    response[REPLAYED_HEADER] = 'true'
+    return response
@@ -0,0 +1,25 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    """ Keyset pagination on the primary key, so a deep page costs the
+    same as the first one instead of an OFFSET scan """
+
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'USERS_DIRECTORY_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'USERS_DIRECTORY_MAX_PAGE_SIZE', 500)
+
+
+class AuditCursorPagination(CursorPagination):
+    """ Newest audit events first, paged on the indexed created_at """
+
+    ordering = '-created_at'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'USERS_DIRECTORY_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'USERS_DIRECTORY_MAX_PAGE_SIZE', 500)
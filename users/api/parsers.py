@@ -0,0 +1,81 @@
+import codecs
+import csv
+import io
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from .encoding import loads, orjson
+
+
+class FastJSONParser(JSONParser):
+    """ JSONParser decoding UTF-8 bodies with orjson when it is installed.
+    Bodies orjson refuses are parsed again by JSONParser, so invalid JSON
+    gets the same ParseError """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        charset = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(charset).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+class CSVParser(BaseParser):
+    """ Streams a CSV body as one dict per row, keyed by the header line """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Lazily parses the request body.
+
+        Args:
+            stream: The request body
+
+        Returns:
+            iterator: One dict for each CSV record
+        """
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return csv.DictReader(codecs.iterdecode(stream, encoding))
+
+
+class JSONLinesParser(BaseParser):
+    """ Streams a JSON Lines body, one JSON document per line """
+    media_type = 'application/jsonl'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Lazily parses the request body.
+
+        Args:
+            stream: The request body
+
+        Returns:
+            iterator: One decoded document for each non blank line, or a
+            ParseError in place of a line that is not valid JSON so the
+            caller can report it without losing the rest of the body
+        """
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return self._documents(stream, encoding)
+
+    @staticmethod
+    def _documents(stream, encoding):
+        for number, line in enumerate(stream, start=1):
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                yield loads(line)
+            except ValueError as exc:
+                yield ParseError('JSON parse error on line %d - %s' % (number, exc))
+
+
+class NDJSONParser(JSONLinesParser):
+    """ Same as JSONLinesParser for clients sending application/x-ndjson """
+    media_type = 'application/x-ndjson'
@@ -0,0 +1,45 @@
+from rest_framework.renderers import JSONRenderer
+
+from .encoding import dumps
+
+
+class FastJSONRenderer(JSONRenderer):
+    """ JSONRenderer encoding with orjson when it is installed, see
+    users.api.encoding. Indented output, asked for with
+    'application/json; indent=4' or by the browsable API, and the non
+    default UNICODE_JSON and COMPACT_JSON settings go through JSONRenderer """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class StreamingJSONRenderer(FastJSONRenderer):
+    """ Renders data like FastJSONRenderer, and streams large lists as a
+    JSON array one element at a time, so the whole body is never held in
+    memory. Meant for StreamingHttpResponse:
+
+        StreamingHttpResponse(StreamingJSONRenderer().stream(rows),
+                              content_type='application/json')
+    """
+
+    def stream(self, items):
+        """Encodes an iterable as a JSON array.
+
+        Args:
+            items (iterable): Elements of the array, read lazily
+
+        Returns:
+            iterator: Bytes, '[' and the first element, then ',' and each
+            following element, and ']'
+        """
+        separator = b'['
+        for item in items:
+            yield separator + dumps(item)
+            separator = b','
+        yield b'[]' if separator == b'[' else b']'
@@ -1,13 +1,45 @@
+import time
+
 from django.db import models
 from django.db.models import fields
 from rest_framework import serializers
-from users.models import User, Department
+from rest_framework.validators import UniqueValidator
+from users.metrics import current_request
+from users.models import AuditEvent, User, Department, DepartmentDeletionJob
 from .validators import *
 
-class UserSerializer(serializers.ModelSerializer):
+
+class TimedSerializerMixin:
+    """ Adds the time spent in to_representation to the metrics of the
+    request, when it is sampled by MetricsMiddleware """
+
+    def to_representation(self, instance):
+        request_metrics = current_request()
+        if request_metrics is None:
+            return super().to_representation(instance)
+
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            request_metrics.serializer_time += time.perf_counter() - start
+
+
+def _text(row, field):
+    value = row.get(field)
+    return value if isinstance(value, str) else ''
+
+
+# User.objects hides inactive users, whose emails are still taken
+UNIQUE_EMAIL = {'validators': [UniqueValidator(
+    queryset=User.all_objects.all(), message='user with this email already exists.')]}
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'full_name', 'password', 'email', 'department']
+        extra_kwargs = {'email': UNIQUE_EMAIL}
 
     def validate(self, data):
         """Data validations 
@@ -21,46 +53,91 @@ class UserSerializer(serializers.ModelSerializer):
         Returns:
             dict: values validated
         """
-        full_name = data['full_name']
-        password = data['password']
+        errors = self.validate_batch([data])[0]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return data
 
-        try:
-            department = data['department']
-        except KeyError:
-            raise serializers.ValidationError(
-                {'department': "The request must have a department field."})
+    @staticmethod
+    def validate_batch(rows):
+        """Runs the validate checks over many rows at once, one column at a time
 
-        if not full_name_validator(full_name):
-            raise serializers.ValidationError(
-                {'full_name': "This field must be alphanumeric."})
+        Args:
+            rows (list): dicts with full_name, password and department
 
-        if not password_validator(password):
-            raise serializers.ValidationError(
-                {'password': "The password must contain at least one number and one uppercase and lowercase letter, and at least 8 or more characters"})
+        Returns:
+            list: None for each valid row, otherwise the errors of the row
+            as validate would report them
+        """
+        columns = validate_columns(
+            full_names=[_text(row, 'full_name') for row in rows],
+            passwords=[_text(row, 'password') for row in rows])
 
-        return data
+        results = []
+        for row, full_name_ok, password_ok in zip(rows, columns['full_name'], columns['password']):
+            if 'department' not in row:
+                results.append({'department': ["The request must have a department field."]})
+            elif not full_name_ok:
+                results.append({'full_name': [FULL_NAME_MESSAGE]})
+            elif not password_ok:
+                results.append({'password': [PASSWORD_MESSAGE]})
+            else:
+                results.append(None)
+        return results
         
-class UserUpdateProfileSerializer(serializers.ModelSerializer):
+class UserRegistrationSerializer(UserSerializer):
+    """ Payload of a new user. The email uniqueness is enforced by the
+    database on insert instead of an extra query, and the password hash
+    is never sent back """
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {
+            'email': {'validators': []},
+            'password': {'write_only': True},
+        }
+
+class UserUpdateProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'full_name', 'email', 'department']
+        extra_kwargs = {'email': UNIQUE_EMAIL}
+
+class UserDirectorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'full_name', 'email', 'department', 'is_active', 'is_staff']
 
-class ProfileListSerializer(serializers.ModelSerializer):
+class ProfileListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'full_name']
 
-class UserPasswordSerializer(serializers.ModelSerializer):
+class UserPasswordSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['password']
 
-class ProfileDetailSerializer(serializers.ModelSerializer):
+class ProfileDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
 
-class DepartmentSerializer(serializers.ModelSerializer):
+class DepartmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Department
+        fields = ['id', 'department']
+
+class DepartmentDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """ With the member count, which changes too often for the cached catalog """
+    class Meta:
+        model = Department
+        fields = ['id', 'department', 'member_count']
+
+class DepartmentDeletionJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = DepartmentDeletionJob
         fields = '__all__'
+
+class AuditEventSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = AuditEvent
+        fields = ['event_id', 'actor_id', 'action', 'target_type', 'target_id', 'data', 'created_at']
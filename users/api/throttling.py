@@ -0,0 +1,242 @@
+"""Sliding window rate limits for the endpoints that hash passwords.
+
+Each scope of USERS_THROTTLE_RATES is counted with the sliding window
+counter technique: the hits of the current fixed window plus those of the
+previous one, weighted by how much of it is still inside the sliding
+window. A key costs two integers whatever its rate, and a request that is
+refused is not counted, so a client that keeps retrying is let in again as
+soon as its older hits slide out.
+
+The counters live in this process, in an LRU bounded by
+USERS_THROTTLE_MAX_KEYS, unless USERS_THROTTLE_CACHE_ALIAS names a Django
+cache shared by every worker.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+KEY_PREFIX = 'users:throttle:'
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+RATE_PATTERN = re.compile(r'^(\d+)/(\d*)([smhd])[a-z]*$')
+
+
+def parse_rate(rate):
+    """Reads a rate such as '10/m', '100/hour' or '5/15m'.
+
+    Returns:
+        tuple: Number of requests and the length of the window in seconds
+
+    Raises:
+        ValueError: When the rate can't be parsed
+    """
+    match = RATE_PATTERN.match(rate.strip().lower())
+    if match is None:
+        raise ValueError('Invalid rate "%s".' % rate)
+    count, multiplier, period = match.groups()
+    return int(count), int(multiplier or 1) * PERIODS[period]
+
+
+def _estimate(previous, current, elapsed, window):
+    return previous * (1 - elapsed / window) + current
+
+
+def _retry_after(previous, current, limit, elapsed, window):
+    """Seconds until the estimate drops below the limit again."""
+    if current >= limit:
+        # The current window becomes the previous one and has to slide
+        # out far enough on its own.
+        return (window - elapsed) + window * (1 - limit / current)
+    return window * (1 - (limit - current) / previous) - elapsed
+
+
+class LocalBackend:
+    """ Counters of this process, in an LRU of at most max_keys keys """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_keys(self):
+        return getattr(settings, 'USERS_THROTTLE_MAX_KEYS', 100000)
+
+    def hit(self, key, limit, window, now=None):
+        """Counts a hit unless the key is over its limit.
+
+        Returns:
+            float: None when the hit is allowed, else the seconds to wait
+        """
+        if now is None:
+            now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < index - 1:
+                previous = current = 0
+            elif entry[0] == index - 1:
+                previous, current = entry[2], 0
+            else:
+                previous, current = entry[1], entry[2]
+
+            if _estimate(previous, current, elapsed, window) >= limit:
+                self._entries[key] = (index, previous, current)
+                self._entries.move_to_end(key)
+                return _retry_after(previous, current, limit, elapsed, window)
+
+            self._entries[key] = (index, previous, current + 1)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CacheBackend:
+    """Counters kept in a Django cache, one key per fixed window.
+
+    The check and the increment are two cache calls, so concurrent
+    requests may go slightly over a limit. Eviction is left to the cache.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def hit(self, key, limit, window, now=None):
+        if now is None:
+            now = time.time()
+        index = int(now // window)
+        elapsed = now - index * window
+
+        current_key = '%s%s:%d' % (KEY_PREFIX, key, index)
+        previous_key = '%s%s:%d' % (KEY_PREFIX, key, index - 1)
+        counts = self.cache.get_many([previous_key, current_key])
+        previous = counts.get(previous_key, 0)
+        current = counts.get(current_key, 0)
+
+        if _estimate(previous, current, elapsed, window) >= limit:
+            return _retry_after(previous, current, limit, elapsed, window)
+
+        timeout = 2 * window + 1
+        if not self.cache.add(current_key, 1, timeout):
+            try:
+                self.cache.incr(current_key)
+            except ValueError:
+                self.cache.set(current_key, 1, timeout)
+        return None
+
+    def clear(self):
+        pass
+
+
+local_backend = LocalBackend()
+
+
+def get_backend():
+    alias = getattr(settings, 'USERS_THROTTLE_CACHE_ALIAS', None)
+    if alias:
+        return CacheBackend(caches[alias])
+    return local_backend
+
+
+def hashed(value):
+    """Keeps emails out of the counter keys and bounds their length."""
+    return hashlib.sha256(str(value).strip().lower().encode()).hexdigest()
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Limits the requests of a scope of USERS_THROTTLE_RATES.
+
+    Subclasses name the scope and tell what the requests are counted by.
+    A scope without a rate is not limited.
+    """
+    scope = None
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_key(self, request, view):
+        """Returns what the request is counted by, or None to let it through."""
+        raise NotImplementedError('.get_key() must be overridden')
+
+    def allow_request(self, request, view):
+        key = self.get_key(request, view)
+        if key is None:
+            return True
+        return self.check(key) is None
+
+    def check(self, key):
+        """Counts a hit for key.
+
+        Returns:
+            float: None when allowed, else the seconds to wait
+        """
+        rate = getattr(settings, 'USERS_THROTTLE_RATES', {}).get(self.scope)
+        if not rate:
+            return None
+        limit, window = parse_rate(rate)
+        self.wait_seconds = get_backend().hit('%s:%s' % (self.scope, key), limit, window)
+        return self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LoginIPThrottle(SlidingWindowThrottle):
+    scope = 'login_ip'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class LoginEmailThrottle(SlidingWindowThrottle):
+    scope = 'login_email'
+
+    def get_key(self, request, view):
+        # Any JSON document parses, the view rejects those that aren't objects
+        data = request.data
+        username = data.get('username') if isinstance(data, dict) else None
+        return hashed(username) if username else None
+
+
+class PasswordChangeIPThrottle(SlidingWindowThrottle):
+    scope = 'password_change_ip'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class PasswordChangeUserThrottle(SlidingWindowThrottle):
+    """ Counted by the user whose password is being changed """
+    scope = 'password_change_user'
+
+    def get_key(self, request, view):
+        return view.kwargs.get('pk')
+
+
+def login_wait(request, username):
+    """Applies the login limits outside of a DRF view.
+
+    Args:
+        request: The Django request, for the client address
+        username (str): The email the client tries to log in with
+
+    Returns:
+        float: None when the attempt may go on, else the seconds to wait
+    """
+    waits = [LoginIPThrottle().check(BaseThrottle().get_ident(request))]
+    if username:
+        waits.append(LoginEmailThrottle().check(hashed(username)))
+    waits = [wait for wait in waits if wait is not None]
+    return max(waits) if waits else None
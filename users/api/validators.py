@@ -1,29 +1,143 @@
 import re
 
-def full_name_validator(full_name):
-    """The full_name must contain just letters.
+from django.core.exceptions import ValidationError
+from django.core.validators import EmailValidator
 
-    Args:
-        full_name (Charfield): Replace the empty spaces between
-        the words to math with isalpha method.
+FULL_NAME_MESSAGE = "This field must be alphanumeric."
+PASSWORD_MESSAGE = ("The password must contain at least one number and one uppercase "
+                    "and lowercase letter, and at least 8 or more characters")
+EMAIL_MESSAGE = "Enter a valid email address."
 
-    Returns:
-        boolean: True if all the characters are alphabet letters
+
+class FullNameValidator:
+    """The full_name must contain just letters.
+
+    Calling the validator checks a single name, validate_many checks a
+    whole column in one pass.
     """
-    full_name = full_name.replace(" ", "")
-    return full_name.isalpha()
 
-def password_validator(password):
+    def __call__(self, full_name):
+        """Checks a full name.
+
+        Args:
+            full_name (Charfield): Words made of letters, separated by spaces.
+            A single word is checked without building a new string.
+
+        Returns:
+            boolean: True if all the characters are alphabet letters
+        """
+        return full_name.isalpha() or full_name.replace(" ", "").isalpha()
+
+    def validate_many(self, full_names):
+        """Checks a column of full names.
+
+        Args:
+            full_names (list): The names to check
+
+        Returns:
+            list: One boolean per name, True when it is valid
+        """
+        isalpha = str.isalpha
+        return [isalpha(name) or isalpha(name.replace(" ", "")) for name in full_names]
+
+
+class PasswordValidator:
     """The password must contain at least one number
     and one uppercase and lowercase letter, and at least
     8 or more characters.
 
+    The pattern is compiled once, and passwords of the wrong length are
+    rejected before the regex runs.
+    """
+    pattern = re.compile(r'(?=.*\d)(?=.*[a-z])(?=.*[A-Z]).{8,16}')
+    min_length = 8
+    max_length = 16
+
+    def __call__(self, password):
+        """Checks a password.
+
+        Args:
+            password (Charfield): The user's password
+
+        Returns:
+            boolean: True if the password matches the pattern
+        """
+        return (self.min_length <= len(password) <= self.max_length
+                and self.pattern.fullmatch(password) is not None)
+
+    def validate_many(self, passwords):
+        """Checks a column of passwords.
+
+        Args:
+            passwords (list): The passwords to check
+
+        Returns:
+            list: One boolean per password, True when it is valid
+        """
+        fullmatch = self.pattern.fullmatch
+        low, high = self.min_length, self.max_length
+        return [low <= len(password) <= high and fullmatch(password) is not None
+                for password in passwords]
+
+
+class EmailAddressValidator:
+    """The email must be a valid address of at most max_length characters."""
+
+    def __init__(self, max_length=60):
+        self.max_length = max_length
+        self._validator = EmailValidator()
+
+    def __call__(self, email):
+        """Checks an email address.
+
+        Args:
+            email (EmailField): The user's email
+
+        Returns:
+            boolean: True if the address is valid
+        """
+        if not email or len(email) > self.max_length:
+            return False
+        try:
+            self._validator(email)
+        except ValidationError:
+            return False
+        return True
+
+    def validate_many(self, emails):
+        """Checks a column of email addresses.
+
+        Args:
+            emails (list): The addresses to check
+
+        Returns:
+            list: One boolean per address, True when it is valid
+        """
+        return [self(email) for email in emails]
+
+
+full_name_validator = FullNameValidator()
+password_validator = PasswordValidator()
+email_validator = EmailAddressValidator()
+
+
+def validate_columns(full_names=None, passwords=None, emails=None):
+    """Validates whole columns of user fields.
+
     Args:
-        password (Charfield): The user's password
+        full_names (list): Optional column of names
+        passwords (list): Optional column of passwords
+        emails (list): Optional column of email addresses
 
     Returns:
-        regex: the result of the regex expression
+        dict: For each column given, the field name mapped to one
+        boolean per value
     """
-    pattern = '(?=.*\d)(?=.*[a-z])(?=.*[A-Z]).{8,16}'
-    validation = re.fullmatch(pattern, password)
-    return validation
\ No newline at end of file
+    results = {}
+    if full_names is not None:
+        results['full_name'] = full_name_validator.validate_many(full_names)
+    if passwords is not None:
+        results['password'] = password_validator.validate_many(passwords)
+    if emails is not None:
+        results['email'] = email_validator.validate_many(emails)
+    return results
@@ -1,39 +1,133 @@
 from functools import partial
 
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_save
+from django.http import (HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
 from django.db.models.query import QuerySet
 from django.shortcuts import render
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
 from rest_framework import generics, response, status, viewsets
+from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.serializers import Serializer
-from users.models import Department, User
-
+from rest_framework.views import APIView
+from users import audit, metrics
+from users.departments import cascade_preview, delete_department, schedule_deletion
+from users.lifecycle import soft_delete_user
+from users.exports import EXPORT_FORMATS, export_chunks
+from users.models import AuditEvent, Department, DepartmentDeletionJob, User
+from users.replicas import ReplicaReadMixin
+from users.search import search_users
+from users.tokens import issue_token, revoke_tokens, rotate_tokens
+
+from .bulk import BulkUserImporter
+from .catalog import department_catalog
+from .idempotency import idempotent
+from .pagination import AuditCursorPagination, UserCursorPagination
+from .parsers import CSVParser, FastJSONParser, JSONLinesParser, NDJSONParser
+from .plans import plan_for
 from .permissions import IsSameDepartmentOrStaff, IsOwnProfileOrStaff
-from .serializers import (DepartmentSerializer, ProfileDetailSerializer,
-                          ProfileListSerializer, UserPasswordSerializer,
+from .serializers import (AuditEventSerializer, DepartmentDeletionJobSerializer,
+                          DepartmentDetailSerializer, DepartmentSerializer,
+                          ProfileDetailSerializer,
+                          ProfileListSerializer, UserDirectorySerializer,
+                          UserPasswordSerializer, UserRegistrationSerializer,
                           UserSerializer, UserUpdateProfileSerializer)
-from .validators import password_validator
+from .throttling import (LoginEmailThrottle, LoginIPThrottle,
+                         PasswordChangeIPThrottle, PasswordChangeUserThrottle)
+from .validators import PASSWORD_MESSAGE, password_validator
+
+BOOLEAN_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+
+def actor(request):
+    """The user making the request, None when anonymous."""
+    return request.user if request.user.is_authenticated else None
 
 
 class UsersViewSet(viewsets.ModelViewSet):
-    """ Displaying all users """
+    """ Displaying all users.
+    Staff members see every user, other users only their own department """
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    http_method_names = ['post']
+    pagination_class = UserCursorPagination
+    http_method_names = ['get', 'post']
     permission_classes = (IsAuthenticated,)
 
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return UserDirectorySerializer
+        return UserSerializer
+
+    def get_queryset(self):
+        """Filters the directory by the query parameters department,
+        is_active, is_staff and search (a prefix of the email or name).
+
+        Returns:
+            QuerySet: The users visible to the logged in user, inactive
+            users are only listed to staff members
+        """
+        if self.action not in ('list', 'retrieve'):
+            return User.objects.all()
+
+        if self.request.user.is_staff:
+            queryset = User.all_objects.all()
+        else:
+            queryset = User.objects.all()
+            department_id = self.request.user.department_id
+            if department_id is None:
+                return queryset.none()
+            queryset = queryset.filter(department_id=department_id)
+
+        params = self.request.query_params
+        department = params.get('department')
+        if department:
+            try:
+                queryset = queryset.filter(department_id=int(department))
+            except ValueError:
+                raise ValidationError({'department': "A valid integer is required."})
+
+        for field in ('is_active', 'is_staff'):
+            value = params.get(field)
+            if value is None:
+                continue
+            if value.lower() not in BOOLEAN_VALUES:
+                raise ValidationError({field: "Must be true or false."})
+            queryset = queryset.filter(**{field: BOOLEAN_VALUES[value.lower()]})
+
+        search = params.get('search')
+        if search:
+            queryset = queryset.filter(
+                Q(email__istartswith=search) | Q(full_name__istartswith=search))
+
+        return queryset
+
 
 class CreateProfile(generics.CreateAPIView):
     """ Generic Create API View.
     Allow a user that is not authenticated to register """
 
     queryset = User.objects.all()
-    serializer_class = UserSerializer
+    serializer_class = UserRegistrationSerializer
     http_method_names = ['post']
 
+    @idempotent('users:create')
     def create(self, request, *args, **kwargs):
         """Create a new user
 
+        The department is loaded once by the serializer and the response is
+        built from the instance create_user returns, so a registration costs
+        one read, then the INSERT and the member_count UPDATE of
+        users.signals in one transaction. A duplicate email is caught on
+        insert.
+
         Args:
             request: Data for the new user
 
@@ -41,68 +135,233 @@ class CreateProfile(generics.CreateAPIView):
             response: Serialized data and HTTP status
         """
         serializer = self.get_serializer(data=request.data)
-        if serializer.is_valid(raise_exception=True):
-            data = serializer.data
-    
-        email = data.get('email')
-        password = data.get('password')
-        department = Department.objects.get(id=data.get('department'))
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
         extra_fields = {
-            "full_name": data.get('full_name'),
-            "department": department}
+            "full_name": data['full_name'],
+            "department": data['department']}
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(data['email'], data['password'], **extra_fields)
+                audit.record(actor(request), 'user.create', 'user', user.pk)
+        except IntegrityError:
+            return Response(
+                {'email': ['user with this email already exists.']}, status=status.HTTP_400_BAD_REQUEST)
 
-        if User.objects.create_user(email, password, **extra_fields):
-            serializer = self.get_serializer(
-                User.objects.filter(email=email).first())
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        else:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class BulkCreateProfile(generics.GenericAPIView):
+    """ Creates many users at once from a JSON array, CSV or JSON Lines body.
+    Only staff members are allowed to import users """
+
+    permission_classes = (IsAuthenticated, IsAdminUser,)
+    parser_classes = (FastJSONParser, CSVParser, JSONLinesParser, NDJSONParser)
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        """Imports a batch of users
+
+        Args:
+            request: A list of users, each with the same fields as CreateProfile
 
+        Returns:
+            response: Import report with the errors of each rejected row and HTTP status
+        """
+        rows = request.data
+        if isinstance(rows, dict):
+            return Response(
+                {'non_field_errors': ["Expected a list of users."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = BulkUserImporter(actor=actor(request)).run(rows)
+
+        if report.created:
+            return Response(report.as_dict(), status=status.HTTP_201_CREATED)
+        return Response(report.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+
+
+class UserExport(APIView):
+    """ Streams every user and his department as CSV, JSON Lines or a JSON array.
+    The format is chosen with the output query parameter (csv, jsonl or json) """
+    permission_classes = (IsAuthenticated, IsAdminUser,)
+    http_method_names = ['get']
 
-class ReadProfileList(generics.ListAPIView):
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'output': "Must be one of: %s." % ', '.join(sorted(EXPORT_FORMATS))},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        content_type = EXPORT_FORMATS[output][1]
+        response = StreamingHttpResponse(export_chunks(output), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="users.%s"' % output
+        return response
+
+
+class ProfileListCompatMixin:
+    """ Keeps the list shaped response of the original profile URLs
+    while reading the row with a single query """
+
+    def list(self, request, *args, **kwargs):
+        data = plan_for(self.get_serializer_class()).serialize(self.get_queryset())
+
+        if not data:
+            raise generics.Http404
+        return Response(data)
+
+
+class PlannedRetrieveMixin:
+    """ Serializes the object from its values() row with the field plan of
+    the serializer (see users.api.plans). Only for views without object
+    permissions, no instance is loaded to check them against """
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        data = plan_for(self.get_serializer_class()).serialize(queryset)
+
+        if not data:
+            raise generics.Http404
+        return Response(data[0])
+
+
+class ReadProfileList(ReplicaReadMixin, ProfileListCompatMixin, generics.ListAPIView):
     """ Displaying only full name, and profile identifier """
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        queryset = User.objects.filter(id=self.kwargs['pk'])
-
-        if queryset.exists():
-            return queryset
-        else:
-            raise generics.Http404
+        return User.objects.filter(id=self.kwargs['pk'])
 
     serializer_class = ProfileListSerializer
     http_method_names = ['get']
 
 
-class ReadProfileDetail(generics.ListAPIView):
+class ReadProfileDetail(ReplicaReadMixin, ProfileListCompatMixin, generics.ListAPIView):
     """ Displaying all info about an user """
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        queryset = User.objects.filter(id=self.kwargs['pk'])
+        return User.objects.filter(id=self.kwargs['pk'])
 
-        if queryset.exists():
-            return queryset
-        else:
-            raise generics.Http404
+    serializer_class = ProfileDetailSerializer
+    http_method_names = ['get']
 
+
+class RetrieveProfile(ReplicaReadMixin, PlannedRetrieveMixin, generics.RetrieveAPIView):
+    """ Displaying only full name, and profile identifier as a single object """
+    permission_classes = (IsAuthenticated,)
+    queryset = User.objects.all()
+    serializer_class = ProfileListSerializer
+    lookup_field = 'pk'
+    http_method_names = ['get']
+
+
+class RetrieveProfileDetail(ReplicaReadMixin, PlannedRetrieveMixin, generics.RetrieveAPIView):
+    """ Displaying all info about an user as a single object """
+    permission_classes = (IsAuthenticated,)
+    queryset = User.objects.all()
     serializer_class = ProfileDetailSerializer
+    lookup_field = 'pk'
     http_method_names = ['get']
 
 
 class UserUpdateProfile(generics.RetrieveUpdateAPIView):
-    """ Updates an user profile """
+    """ Updates an user profile.
+
+    PUT replaces the profile and PATCH changes some of its fields. Only the
+    columns that changed are written, nothing at all when none did.
+    Responses carry the profile version as ETag. An update sent with a
+    stale If-Match, or racing with another update, fails with 412 instead
+    of overwriting it. """
     permission_classes = (IsAuthenticated, IsSameDepartmentOrStaff,)
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('department')
     serializer_class = UserUpdateProfileSerializer
     lookup_field = 'pk'
-    http_method_names = ['put']
+    http_method_names = ['get', 'put', 'patch']
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.profile_response(self.get_object())
+
+    def update(self, request, *args, **kwargs):
+        """Writes the changed fields, if the version is still the one loaded.
+
+        Args:
+            request: The fields to change, and optionally If-Match with the
+                ETag of a previous response
+
+        Returns:
+            response: The profile and its new ETag, or 412 when it was
+            changed meanwhile
+        """
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        if not self.version_matches(request, instance):
+            return self.precondition_failed()
+
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+
+        changes = {}
+        for name, value in serializer.validated_data.items():
+            field = User._meta.get_field(name)
+            if field.is_relation and value is not None:
+                value = value.pk
+            if getattr(instance, field.attname) != value:
+                changes[field] = value
+        if not changes:
+            return self.profile_response(instance)
+
+        # One conditional UPDATE instead of a row lock: it matches nothing
+        # when another update bumped the version since get_object.
+        rows = User.all_objects.filter(pk=instance.pk, version=instance.version)
+        try:
+            updated = rows.update(version=F('version') + 1,
+                                  **{field.attname: value for field, value in changes.items()})
+        except IntegrityError:
+            return Response(
+                {'email': ['user with this email already exists.']}, status=status.HTTP_400_BAD_REQUEST)
+        if not updated:
+            return self.precondition_failed()
+
+        for field, value in changes.items():
+            setattr(instance, field.attname, value)
+        instance.version += 1
+        # QuerySet.update doesn't send it, the caches and member counts rely on it
+        post_save.send(sender=User, instance=instance, created=False, raw=False, using=rows.db,
+                       update_fields=frozenset([field.name for field in changes] + ['version']))
+        audit.record(request.user, 'user.update', 'user', instance.pk,
+                     fields=sorted(field.name for field in changes))
+        return self.profile_response(instance)
+
+    @staticmethod
+    def etag(instance):
+        return '"%d"' % instance.version
+
+    def version_matches(self, request, instance):
+        if_match = request.META.get('HTTP_IF_MATCH')
+        if if_match is None:
+            return True
+        etags = parse_etags(if_match)
+        return '*' in etags or self.etag(instance) in etags
+
+    def precondition_failed(self):
+        return Response({'detail': 'The profile was changed by another request.'},
+                        status=status.HTTP_412_PRECONDITION_FAILED)
+
+    def profile_response(self, instance):
+        response = Response(self.get_serializer(instance).data)
+        response['ETag'] = self.etag(instance)
+        return response
 
 
 class UserChangePassword(generics.UpdateAPIView):
     """ Changes an authenticated user password """
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (PasswordChangeIPThrottle, PasswordChangeUserThrottle)
     serializer_class = UserPasswordSerializer
     http_method_names = ['put']
 
@@ -129,44 +388,170 @@ class UserChangePassword(generics.UpdateAPIView):
 
         if not password_validator(old_password):
             return Response(
-                {'old_password': "The password must contain at least one number and one uppercase and lowercase letter, and at least 8 or more characters"}, status=status.HTTP_400_BAD_REQUEST)
+                {'old_password': PASSWORD_MESSAGE}, status=status.HTTP_400_BAD_REQUEST)
 
         if not password_validator(new_password):
             return Response(
-                {'new_password': "The password must contain at least one number and one uppercase and lowercase letter, and at least 8 or more characters"}, status=status.HTTP_400_BAD_REQUEST)
+                {'new_password': PASSWORD_MESSAGE}, status=status.HTTP_400_BAD_REQUEST)
 
         self.obj = self.get_object()
 
         if not self.obj.check_password(old_password):
             return Response({"old_password": "The old password didn't match."}, status=status.HTTP_400_BAD_REQUEST)
         else:
-            self.obj.set_password(new_password)
-            self.obj.save()
-
-            response = {
-                'message': 'Password updated successfully',
-            }
+            with transaction.atomic():
+                self.obj.set_password(new_password)
+                self.obj.save()
+                # Tokens obtained with the old password stop working, only
+                # the user himself gets a new one
+                if self.obj == request.user:
+                    token = rotate_tokens(self.obj)
+                else:
+                    token = None
+                    revoke_tokens(self.obj)
+                audit.record(request.user, 'user.change_password', 'user', self.obj.pk)
+
+            response = {'message': 'Password updated successfully'}
+            if token is not None:
+                response['token'] = token.key
 
             return Response(response, status=status.HTTP_200_OK)
 
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
+class ObtainToken(ObtainAuthToken):
+    """ Issues a new expiring token, rejecting clients over the login
+    limits before their password is hashed """
+    throttle_classes = (LoginIPThrottle, LoginEmailThrottle)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = issue_token(serializer.validated_data['user'])
+        return Response({'token': token.key})
+
+
 class UserDeleteProfile(generics.DestroyAPIView):
-    """Deletes an user profile"""
+    """Deletes an user profile.
+    The user is deactivated and his tokens revoked, purge_users deletes
+    him later. With hard=true he is deleted right away """
     permission_classes = (IsAuthenticated, IsOwnProfileOrStaff,)
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('department')
     serializer_class = UserSerializer
     lookup_field = 'pk'
 
+    def perform_destroy(self, instance):
+        hard = self.request.query_params.get('hard', 'false').lower()
+        if hard not in BOOLEAN_VALUES:
+            raise ValidationError({'hard': "Must be true or false."})
+
+        pk = instance.pk
+        if BOOLEAN_VALUES[hard]:
+            instance.delete()
+        else:
+            soft_delete_user(instance)
+        audit.record(self.request.user, 'user.delete', 'user', pk, hard=BOOLEAN_VALUES[hard])
+
 
-class DepartmentsViewSet(viewsets.ModelViewSet):
+class DepartmentsViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """ Creates a department"""
     permission_classes = (IsAuthenticated, IsAdminUser,)
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     http_method_names = ['get', 'post']
 
+    def get_serializer_class(self):
+        if self.action in ('retrieve', 'member_counts'):
+            return DepartmentDetailSerializer
+        return DepartmentSerializer
+
+    def list(self, request, *args, **kwargs):
+        """Lists the departments from the cached catalog
+
+        Args:
+            request: May carry If-None-Match with the ETag of a previous response
+
+        Returns:
+            response: The departments, or 304 when the client copy is current
+        """
+        snapshot = department_catalog.get()
+        if snapshot.etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        elif request.accepted_renderer.format == 'json':
+            response = HttpResponse(snapshot.payload, content_type='application/json')
+        else:
+            response = Response(snapshot.data)
+        response['ETag'] = snapshot.etag
+        return response
+
+    @action(detail=False)
+    def member_counts(self, request):
+        """Lists the departments with their member counts
+
+        Read on every request, outside the catalog, so registrations and
+        moves don't change the catalog's ETag.
+
+        Returns:
+            response: The id, name and member_count of every department
+        """
+        departments = self.get_queryset().order_by('pk')
+        return Response(plan_for(self.get_serializer_class()).serialize(departments))
+
+
+class DepartmentUsers(ReplicaReadMixin, generics.ListAPIView):
+    """ Lists the members of a department, paged by id.
+    Staff members see any department, other users only their own """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = UserDirectorySerializer
+    pagination_class = UserCursorPagination
+    http_method_names = ['get']
+
+    def get_queryset(self):
+        department_id = self.kwargs['pk']
+        user = self.request.user
+        if not user.is_staff:
+            if user.department_id != department_id:
+                raise PermissionDenied()
+        elif not Department.objects.filter(pk=department_id).exists():
+            raise generics.Http404
+        return User.objects.filter(department_id=department_id)
+
+
+class UserSearch(ReplicaReadMixin, APIView):
+    """ Searches the users by part of their name or email.
+    Staff members search every user, other users only their own department """
+    permission_classes = (IsAuthenticated,)
+    http_method_names = ['get']
+
+    def get(self, request):
+        """Ranks the active users matching q
+
+        Args:
+            request: q, the text to look for, and optionally limit, the
+            number of results up to USERS_SEARCH_MAX_RESULTS
+
+        Returns:
+            response: The id, full_name, email and department of the best matches
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This field is required.']})
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({'limit': ['A positive integer is required.']})
+        limit = min(limit, getattr(settings, 'USERS_SEARCH_MAX_RESULTS', 50))
+
+        department_id = None
+        if not request.user.is_staff:
+            department_id = request.user.department_id
+            if department_id is None:
+                return Response([])
+        return Response(search_users(query, limit, department_id))
+
 
 class DepartmentDeleteProfile(generics.DestroyAPIView):
     """ Deletes a department """
@@ -175,3 +560,110 @@ class DepartmentDeleteProfile(generics.DestroyAPIView):
     serializer_class = DepartmentSerializer
     lookup_field = 'pk'
     http_method_names = ['delete']
+
+    def destroy(self, request, *args, **kwargs):
+        """Deletes the department, its members are removed in batches
+
+        Args:
+            request: With dry_run=true nothing is deleted. With
+            background=true the department is hidden right away and a job
+            deletes it
+
+        Returns:
+            response: 204, the rows the cascade would remove on a dry run,
+            or 202 and the job of a background delete
+        """
+        department = self.get_object()
+        dry_run = self._flag(request, 'dry_run')
+        background = self._flag(request, 'background')
+
+        if dry_run:
+            return Response(cascade_preview(department))
+        record = partial(audit.record, request.user, 'department.delete', 'department',
+                         department.pk, background=background)
+        if background:
+            with transaction.atomic():
+                job = schedule_deletion(department)
+                record()
+            return Response(
+                DepartmentDeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                headers={'Location': '/departments/jobs/%d/' % job.pk})
+        # Commits batch by batch, recorded once the department is gone
+        delete_department(department)
+        record()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @staticmethod
+    def _flag(request, name):
+        value = request.query_params.get(name, 'false').lower()
+        if value not in BOOLEAN_VALUES:
+            raise ValidationError({name: "Must be true or false."})
+        return BOOLEAN_VALUES[value]
+
+
+class DepartmentDeletionJobDetail(generics.RetrieveAPIView):
+    """ Progress of a background department delete """
+    permission_classes = (IsAuthenticated, IsAdminUser,)
+    queryset = DepartmentDeletionJob.objects.all()
+    serializer_class = DepartmentDeletionJobSerializer
+    lookup_field = 'pk'
+    http_method_names = ['get']
+
+
+class AuditEventList(generics.ListAPIView):
+    """ Lists the audit events, newest first.
+    Only staff members are allowed to read them """
+    permission_classes = (IsAuthenticated, IsAdminUser,)
+    serializer_class = AuditEventSerializer
+    pagination_class = AuditCursorPagination
+    http_method_names = ['get']
+
+    def get_queryset(self):
+        """Filters the events by the query parameters actor (an user id),
+        target_type, target (an id, with target_type), action, since and
+        until (ISO 8601 datetimes).
+
+        Returns:
+            QuerySet: The matching events
+        """
+        queryset = AuditEvent.objects.all()
+        params = self.request.query_params
+
+        for param, field in (('actor', 'actor_id'), ('target', 'target_id')):
+            value = params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{field: int(value)})
+                except ValueError:
+                    raise ValidationError({param: "A valid integer is required."})
+        if params.get('target') and not params.get('target_type'):
+            raise ValidationError({'target_type': "Required with target."})
+
+        for param in ('target_type', 'action'):
+            value = params.get(param)
+            if value:
+                queryset = queryset.filter(**{param: value})
+
+        for param, lookup in (('since', 'created_at__gte'), ('until', 'created_at__lt')):
+            value = params.get(param)
+            if not value:
+                continue
+            try:
+                moment = parse_datetime(value)
+            except ValueError:
+                moment = None
+            if moment is None:
+                raise ValidationError({param: "A valid ISO 8601 datetime is required."})
+            queryset = queryset.filter(**{lookup: moment})
+
+        return queryset
+
+
+class Metrics(APIView):
+    """ Exposes the request metrics in the Prometheus text format """
+    permission_classes = (IsAuthenticated, IsAdminUser,)
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,294 @@
+"""Audit log of the changes made through the API.
+
+record() only queues an event for when the surrounding transaction
+commits, so a request never waits on the audit table and rolled back
+changes leave no trace. Committed events wait in a buffer of this process
+until a background thread writes them with one bulk_create, once
+USERS_AUDIT_BATCH_SIZE of them are waiting or USERS_AUDIT_FLUSH_INTERVAL
+seconds have passed.
+
+When USERS_AUDIT_SPOOL_DIR is set, every event is also appended to a spool
+file of the process before it is buffered. A batch that fails to be
+written, or the file a crashed process left behind, stays on disk and is
+written later by replay_spool (see the replay_audit_spool command).
+A process only replays its own files and those of processes that are no
+longer running, and claims each one with an atomic rename first, so two
+processes never replay the same file. Events carry a unique event_id, so
+replaying a file twice is harmless anyway.
+Without a spool, events are only kept in memory and at most
+USERS_AUDIT_BUFFER_SIZE of them wait for the database.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from users.models import AuditEvent
+
+logger = logging.getLogger(__name__)
+
+SPOOL_PATTERN = 'audit-%d.jsonl'
+SEALED_SUFFIX = '.sealed'
+# Appended with the pid of the process replaying the file
+CLAIMED_SUFFIX = '.replaying'
+
+
+def _serialize(event):
+    return json.dumps({
+        'event_id': str(event.event_id),
+        'actor_id': event.actor_id,
+        'action': event.action,
+        'target_type': event.target_type,
+        'target_id': event.target_id,
+        'data': event.data,
+        'created_at': event.created_at.isoformat(),
+    })
+
+
+def _deserialize(line):
+    fields = json.loads(line)
+    fields['event_id'] = uuid.UUID(fields['event_id'])
+    fields['created_at'] = parse_datetime(fields['created_at'])
+    return AuditEvent(**fields)
+
+
+def _spool_pid(path):
+    """The process that wrote a spool file, audit-<pid>.jsonl..."""
+    return int(os.path.basename(path)[len('audit-'):].split('.', 1)[0])
+
+
+def _pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class AuditLog:
+    """ Buffer of the committed events of this process and its flusher """
+
+    def __init__(self):
+        self._buffer = []
+        self._dropped = 0
+        self._overflowed = False
+        self._spool = None
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'USERS_AUDIT_BATCH_SIZE', 500)
+
+    @property
+    def buffer_size(self):
+        return getattr(settings, 'USERS_AUDIT_BUFFER_SIZE', 10000)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'USERS_AUDIT_FLUSH_INTERVAL', 1.0)
+
+    @property
+    def spool_dir(self):
+        return getattr(settings, 'USERS_AUDIT_SPOOL_DIR', None)
+
+    def record(self, actor, action, target_type, target_id, **data):
+        """Queues an event for when the current transaction commits.
+
+        Args:
+            actor (User): Who made the change, None for anonymous requests
+            action (str): What was done, e.g. 'user.update'
+            target_type (str): 'user' or 'department'
+            target_id (int): The changed row
+            **data: Details worth keeping, never secrets
+        """
+        event = AuditEvent(
+            event_id=uuid.uuid4(),
+            actor_id=getattr(actor, 'pk', None),
+            action=action,
+            target_type=target_type,
+            target_id=target_id,
+            data=data,
+            created_at=timezone.now())
+        transaction.on_commit(partial(self.append, event))
+
+    def append(self, event):
+        """Buffers a committed event, spooling it first when enabled."""
+        with self._condition:
+            if self.spool_dir:
+                self._spool_write(_serialize(event))
+            if len(self._buffer) >= self.buffer_size:
+                # The database is behind, the spool, if any, still has it
+                self._buffer.pop(0)
+                self._dropped += 1
+                self._overflowed = True
+            self._buffer.append(event)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+        self._start()
+
+    def flush(self):
+        """Writes the buffered events now.
+
+        Returns:
+            int: Number of events written
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch, self._buffer = self._buffer, []
+                overflowed, self._overflowed = self._overflowed, False
+                dropped, self._dropped = self._dropped, 0
+                sealed = self._seal()
+            if dropped and not sealed:
+                logger.warning('Dropped %d audit events, the buffer was full', dropped)
+
+            written = 0
+            try:
+                for start in range(0, len(batch), self.batch_size):
+                    chunk = batch[start:start + self.batch_size]
+                    AuditEvent.objects.bulk_create(chunk, ignore_conflicts=True)
+                    written += len(chunk)
+            except Exception:
+                logger.exception('Failed to write %d audit events', len(batch) - written)
+                if not sealed:
+                    # Without a spool the events wait for the next flush
+                    with self._condition:
+                        self._buffer[:0] = batch[written:]
+                        del self._buffer[:-self.buffer_size]
+                return written
+
+            if sealed is not None and not overflowed:
+                os.remove(sealed)
+            return written
+
+    def replay_spool(self, include_orphans=False):
+        """Writes the events of the spool files left on disk.
+
+        Args:
+            include_orphans (bool): Also replay the open files of processes
+                that are no longer running
+
+        Returns:
+            int: Number of events read from the files
+        """
+        if not self.spool_dir:
+            return 0
+        pid = os.getpid()
+        # (current path, path without any claim)
+        files = []
+        for path in glob.glob(os.path.join(self.spool_dir, 'audit-*.jsonl*' + SEALED_SUFFIX)):
+            # A running process flushes and replays its own
+            writer = _spool_pid(path)
+            if writer == pid or not _pid_running(writer):
+                files.append((path, path))
+        for path in glob.glob(os.path.join(self.spool_dir, 'audit-*' + CLAIMED_SUFFIX)):
+            unclaimed, replayer = path[:-len(CLAIMED_SUFFIX)].rsplit('.', 1)
+            if not _pid_running(int(replayer)):
+                files.append((path, unclaimed))
+        if include_orphans:
+            for path in glob.glob(os.path.join(self.spool_dir, 'audit-*.jsonl')):
+                writer = _spool_pid(path)
+                if writer != pid and not _pid_running(writer):
+                    files.append((path, path))
+
+        replayed = 0
+        # None of this process' sealed files is being flushed meanwhile
+        with self._flush_lock:
+            for path, unclaimed in sorted(files):
+                claimed = '%s.%d%s' % (unclaimed, pid, CLAIMED_SUFFIX)
+                try:
+                    os.rename(path, claimed)
+                except FileNotFoundError:
+                    # Claimed or written by another process first
+                    continue
+                try:
+                    with open(claimed) as spool:
+                        events = [_deserialize(line) for line in spool if line.strip()]
+                    for start in range(0, len(events), self.batch_size):
+                        AuditEvent.objects.bulk_create(
+                            events[start:start + self.batch_size], ignore_conflicts=True)
+                except Exception:
+                    # Left for the next replay
+                    os.rename(claimed, unclaimed)
+                    raise
+                os.remove(claimed)
+                replayed += len(events)
+        return replayed
+
+    def clear(self):
+        with self._condition:
+            self._buffer = []
+            self._dropped = 0
+            self._overflowed = False
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+
+    def _spool_write(self, line):
+        if self._spool is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = os.path.join(self.spool_dir, SPOOL_PATTERN % os.getpid())
+            self._spool = open(path, 'a')
+        self._spool.write(line + '\n')
+        self._spool.flush()
+
+    def _seal(self):
+        """Closes the spool file holding the batch being flushed, new
+        events go to a new one."""
+        if self._spool is None:
+            return None
+        path = self._spool.name
+        self._spool.close()
+        self._spool = None
+        sealed = '%s.%d%s' % (path, time.time_ns(), SEALED_SUFFIX)
+        os.rename(path, sealed)
+        return sealed
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name='audit-log', daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._buffer) >= self.batch_size,
+                                         timeout=self.flush_interval)
+                if not self._buffer:
+                    continue
+            close_old_connections()
+            try:
+                self.flush()
+                self.replay_spool()
+            except Exception:
+                logger.exception('Audit flush failed')
+            finally:
+                close_old_connections()
+
+
+audit_log = AuditLog()
+record = audit_log.record
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        audit_log.flush()
+    except Exception:
+        logger.exception('Audit flush at exit failed')
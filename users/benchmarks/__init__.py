@@ -0,0 +1,46 @@
+import json
+import platform
+import time
+
+import django
+
+
+def measure(func, seconds=1.0, min_runs=3):
+    """Calls func repeatedly for about the given time.
+
+    Args:
+        func (callable): The operation to time, called without arguments
+        seconds (float): Minimum time spent calling func
+        min_runs (int): Minimum number of calls
+
+    Returns:
+        dict: Number of runs, elapsed seconds and runs per second
+    """
+    runs = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while runs < min_runs or time.perf_counter() < deadline:
+        func()
+        runs += 1
+    elapsed = time.perf_counter() - start
+    return {'runs': runs, 'elapsed': elapsed, 'per_second': runs / elapsed}
+
+
+def write_results(path, suite, results):
+    """Saves benchmark results as JSON so later runs can be compared.
+
+    Args:
+        path (str): Output file
+        suite (str): Name of the benchmark suite
+        results (list): One dict per measured configuration
+    """
+    document = {
+        'suite': suite,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as results_file:
+        json.dump(document, results_file, indent=2)
@@ -0,0 +1,223 @@
+import itertools
+import random
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from users.benchmarks.fixtures import PASSWORD, seed
+from users.metrics import percentile
+
+
+class Scenario:
+    """ One route driven in-process, request() returns the response """
+
+    name = None
+    expected = 200
+
+    def __init__(self, client, fixtures):
+        self.client = client
+        self.fixtures = fixtures
+        self.random = random.Random(0)
+
+    def random_user(self):
+        return self.random.choice(self.fixtures['user_ids'])
+
+
+class CreateScenario(Scenario):
+    name = 'create'
+    expected = 201
+
+    def __init__(self, client, fixtures):
+        super().__init__(client, fixtures)
+        self.counter = itertools.count()
+
+    def request(self):
+        return self.client.post('/users/create', {
+            'full_name': 'Bench User',
+            'email': 'created%d@bench.test' % next(self.counter),
+            'password': PASSWORD,
+            'department': self.fixtures['department_ids'][0],
+        })
+
+
+class ProfileReadScenario(Scenario):
+    name = 'profile_read'
+
+    def request(self):
+        return self.client.get('/users/%d/profile/' % self.random_user())
+
+
+class ProfileDetailScenario(Scenario):
+    name = 'profile_detail'
+
+    def request(self):
+        return self.client.get('/users/%d/detail/' % self.random_user())
+
+
+class UpdateScenario(Scenario):
+    name = 'update'
+
+    def request(self):
+        pk = self.random_user()
+        return self.client.put('/users/%d/update/' % pk, {
+            'full_name': 'Updated User',
+            'email': 'seed-updated%d@bench.test' % pk,
+            'department': self.random.choice(self.fixtures['department_ids']),
+        })
+
+
+class ChangePasswordScenario(Scenario):
+    name = 'change_password'
+
+    def __init__(self, client, fixtures):
+        super().__init__(client, fixtures)
+        self.passwords = itertools.cycle([(PASSWORD, '123ABCdf'), ('123ABCdf', PASSWORD)])
+
+    def request(self):
+        old_password, new_password = next(self.passwords)
+        response = self.client.put('/users/%d/change_password/' % self.fixtures['staff'].pk, {
+            'old_password': old_password,
+            'new_password': new_password,
+        })
+        if response.status_code == 200:
+            # The change revoked the staff token, the next scenarios use the new one
+            self.fixtures['token'] = response.data['token']
+            self.client.credentials(HTTP_AUTHORIZATION='Token ' + response.data['token'])
+        return response
+
+
+class DeleteScenario(Scenario):
+    name = 'delete'
+    expected = 204
+
+    def __init__(self, client, fixtures):
+        super().__init__(client, fixtures)
+        self.pending = iter(list(reversed(fixtures['user_ids'])))
+
+    def request(self):
+        return self.client.delete('/users/%d/delete/' % next(self.pending))
+
+
+class DepartmentListScenario(Scenario):
+    name = 'department_list'
+
+    def request(self):
+        return self.client.get('/departments/')
+
+
+class TokenIssueScenario(Scenario):
+    name = 'token_issue'
+
+    def request(self):
+        return self.client.post('/api-token-auth/', {
+            'username': self.fixtures['login'].email,
+            'password': PASSWORD,
+        })
+
+
+# Delete runs last, it removes users the other scenarios read
+SCENARIOS = {scenario.name: scenario for scenario in (
+    CreateScenario, ProfileReadScenario, ProfileDetailScenario, UpdateScenario,
+    ChangePasswordScenario, DepartmentListScenario, TokenIssueScenario, DeleteScenario)}
+
+
+def run_scenario(scenario_class, fixtures, requests, warmup=5):
+    """Drives one scenario and measures it.
+
+    Args:
+        scenario_class: A Scenario subclass
+        fixtures (dict): The result of fixtures.seed
+        requests (int): Measured requests
+        warmup (int): Requests sent before measuring
+
+    Returns:
+        dict: requests/sec, p50/p99 latency in ms and queries per request
+    """
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Token ' + fixtures['token'])
+    scenario = scenario_class(client, fixtures)
+
+    for _ in range(warmup):
+        scenario.request()
+
+    latencies = []
+    queries = 0
+    failures = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            request_start = time.perf_counter()
+            response = scenario.request()
+            latencies.append(time.perf_counter() - request_start)
+        queries += len(captured)
+        if response.status_code != scenario.expected:
+            failures += 1
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'scenario': scenario.name,
+        'requests': requests,
+        'failures': failures,
+        'requests_per_second': requests / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'queries_per_request': queries / requests,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Flags the scenarios that got slower than a previous run.
+
+    Args:
+        results (list): Results of this run
+        baseline (list): Results of the previous run
+        threshold (float): Tolerated relative change, e.g. 0.1 for 10%
+
+    Returns:
+        list: One dict per scenario found in both runs, with a regression flag
+    """
+    previous = {result['scenario']: result for result in baseline}
+    comparisons = []
+    for result in results:
+        before = previous.get(result['scenario'])
+        if before is None:
+            continue
+        throughput = result['requests_per_second'] / before['requests_per_second'] - 1
+        p99 = result['p99_ms'] / before['p99_ms'] - 1 if before['p99_ms'] else 0.0
+        queries = result['queries_per_request'] - before['queries_per_request']
+        comparisons.append({
+            'scenario': result['scenario'],
+            'throughput_change': throughput,
+            'p99_change': p99,
+            'queries_change': queries,
+            'regression': throughput < -threshold or p99 > threshold or queries > 0,
+        })
+    return comparisons
+
+
+def run_suite(users, departments, requests, scenarios=None, warmup=5):
+    """Seeds the current database and drives every scenario.
+
+    Args:
+        users (int): Users to seed
+        departments (int): Departments to seed
+        requests (int): Measured requests per scenario
+        scenarios (list): Names from SCENARIOS, all of them by default
+        warmup (int): Requests sent before measuring each scenario
+
+    Returns:
+        list: The result of run_scenario for each scenario
+    """
+    # Whatever order they were asked in, see SCENARIOS
+    names = sorted(scenarios or SCENARIOS, key=lambda name: name == DeleteScenario.name)
+    if 'delete' in names and users < requests + warmup:
+        raise ValueError('The delete scenario needs at least %d users.' % (requests + warmup))
+
+    fixtures = seed(users, departments)
+    # Measures the views, not how fast the login limits reject them. Only
+    # the primary has a test database, the replicas are the real ones.
+    with override_settings(USERS_THROTTLE_RATES={}, USERS_DATABASE_REPLICAS=[]):
+        return [run_scenario(SCENARIOS[name], fixtures, requests, warmup) for name in names]
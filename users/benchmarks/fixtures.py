@@ -0,0 +1,53 @@
+from django.contrib.auth.hashers import make_password
+
+from users.models import Department, User
+from users.tokens import issue_token
+
+PASSWORD = '123ABCde'
+
+
+def seed(users, departments, batch_size=1000):
+    """Fills the database with users spread across departments.
+
+    Every user shares one precomputed password hash, so seeding costs a
+    single hash whatever the number of users.
+
+    Args:
+        users (int): Number of ordinary users
+        departments (int): Number of departments
+        batch_size (int): Rows per INSERT
+
+    Returns:
+        dict: The staff user, its token key, a user to log in with, the
+        department ids and the ids of the ordinary users
+    """
+    Department.objects.bulk_create(
+        [Department(department='Department %d' % number) for number in range(departments)],
+        batch_size=batch_size)
+    department_ids = list(Department.objects.order_by('id').values_list('id', flat=True))
+
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        [User(email='seed%d@bench.test' % number,
+              full_name='Seed User',
+              password=password,
+              department_id=department_ids[number % len(department_ids)])
+         for number in range(users)],
+        batch_size=batch_size)
+
+    staff = User.objects.create_user(
+        'staff@bench.test', PASSWORD, full_name='Staff User',
+        department_id=department_ids[0], is_staff=True)
+    token = issue_token(staff)
+    # Logs in while the staff user has his password changed
+    login = User.objects.create_user(
+        'login@bench.test', PASSWORD, full_name='Login User', department_id=department_ids[0])
+    user_ids = list(User.objects.filter(is_staff=False).exclude(pk=login.pk)
+                    .order_by('id').values_list('id', flat=True))
+    return {
+        'staff': staff,
+        'token': token.key,
+        'login': login,
+        'department_ids': department_ids,
+        'user_ids': user_ids,
+    }
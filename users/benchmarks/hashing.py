@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hashers
+from django.utils.crypto import get_random_string
+
+from users.benchmarks import measure
+from users.hashing import ConfigurablePBKDF2PasswordHasher
+
+PASSWORD = '123ABCde'
+
+
+def _pbkdf2_encoder(iterations):
+    hasher = ConfigurablePBKDF2PasswordHasher()
+    return lambda: hasher.encode(PASSWORD, get_random_string(12), iterations)
+
+
+def _hasher_encoder(hasher):
+    return lambda: hasher.encode(PASSWORD, hasher.salt())
+
+
+def _throughput(encode, workers, seconds):
+    """Hashes per second with the given number of pool threads."""
+    if workers <= 1:
+        return measure(encode, seconds)['per_second']
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        batch = workers * 4
+        result = measure(lambda: list(pool.map(lambda _: encode(), range(batch))), seconds, 1)
+    return result['per_second'] * batch
+
+
+def configurations(iterations, include_installed=True):
+    """Yields (name, parameters, encode) for every configuration to measure."""
+    for count in iterations:
+        yield 'pbkdf2_sha256', {'iterations': count}, _pbkdf2_encoder(count)
+
+    if not include_installed:
+        return
+    for hasher in get_hashers():
+        if hasher.algorithm.startswith('pbkdf2'):
+            continue
+        try:
+            hasher._load_library()
+        except ValueError:
+            continue
+        yield hasher.algorithm, {}, _hasher_encoder(hasher)
+
+
+def run(iterations, workers, seconds=1.0, include_installed=True):
+    """Measures hashes per second of each hasher configuration.
+
+    Args:
+        iterations (list): PBKDF2 iteration counts to measure
+        workers (list): Pool sizes to measure each configuration with
+        seconds (float): Time spent on each measurement
+        include_installed (bool): Also measure the other configured hashers
+            whose library is installed, at their default cost
+
+    Returns:
+        list: One dict per (configuration, pool size)
+    """
+    results = []
+    for algorithm, parameters, encode in configurations(iterations, include_installed):
+        encode()
+        for count in workers:
+            results.append({
+                'algorithm': algorithm,
+                'parameters': parameters,
+                'workers': count,
+                'hashes_per_second': _throughput(encode, count, seconds),
+            })
+    return results
@@ -0,0 +1,62 @@
+from django.contrib.auth.models import Group
+from rest_framework.renderers import JSONRenderer
+
+from users.api.plans import plan_for
+from users.api.serializers import DepartmentSerializer, ProfileDetailSerializer, ProfileListSerializer
+from users.benchmarks import measure
+from users.benchmarks.fixtures import seed
+from users.models import Department, User
+
+# The querysets the views read before field plans
+CASES = (
+    ('profile', ProfileListSerializer, lambda: User.objects.only('id', 'full_name')),
+    ('profile_detail', ProfileDetailSerializer,
+     lambda: User.objects.prefetch_related('groups', 'user_permissions')),
+    ('department', DepartmentSerializer, lambda: Department.objects.all()),
+)
+
+
+def _render_model(serializer_class, queryset):
+    return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+
+def _render_plan(serializer_class, queryset):
+    return JSONRenderer().render(plan_for(serializer_class).serialize(queryset))
+
+
+def run(sizes=(1, 10, 100, 1000), seconds=0.5):
+    """Seeds the current database and renders each read serializer's JSON
+    with the ModelSerializer and with its field plan, for growing lists.
+
+    Args:
+        sizes (tuple): Rows rendered per call
+        seconds (float): Time spent on each measurement
+
+    Returns:
+        list: One dict per (serializer, rows, variant) with the
+        microseconds per row
+
+    Raises:
+        ValueError: When the two variants render different JSON
+    """
+    largest = max(sizes)
+    seed(largest, largest)
+    group = Group.objects.create(name='Benchmark')
+    group.user_set.add(*User.objects.order_by('id')[:largest // 2])
+
+    results = []
+    for name, serializer_class, queryset in CASES:
+        for rows in sizes:
+            page = queryset().order_by('id')[:rows]
+            if _render_model(serializer_class, page) != _render_plan(serializer_class, page):
+                raise ValueError('The field plan of %s renders different JSON.' % serializer_class.__name__)
+            for variant, render in (('model', _render_model), ('plan', _render_plan)):
+                # A fresh queryset each time, an evaluated one caches its rows
+                result = measure(lambda: render(serializer_class, page.all()), seconds)
+                results.append({
+                    'serializer': name,
+                    'rows': rows,
+                    'variant': variant,
+                    'us_per_row': 1e6 / (result['per_second'] * rows),
+                })
+    return results
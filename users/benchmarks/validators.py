@@ -0,0 +1,62 @@
+import re
+
+from users.api.validators import email_validator, full_name_validator, password_validator
+from users.benchmarks import measure
+
+FULL_NAMES = ['Ana', 'User Numberone', 'Maria da Silva', 'R2D2', 'Jose Carlos Pereira', '']
+PASSWORDS = ['123ABCde', 'password', 'Short1', 'LongerPassword123', 'Abcdefg1', 'ABCDEFGH12']
+EMAILS = ['ana@example.com', 'user.one@company.com.br', 'not-an-email', 'a@b', 'x' * 70 + '@example.com']
+
+
+def _legacy_full_name(full_name):
+    full_name = full_name.replace(" ", "")
+    return full_name.isalpha()
+
+
+def _legacy_password(password):
+    return re.fullmatch('(?=.*\\d)(?=.*[a-z])(?=.*[A-Z]).{8,16}', password)
+
+
+def _columns(rows):
+    repeat = -(-rows // len(FULL_NAMES))
+    return {
+        'full_name': (FULL_NAMES * repeat)[:rows],
+        'password': (PASSWORDS * repeat)[:rows],
+        'email': (EMAILS * (-(-rows // len(EMAILS))))[:rows],
+    }
+
+
+def implementations():
+    """Yields (field, variant, validate) where validate checks a whole column."""
+    yield 'full_name', 'legacy', lambda values: [_legacy_full_name(value) for value in values]
+    yield 'full_name', 'single', lambda values: [full_name_validator(value) for value in values]
+    yield 'full_name', 'batch', full_name_validator.validate_many
+    yield 'password', 'legacy', lambda values: [_legacy_password(value) for value in values]
+    yield 'password', 'single', lambda values: [password_validator(value) for value in values]
+    yield 'password', 'batch', password_validator.validate_many
+    yield 'email', 'single', lambda values: [email_validator(value) for value in values]
+    yield 'email', 'batch', email_validator.validate_many
+
+
+def run(rows=10000, seconds=0.5):
+    """Measures the cost of each validator, one value at a time and per column.
+
+    Args:
+        rows (int): Size of the column validated on each run
+        seconds (float): Time spent on each measurement
+
+    Returns:
+        list: One dict per (field, variant) with the nanoseconds per value
+    """
+    columns = _columns(rows)
+    results = []
+    for field, variant, validate in implementations():
+        values = columns[field]
+        result = measure(lambda: validate(values), seconds)
+        results.append({
+            'field': field,
+            'variant': variant,
+            'rows': rows,
+            'ns_per_value': 1e9 / (result['per_second'] * rows),
+        })
+    return results
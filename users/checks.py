@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core import checks
+
+# Backends whose entries other processes never see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@checks.register(checks.Tags.caches)
+def check_idempotency_cache(app_configs, **kwargs):
+    """The idempotency keys only hold when every worker sees them."""
+    alias = getattr(settings, 'USERS_IDEMPOTENCY_CACHE_ALIAS', 'shared')
+    config = settings.CACHES.get(alias)
+    if config is None:
+        return [checks.Error(
+            'USERS_IDEMPOTENCY_CACHE_ALIAS %r is not in CACHES.' % alias,
+            id='users.E001')]
+    if config['BACKEND'] in PROCESS_LOCAL_CACHES:
+        return [checks.Error(
+            'USERS_IDEMPOTENCY_CACHE_ALIAS %r is local to each process.' % alias,
+            hint='Use a cache shared by every worker, such as the database, '
+                 'Memcached or Redis.',
+            id='users.E002')]
+    return []
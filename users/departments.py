@@ -0,0 +1,193 @@
+"""Department member counts and cascade deletes.
+
+Department.member_count follows every User save and delete through
+users.signals. Writes that skip the signals (bulk_create, QuerySet.update
+and QuerySet.delete) adjust the counts with add_members, or recount them
+afterwards with recount_members.
+
+Large departments are deleted by a job on the department_deletions queue,
+see schedule_deletion.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from users.jobs import department_deletions
+from users.models import AuthToken, Department, DepartmentDeletionJob, User
+
+_paused = contextvars.ContextVar('users_member_counts_paused', default=False)
+
+
+@contextmanager
+def member_counts_paused():
+    """Stops the signals from counting members inside the block, for code
+    that fixes the counts itself once it is done."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def counting_paused():
+    return _paused.get()
+
+
+def add_members(department_id, count):
+    """Adds count, or removes it when negative, from a department's members.
+
+    Args:
+        department_id (int): The department, None is ignored
+        count (int): Number of members that joined or left
+    """
+    if department_id is None or not count:
+        return
+    if count > 0:
+        Department.objects.filter(pk=department_id).update(member_count=F('member_count') + count)
+    else:
+        # Never below zero, a recount fixes any drift
+        Department.objects.filter(pk=department_id, member_count__gte=-count).update(
+            member_count=F('member_count') + count)
+
+
+def move_member(old_department_id, new_department_id):
+    """Counts a user leaving one department and joining another."""
+    if old_department_id == new_department_id:
+        return
+    add_members(old_department_id, -1)
+    add_members(new_department_id, 1)
+
+
+def recount_members(department_ids=None):
+    """Sets member_count from the users table.
+
+    Args:
+        department_ids (iterable): Departments to fix, every one by default
+
+    Returns:
+        int: Number of departments updated
+    """
+    members = (User.all_objects.filter(department=OuterRef('pk'), is_active=True)
+               .order_by().values('department')
+               .annotate(total=Count('pk')).values('total'))
+    departments = Department.all_objects.all()
+    if department_ids is not None:
+        departments = departments.filter(pk__in=list(department_ids))
+    updated = departments.update(
+        member_count=Coalesce(Subquery(members, output_field=IntegerField()), 0))
+    return updated
+
+
+def cascade_preview(department):
+    """Counts the rows deleting a department would remove.
+
+    Returns:
+        dict: Rows per table that the cascade reaches
+    """
+    users = User.all_objects.filter(department=department)
+    return {
+        'department': department.pk,
+        'users': users.count(),
+        'tokens': (Token.objects.filter(user__department=department).count()
+                   + AuthToken.objects.filter(user__department=department).count()),
+        'group_links': User.groups.through.objects.filter(user__department=department).count(),
+        'permission_links': User.user_permissions.through.objects.filter(
+            user__department=department).count(),
+    }
+
+
+def delete_department(department, batch_size=None, progress=None):
+    """Deletes the members of a department batch by batch, then the department.
+
+    Each batch is its own transaction, so locks are held for one batch at a
+    time and memory holds one batch of users. Deleted users still send
+    post_delete, so their cached tokens are dropped.
+
+    Args:
+        department (Department): The department to delete
+        batch_size (int): Users deleted per transaction
+        progress (callable): Called with the size of each deleted batch
+
+    Returns:
+        int: Number of users deleted
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'USERS_DEPARTMENT_DELETE_BATCH_SIZE', 1000)
+    batch_size = max(1, int(batch_size))
+
+    deleted = 0
+    with member_counts_paused():
+        while True:
+            with transaction.atomic():
+                ids = list(User.all_objects.filter(department=department)
+                           .order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                User.all_objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+            if progress is not None:
+                progress(len(ids))
+        department.delete()
+    return deleted
+
+
+def schedule_deletion(department):
+    """Hides the department right away and queues a job deleting it.
+
+    Returns:
+        DepartmentDeletionJob: The job, its members are removed once the
+        transaction commits
+    """
+    with transaction.atomic():
+        department.is_deleted = True
+        department.save(update_fields=['is_deleted'])
+        job = DepartmentDeletionJob.objects.create(
+            department_id=department.pk,
+            department_name=department.department,
+            total=department.member_count)
+        transaction.on_commit(partial(department_deletions.put, run_deletion_job, job.pk))
+    return job
+
+
+def run_deletion_job(job_id, batch_size=None):
+    """Runs a deletion job, recording its progress after every batch.
+
+    A failed or interrupted job can be run again, it carries on with the
+    members that are left.
+
+    Returns:
+        DepartmentDeletionJob: The finished job
+
+    Raises:
+        Exception: The error that failed the job, once it is recorded
+    """
+    job = DepartmentDeletionJob.objects.get(pk=job_id)
+    if job.status == DepartmentDeletionJob.DONE:
+        return job
+
+    job.status = DepartmentDeletionJob.RUNNING
+    job.started_at = timezone.now()
+    job.error = ''
+    job.save(update_fields=['status', 'started_at', 'error'])
+
+    jobs = DepartmentDeletionJob.objects.filter(pk=job.pk)
+    department = Department.all_objects.filter(pk=job.department_id).first()
+    try:
+        if department is not None:
+            delete_department(department, batch_size,
+                              progress=lambda count: jobs.update(deleted=F('deleted') + count))
+    except Exception as exc:
+        jobs.update(status=DepartmentDeletionJob.FAILED, error=str(exc), finished_at=timezone.now())
+        raise
+    else:
+        jobs.update(status=DepartmentDeletionJob.DONE, finished_at=timezone.now())
+    finally:
+        job.refresh_from_db()
+    return job
@@ -0,0 +1,92 @@
+import csv
+
+from django.conf import settings
+
+from users.api.encoding import dumps
+from users.api.renderers import StreamingJSONRenderer
+from users.models import User
+
+# (header, queryset path) of every exported column
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('email', 'email'),
+    ('full_name', 'full_name'),
+    ('is_active', 'is_active'),
+    ('is_staff', 'is_staff'),
+    ('department_id', 'department_id'),
+    ('department', 'department__department'),
+)
+
+
+class Echo:
+    """ File-like object whose write returns the value instead of storing it """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(chunk_size=None):
+    """Streams every user joined to his department as tuples.
+
+    Args:
+        chunk_size (int): Rows fetched from the database at a time
+
+    Returns:
+        iterator: One tuple per user, in the order of EXPORT_COLUMNS
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'USERS_EXPORT_CHUNK_SIZE', 2000)
+    queryset = User.all_objects.order_by('id').values_list(
+        *[path for header, path in EXPORT_COLUMNS])
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, path in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+    headers = [header for header, path in EXPORT_COLUMNS]
+    for row in rows:
+        yield dumps(dict(zip(headers, row))).decode('utf-8') + '\n'
+
+
+def json_lines(rows):
+    headers = [header for header, path in EXPORT_COLUMNS]
+    users = (dict(zip(headers, row)) for row in rows)
+    for piece in StreamingJSONRenderer().stream(users):
+        yield piece.decode('utf-8')
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_lines, 'text/csv; charset=utf-8'),
+    'jsonl': (jsonl_lines, 'application/jsonl; charset=utf-8'),
+    'json': (json_lines, 'application/json'),
+}
+
+
+def export_chunks(output, chunk_size=None):
+    """Renders the export in pieces of about chunk_size rows, so the
+    server writes few large chunks instead of one per row.
+
+    Args:
+        output (str): One of EXPORT_FORMATS
+        chunk_size (int): Rows fetched and written at a time
+
+    Returns:
+        iterator: Text chunks of the export
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'USERS_EXPORT_CHUNK_SIZE', 2000)
+    render, content_type = EXPORT_FORMATS[output]
+    pending = []
+    for line in render(export_rows(chunk_size)):
+        pending.append(line)
+        if len(pending) >= chunk_size:
+            yield ''.join(pending)
+            pending = []
+    if pending:
+        yield ''.join(pending)
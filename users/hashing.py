@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import (PBKDF2PasswordHasher, check_password,
+                                         make_password)
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_thread_pool = None
+_thread_pool_lock = threading.Lock()
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """ PBKDF2 hasher whose cost is read from USERS_PBKDF2_ITERATIONS.
+    Changing the setting makes the next successful login rehash the
+    password with the new cost """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'USERS_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+def get_thread_pool():
+    """Returns the bounded pool hashing runs on.
+
+    hashlib releases the GIL while it hashes, so threads hash in parallel
+    without the cost of moving work to another process.
+
+    Returns:
+        ThreadPoolExecutor: USERS_PASSWORD_HASH_WORKERS threads
+    """
+    global _thread_pool
+    if _thread_pool is None:
+        with _thread_pool_lock:
+            if _thread_pool is None:
+                _thread_pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'USERS_PASSWORD_HASH_WORKERS', 4),
+                    thread_name_prefix='password-hash')
+    return _thread_pool
+
+
+def _init_hash_process(settings_module):
+    """Makes Django usable inside a spawned hashing process."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def get_process_pool(workers):
+    """Returns the shared process pool used to hash large batches.
+
+    Args:
+        workers (int): Number of processes, 0 or 1 hashes in the caller
+
+    Returns:
+        ProcessPoolExecutor: The pool, or None when hashing runs inline
+    """
+    if not workers or workers < 2:
+        return None
+    with _process_pools_lock:
+        if workers not in _process_pools:
+            _process_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_hash_process,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'core.settings'),))
+        return _process_pools[workers]
+
+
+def hash_passwords(passwords, executor=None, workers=1):
+    """Hashes a list of raw passwords, in parallel when a pool is given.
+
+    Args:
+        passwords (list): Raw passwords
+        executor: Optional pool from get_process_pool or get_thread_pool
+        workers (int): Size of the pool, to split the work between its workers
+
+    Returns:
+        list: Encoded passwords in the same order
+    """
+    if executor is None or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (max(1, workers) * 4))
+    return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+
+async def make_password_async(password):
+    """Hashes a password on the pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), make_password, password)
+
+
+async def check_password_async(user, raw_password):
+    """Checks a password on the pool without blocking the event loop.
+
+    Args:
+        user (User): The user whose password is checked
+        raw_password (str): The password sent by the client
+
+    Returns:
+        boolean: True if the password matches
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), user.check_password, raw_password)
+
+
+def rehash_password(user_pk, encoded, raw_password):
+    """Stores the password hashed with the current hasher settings.
+
+    The update only applies while the stored hash is still the one that was
+    checked, so a password changed in the meantime is never overwritten.
+
+    Args:
+        user_pk (int): The user to update
+        encoded (str): The hash the password was verified against
+        raw_password (str): The verified password
+    """
+    from users.models import User
+
+    User.objects.filter(pk=user_pk, password=encoded).update(
+        password=make_password(raw_password))
+
+
+def _rehash_password_in_background(user_pk, encoded, raw_password):
+    try:
+        rehash_password(user_pk, encoded, raw_password)
+    finally:
+        close_old_connections()
+
+
+def schedule_rehash(user_pk, encoded, raw_password):
+    """Rehashes a password after a successful login.
+
+    With USERS_PASSWORD_REHASH_IN_BACKGROUND the work runs on the pool
+    and the response doesn't wait for it.
+    """
+    if not getattr(settings, 'USERS_PASSWORD_REHASH_IN_BACKGROUND', True):
+        rehash_password(user_pk, encoded, raw_password)
+        return
+
+    future = get_thread_pool().submit(
+        _rehash_password_in_background, user_pk, encoded, raw_password)
+    future.add_done_callback(_log_rehash_failure)
+
+
+def _log_rehash_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error('Background password rehash failed', exc_info=exc)
+
+
+def check_password_with_rehash(user, raw_password):
+    """Same as AbstractBaseUser.check_password, but an outdated hash is
+    upgraded by schedule_rehash instead of a save on the caller's thread.
+
+    Returns:
+        boolean: True if the password matches
+    """
+    encoded = user.password
+
+    def setter(raw_password):
+        schedule_rehash(user.pk, encoded, raw_password)
+
+    return check_password(raw_password, encoded, setter)
@@ -0,0 +1,53 @@
+"""In-process queue for work that should not hold a request open."""
+import logging
+import queue
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Runs queued calls one at a time on a daemon thread started on first use.
+
+    The queue only lives in this process, work still queued when it exits
+    is lost, so callers keep their own record of what is left to do.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, func, *args):
+        self._start()
+        self._queue.put((func, args))
+
+    def join(self):
+        """Blocks until every queued call has run."""
+        self._queue.join()
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            func, args = self._queue.get()
+            close_old_connections()
+            try:
+                func(*args)
+            except Exception:
+                logger.exception('Job %s%r failed', getattr(func, '__name__', func), args)
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+
+department_deletions = JobQueue('department-deletions')
@@ -0,0 +1,100 @@
+"""Soft deletion of users and the purge that deletes them for good.
+
+A soft delete only updates the user and removes his tokens, so it stays
+cheap however many groups and permissions he has. The rows a real delete
+cascades into are removed later, in batches, by purge_users.
+
+update_users changes many users with one UPDATE, for the admin actions.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from users.api.authentication import token_cache
+from users.departments import recount_members
+from users.models import AuthToken, User
+from users.search import user_index
+
+
+def soft_delete_user(user):
+    """Deactivates the user and revokes his tokens.
+
+    Saving the user drops his cached credentials and takes him out of his
+    department's member count (see users.signals).
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.deleted_at = timezone.now()
+        user.save(update_fields=['is_active', 'deleted_at'])
+        Token.objects.filter(user=user).delete()
+        AuthToken.objects.filter(user=user).delete()
+
+
+def purgeable_users(days=None):
+    """Soft deleted users that were deleted at least days ago."""
+    if days is None:
+        days = getattr(settings, 'USERS_PURGE_AFTER_DAYS', 30)
+    cutoff = timezone.now() - timedelta(days=days)
+    return User.all_objects.filter(is_active=False, deleted_at__lte=cutoff)
+
+
+def purge_users(days=None, batch_size=None):
+    """Deletes the soft deleted users, one transaction per batch.
+
+    Users deactivated without being deleted, in the admin for instance,
+    have no deleted_at and are kept.
+
+    Args:
+        days (int): Only users deleted at least this many days ago
+        batch_size (int): Users deleted per transaction
+
+    Returns:
+        int: Number of users deleted
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'USERS_PURGE_BATCH_SIZE', 1000)
+    batch_size = max(1, int(batch_size))
+    users = purgeable_users(days)
+
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(users.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            User.all_objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+    return deleted
+
+
+def update_users(queryset, **changes):
+    """Applies changes to every user of the queryset with a single UPDATE.
+
+    QuerySet.update sends no signals, so the member counts of the
+    departments involved are recounted, and the cached credentials and
+    search entries of the users updated, here instead.
+
+    Args:
+        queryset (QuerySet): The users to change
+        **changes: Values by column, e.g. is_active=False or department_id=3
+
+    Returns:
+        int: Number of users updated
+    """
+    with transaction.atomic():
+        rows = list(queryset.order_by().values_list('pk', 'department_id'))
+        updated = queryset.update(version=F('version') + 1, **changes)
+        departments = {department_id for _, department_id in rows}
+        departments.add(changes.get('department_id'))
+        departments.discard(None)
+        if departments:
+            recount_members(departments)
+
+    for pk, _ in rows:
+        token_cache.invalidate_user(pk)
+    user_index.refresh([pk for pk, _ in rows])
+    return updated
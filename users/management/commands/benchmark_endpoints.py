@@ -0,0 +1,75 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from users.benchmarks import endpoints, write_results
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database and reports requests/sec, p50/p99 '
+            'latency and queries per request of each users/departments route.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Users to seed.')
+        parser.add_argument('--departments', type=int, default=10, help='Departments to seed.')
+        parser.add_argument('--requests', type=int, default=100, help='Measured requests per scenario.')
+        parser.add_argument(
+            '--scenario', dest='scenarios', action='append', choices=sorted(endpoints.SCENARIOS),
+            help='Scenario to run, may be repeated. Every scenario by default.')
+        parser.add_argument('--json', dest='path', help='Save the results to this file.')
+        parser.add_argument('--compare', help='Results of a previous run to compare against.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.1,
+            help='Relative slowdown reported as a regression, 0.1 by default.')
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Exit with an error when a regression is found.')
+
+    def handle(self, *args, **options):
+        # Expected 4xx answers would otherwise be logged on every request
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = endpoints.run_suite(
+                options['users'], options['departments'], options['requests'], options['scenarios'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write('%-16s %10s %10s %10s %10s %9s' % (
+            'scenario', 'req/sec', 'p50 ms', 'p99 ms', 'queries', 'failures'))
+        for result in results:
+            self.stdout.write('%-16s %10.1f %10.2f %10.2f %10.1f %9d' % (
+                result['scenario'], result['requests_per_second'], result['p50_ms'],
+                result['p99_ms'], result['queries_per_request'], result['failures']))
+
+        if options['path']:
+            write_results(options['path'], 'endpoints', results)
+
+        if options['compare']:
+            self.report_comparison(results, options)
+
+    def report_comparison(self, results, options):
+        try:
+            with open(options['compare'], encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)['results']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError('Cannot read %s: %s' % (options['compare'], exc))
+
+        comparisons = endpoints.compare(results, baseline, options['threshold'])
+        self.stdout.write('')
+        self.stdout.write('%-16s %12s %10s %10s' % ('scenario', 'throughput', 'p99', 'queries'))
+        for comparison in comparisons:
+            self.stdout.write('%-16s %+11.1f%% %+9.1f%% %+10.1f%s' % (
+                comparison['scenario'], comparison['throughput_change'] * 100,
+                comparison['p99_change'] * 100, comparison['queries_change'],
+                '  REGRESSION' if comparison['regression'] else ''))
+
+        if options['fail_on_regression'] and any(c['regression'] for c in comparisons):
+            raise CommandError('Performance regression against %s.' % options['compare'])
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.benchmarks import hashing, write_results
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+class Command(BaseCommand):
+    help = 'Reports password hashes per second for each hasher configuration.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int_list,
+            default=[100000, getattr(settings, 'USERS_PBKDF2_ITERATIONS', 216000), 390000],
+            help='Comma separated PBKDF2 iteration counts.')
+        parser.add_argument(
+            '--workers', type=int_list,
+            default=[1, getattr(settings, 'USERS_PASSWORD_HASH_WORKERS', 4)],
+            help='Comma separated pool sizes.')
+        parser.add_argument(
+            '--seconds', type=float, default=1.0,
+            help='Time spent on each measurement.')
+        parser.add_argument(
+            '--json', dest='path',
+            help='Also save the results to this file.')
+
+    def handle(self, *args, **options):
+        results = hashing.run(options['iterations'], options['workers'], options['seconds'])
+
+        self.stdout.write('%-16s %-20s %8s %14s' % ('algorithm', 'parameters', 'workers', 'hashes/sec'))
+        for result in results:
+            parameters = ','.join('%s=%s' % item for item in result['parameters'].items())
+            self.stdout.write('%-16s %-20s %8d %14.1f' % (
+                result['algorithm'], parameters or '-', result['workers'], result['hashes_per_second']))
+
+        if options['path']:
+            write_results(options['path'], 'hashing', results)
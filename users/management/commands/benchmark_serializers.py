@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from users.benchmarks import serializers, write_results
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway test database and compares the cost per row of the '
+            'read serializers with their field plans, for growing list sizes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, action='append',
+            help='Rows per list, may be repeated. 1, 10, 100 and 1000 by default.')
+        parser.add_argument(
+            '--seconds', type=float, default=0.5,
+            help='Time spent on each measurement.')
+        parser.add_argument(
+            '--json', dest='path',
+            help='Also save the results to this file.')
+
+    def handle(self, *args, **options):
+        sizes = tuple(options['rows'] or (1, 10, 100, 1000))
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            results = serializers.run(sizes, options['seconds'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        model = {(r['serializer'], r['rows']): r['us_per_row'] for r in results if r['variant'] == 'model'}
+        self.stdout.write('%-16s %8s %-8s %12s %9s' % ('serializer', 'rows', 'variant', 'us/row', 'speedup'))
+        for result in results:
+            self.stdout.write('%-16s %8d %-8s %12.2f %8.1fx' % (
+                result['serializer'], result['rows'], result['variant'], result['us_per_row'],
+                model[result['serializer'], result['rows']] / result['us_per_row']))
+
+        if options['path']:
+            write_results(options['path'], 'serializers', results)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from users.benchmarks import validators, write_results
+
+
+class Command(BaseCommand):
+    help = 'Reports the cost per value of the field validators.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=10000,
+            help='Size of the column validated on each run.')
+        parser.add_argument(
+            '--seconds', type=float, default=0.5,
+            help='Time spent on each measurement.')
+        parser.add_argument(
+            '--json', dest='path',
+            help='Also save the results to this file.')
+
+    def handle(self, *args, **options):
+        results = validators.run(options['rows'], options['seconds'])
+
+        self.stdout.write('%-12s %-8s %14s' % ('field', 'variant', 'ns/value'))
+        for result in results:
+            self.stdout.write('%-12s %-8s %14.1f' % (
+                result['field'], result['variant'], result['ns_per_value']))
+
+        if options['path']:
+            write_results(options['path'], 'validators', results)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from users.exports import EXPORT_FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = 'Streams every user and his department as CSV, JSON Lines or a JSON array.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', dest='output', choices=sorted(EXPORT_FORMATS), default='csv',
+            help='Output format, csv by default.')
+        parser.add_argument(
+            '--output', dest='path',
+            help='File to write to, the standard output by default.')
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Rows fetched from the database at a time.')
+
+    def handle(self, *args, **options):
+        chunks = export_chunks(options['output'], options['chunk_size'])
+        if not options['path']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['path'], 'w', encoding='utf-8', newline='') as export_file:
+            for chunk in chunks:
+                export_file.write(chunk)
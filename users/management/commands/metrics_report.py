@@ -0,0 +1,89 @@
+import json
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from users.metrics import percentile
+
+
+def summarize(records):
+    """Aggregates JSON request records by endpoint and method.
+
+    Args:
+        records (iterable): dicts logged by MetricsMiddleware
+
+    Returns:
+        list: One summary dict per endpoint, slowest p99 first
+    """
+    grouped = defaultdict(list)
+    for record in records:
+        grouped[(record['endpoint'], record['method'])].append(record)
+
+    summaries = []
+    for (endpoint, method), group in grouped.items():
+        durations = sorted(record['duration'] for record in group)
+        count = len(group)
+        summaries.append({
+            'endpoint': endpoint,
+            'method': method,
+            'requests': count,
+            'errors': sum(1 for record in group if record['status'] >= 500),
+            'p50': percentile(durations, 0.50),
+            'p90': percentile(durations, 0.90),
+            'p99': percentile(durations, 0.99),
+            'queries': sum(record['queries'] for record in group) / count,
+            'query_time': sum(record['query_time'] for record in group) / count,
+            'serializer_time': sum(record['serializer_time'] for record in group) / count,
+        })
+    summaries.sort(key=lambda summary: summary['p99'], reverse=True)
+    return summaries
+
+
+def read_records(lines):
+    for line in lines:
+        start = line.find('{')
+        if start < 0:
+            continue
+        try:
+            yield json.loads(line[start:])
+        except ValueError:
+            continue
+
+
+class Command(BaseCommand):
+    help = 'Summarizes the JSON request log written with USERS_METRICS_JSON_LOG.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Log files to read, the standard input when none is given.')
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the summary as JSON instead of a table.')
+
+    def handle(self, *args, **options):
+        records = []
+        try:
+            for path in options['paths'] or ['-']:
+                if path == '-':
+                    records.extend(read_records(sys.stdin))
+                    continue
+                with open(path, encoding='utf-8') as log_file:
+                    records.extend(read_records(log_file))
+        except OSError as exc:
+            raise CommandError(exc)
+
+        summaries = summarize(records)
+        if options['json']:
+            self.stdout.write(json.dumps(summaries, indent=2))
+            return
+
+        self.stdout.write('%-40s %-6s %8s %9s %9s %9s %8s %9s %9s' % (
+            'endpoint', 'method', 'requests', 'p50 ms', 'p90 ms', 'p99 ms',
+            'queries', 'sql ms', 'ser ms'))
+        for summary in summaries:
+            self.stdout.write('%-40s %-6s %8d %9.2f %9.2f %9.2f %8.1f %9.2f %9.2f' % (
+                summary['endpoint'][:40], summary['method'], summary['requests'],
+                summary['p50'] * 1000, summary['p90'] * 1000, summary['p99'] * 1000,
+                summary['queries'], summary['query_time'] * 1000,
+                summary['serializer_time'] * 1000))
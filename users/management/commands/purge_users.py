@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from users.lifecycle import purge_users, purgeable_users
+
+
+class Command(BaseCommand):
+    help = 'Deletes for good the users that deleted their profile, meant to run periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Only users deleted at least this many days ago, USERS_PURGE_AFTER_DAYS by default.')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Users deleted per transaction.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many users would be deleted.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write('%d users would be purged.' % purgeable_users(options['days']).count())
+            return
+
+        deleted = purge_users(options['days'], options['batch_size'])
+        self.stdout.write('Purged %d users.' % deleted)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from users.departments import recount_members
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the member count of every department from the users table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'department_ids', nargs='*', type=int,
+            help='Departments to recount, all of them by default.')
+
+    def handle(self, *args, **options):
+        updated = recount_members(options['department_ids'] or None)
+        self.stdout.write('Recounted %d departments.' % updated)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.audit import audit_log
+
+
+class Command(BaseCommand):
+    help = ('Writes the audit events left in USERS_AUDIT_SPOOL_DIR by failed flushes '
+            'and by processes that stopped before flushing.')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'USERS_AUDIT_SPOOL_DIR', None):
+            raise CommandError('USERS_AUDIT_SPOOL_DIR is not set.')
+
+        replayed = audit_log.replay_spool(include_orphans=True)
+        self.stdout.write('Replayed %d audit events.' % replayed)
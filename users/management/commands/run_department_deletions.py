@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from users.departments import run_deletion_job
+from users.models import DepartmentDeletionJob
+
+
+class Command(BaseCommand):
+    help = ('Runs the department deletion jobs left unfinished, for instance '
+            'when the process running them stopped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Also run the jobs that failed.')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Users deleted per transaction.')
+
+    def handle(self, *args, **options):
+        statuses = [DepartmentDeletionJob.PENDING, DepartmentDeletionJob.RUNNING]
+        if options['retry_failed']:
+            statuses.append(DepartmentDeletionJob.FAILED)
+
+        for job_id in DepartmentDeletionJob.objects.filter(status__in=statuses).order_by('pk').values_list('pk', flat=True):
+            try:
+                job = run_deletion_job(job_id, options['batch_size'])
+            except Exception as exc:
+                self.stderr.write('Job %d failed: %s' % (job_id, exc))
+                continue
+            self.stdout.write('Job %d deleted %s and %d users.' % (job.pk, job.department_name, job.deleted))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from users.tokens import expired_tokens, sweep_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Deletes the expired API tokens, meant to run periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Tokens deleted per transaction, USERS_TOKEN_SWEEP_BATCH_SIZE by default.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many tokens would be deleted.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write('%d tokens would be deleted.' % expired_tokens().count())
+            return
+
+        deleted = sweep_expired_tokens(options['batch_size'])
+        self.stdout.write('Deleted %d expired tokens.' % deleted)
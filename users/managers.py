@@ -1,4 +1,5 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
 from django.utils.translation import ugettext_lazy as _
 
 
@@ -31,4 +32,19 @@ class CustomUserManager(BaseUserManager):
             raise ValueError(_('Superuser must have is_staff=True.'))
         if extra_fields.get('is_superuser') is not True:
             raise ValueError(_('Superuser must have is_superuser=True.'))
-        return self.create_user(email, password, **extra_fields)
\ No newline at end of file
+        return self.create_user(email, password, **extra_fields)
+
+class ActiveUserManager(CustomUserManager):
+    """
+    Users that are active, deactivated and soft deleted users are left out.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
+
+
+class DepartmentManager(models.Manager):
+    """
+    Departments that are not waiting to be deleted by a background job.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
@@ -0,0 +1,177 @@
+import bisect
+import contextvars
+import math
+import threading
+import time
+from collections import defaultdict
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = contextvars.ContextVar('users_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """ What one sampled request spent on the database and in serializers """
+
+    __slots__ = ('queries', 'query_time', 'serializer_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper, see connection.execute_wrapper."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Database execute wrapper installed on every connection, counts the
+    query for the sampled request of the current context, if any.
+
+    Context variables follow a request into sync_to_async and the database
+    pool of the async views, so queries are counted whichever thread runs
+    them.
+    """
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+def start_request():
+    """Starts collecting for the current request.
+
+    Returns:
+        tuple: The RequestMetrics and the token to pass to finish_request
+    """
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current_request():
+    """Returns the RequestMetrics of the sampled request being served, or None."""
+    return _current.get()
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of an already sorted list, 0.0 when it
+    is empty."""
+    if not values:
+        return 0.0
+    # Rounded first, 0.07 * 100 is 7.000000000000001
+    rank = math.ceil(round(fraction * len(values), 9))
+    index = min(len(values) - 1, max(0, rank - 1))
+    return values[index]
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Per endpoint metrics of the sampled requests, kept in memory and
+    exposed in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.latency = {}
+            self.queries = {}
+            self.query_time = defaultdict(float)
+            self.serializer_time = defaultdict(float)
+
+    def observe(self, endpoint, method, status, duration, metrics):
+        """Records one sampled request.
+
+        Args:
+            endpoint (str): URL name or route of the resolved view
+            method (str): HTTP method
+            status (int): Response status code
+            duration (float): Seconds spent serving the request
+            metrics (RequestMetrics): Database and serializer time of the request
+        """
+        key = (endpoint, method)
+        with self._lock:
+            self.requests[key + (str(status),)] += 1
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.queries[key] = Histogram(QUERY_BUCKETS)
+            self.latency[key].observe(duration)
+            self.queries[key].observe(metrics.queries)
+            self.query_time[key] += metrics.query_time
+            self.serializer_time[key] += metrics.serializer_time
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            lines.append('# HELP users_http_requests_total Sampled requests by endpoint and status.')
+            lines.append('# TYPE users_http_requests_total counter')
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append('users_http_requests_total{%s,status="%s"} %d' % (
+                    _labels(endpoint, method), status, count))
+
+            self._render_histogram(
+                lines, 'users_http_request_duration_seconds',
+                'Latency of the sampled requests.', self.latency)
+            self._render_histogram(
+                lines, 'users_db_queries_per_request',
+                'SQL queries issued by each sampled request.', self.queries)
+
+            for name, help_text, values in (
+                    ('users_db_query_duration_seconds_total',
+                     'Time spent executing SQL.', self.query_time),
+                    ('users_serializer_duration_seconds_total',
+                     'Time spent in serializer to_representation.', self.serializer_time)):
+                lines.append('# HELP %s %s' % (name, help_text))
+                lines.append('# TYPE %s counter' % name)
+                for (endpoint, method), value in sorted(values.items()):
+                    lines.append('%s{%s} %.6f' % (name, _labels(endpoint, method), value))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histogram(lines, name, help_text, histograms):
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s histogram' % name)
+        for (endpoint, method), histogram in sorted(histograms.items()):
+            labels = _labels(endpoint, method)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, cumulative))
+            lines.append('%s_bucket{%s,le="+Inf"} %d' % (name, labels, histogram.count))
+            lines.append('%s_sum{%s} %.6f' % (name, labels, histogram.sum))
+            lines.append('%s_count{%s} %d' % (name, labels, histogram.count))
+
+
+def _labels(endpoint, method):
+    endpoint = endpoint.replace('\\', '\\\\').replace('"', '\\"')
+    return 'endpoint="%s",method="%s"' % (endpoint, method)
+
+
+registry = MetricsRegistry()
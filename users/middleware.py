@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from users import metrics, replicas
+
+logger = logging.getLogger('users.metrics.requests')
+
+
+class MetricsMiddleware:
+    """Records latency, SQL queries and serializer time of each resolved URL.
+
+    Only a USERS_METRICS_SAMPLE_RATE fraction of the requests is measured,
+    the others pay for a single random() call. Queries are counted by
+    metrics.execute_wrapper, on every connection, from any thread serving
+    the request: under ASGI, sync views run in sync_to_async and async views
+    query through their database pool.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._is_async = asyncio.iscoroutinefunction(get_response)
+        if self._is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self._is_async:
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        request_metrics, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self._record(request, response, time.perf_counter() - start, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        request_metrics, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self._record(request, response, time.perf_counter() - start, request_metrics)
+        return response
+
+    @staticmethod
+    def _sampled():
+        rate = getattr(settings, 'USERS_METRICS_SAMPLE_RATE', 1.0)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    @staticmethod
+    def endpoint(request):
+        """Names the endpoint after its URL name, or its route when it has none."""
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.view_name if match.url_name else match.route
+
+    def _record(self, request, response, duration, request_metrics):
+        endpoint = self.endpoint(request)
+        metrics.registry.observe(
+            endpoint, request.method, response.status_code, duration, request_metrics)
+
+        if getattr(settings, 'USERS_METRICS_JSON_LOG', False):
+            logger.info(json.dumps({
+                'endpoint': endpoint,
+                'method': request.method,
+                'status': response.status_code,
+                'duration': round(duration, 6),
+                'queries': request_metrics.queries,
+                'query_time': round(request_metrics.query_time, 6),
+                'serializer_time': round(request_metrics.serializer_time, 6),
+            }))
+
+
+class PrimaryPinningMiddleware:
+    """Pins a client to the primary database right after it writes.
+
+    A request that wrote marks its client for USERS_DATABASE_PIN_SECONDS,
+    with a cookie and, for token clients that drop cookies, a cache entry
+    keyed by the Authorization header. Until then the client reads from
+    the primary, so replication lag never hides its own changes. Nothing is
+    done when no replica is configured.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'users_primary_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._is_async = asyncio.iscoroutinefunction(get_response)
+        if self._is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self._is_async:
+            return self.__acall__(request)
+        if not replicas.replica_aliases():
+            return self.get_response(request)
+
+        state, token = replicas.start_request(self._pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.finish_request(token)
+        if state.wrote:
+            self._pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not replicas.replica_aliases():
+            return await self.get_response(request)
+
+        state, token = replicas.start_request(self._pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.finish_request(token)
+        if state.wrote:
+            self._pin(request, response)
+        return response
+
+    @staticmethod
+    def _cache():
+        return caches[getattr(settings, 'USERS_DATABASE_PIN_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def _cache_key(request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        return 'users:primary-pin:%s' % hashlib.sha256(authorization.encode()).hexdigest()
+
+    def _pinned(self, request):
+        if self.cookie_name in request.COOKIES:
+            return True
+        key = self._cache_key(request)
+        return key is not None and self._cache().get(key) is not None
+
+    def _pin(self, request, response):
+        seconds = getattr(settings, 'USERS_DATABASE_PIN_SECONDS', 5)
+        response.set_cookie(self.cookie_name, '1', max_age=seconds, httponly=True, samesite='Lax')
+        key = self._cache_key(request)
+        if key is not None:
+            self._cache().set(key, 1, seconds)
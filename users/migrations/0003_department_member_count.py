@@ -0,0 +1,29 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_members(apps, schema_editor):
+    Department = apps.get_model('users', 'Department')
+    User = apps.get_model('users', 'User')
+    counts = (User.objects.filter(department__isnull=False)
+              .values('department').annotate(total=Count('pk')))
+    for row in counts:
+        Department.objects.filter(pk=row['department']).update(member_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_members, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE users_user_search USING fts5("
+    "full_name, email, content='users_user', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER users_user_search_insert AFTER INSERT ON users_user BEGIN "
+    "INSERT INTO users_user_search(rowid, full_name, email) VALUES (new.id, new.full_name, new.email); "
+    "END",
+    "CREATE TRIGGER users_user_search_delete AFTER DELETE ON users_user BEGIN "
+    "INSERT INTO users_user_search(users_user_search, rowid, full_name, email) "
+    "VALUES ('delete', old.id, old.full_name, old.email); "
+    "END",
+    "CREATE TRIGGER users_user_search_update AFTER UPDATE OF full_name, email ON users_user BEGIN "
+    "INSERT INTO users_user_search(users_user_search, rowid, full_name, email) "
+    "VALUES ('delete', old.id, old.full_name, old.email); "
+    "INSERT INTO users_user_search(rowid, full_name, email) VALUES (new.id, new.full_name, new.email); "
+    "END",
+    "INSERT INTO users_user_search(users_user_search) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS users_user_search_insert',
+    'DROP TRIGGER IF EXISTS users_user_search_delete',
+    'DROP TRIGGER IF EXISTS users_user_search_update',
+    'DROP TABLE IF EXISTS users_user_search',
+]
+
+
+def supports_fts5_trigrams(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_check USING fts5(value, tokenize='trigram')")
+        except Exception:
+            return False
+        cursor.execute('DROP TABLE temp.fts5_check')
+    return True
+
+
+def create_search_table(apps, schema_editor):
+    # Only on SQLite builds with FTS5 and its trigram tokenizer (3.34+),
+    # the in-memory index is used everywhere else
+    if not supports_fts5_trigrams(schema_editor.connection):
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_user_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.1.7 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_search_fts5'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event_id', models.UUIDField(editable=False, unique=True)),
+                ('actor_id', models.IntegerField(null=True)),
+                ('action', models.CharField(max_length=40)),
+                ('target_type', models.CharField(max_length=20)),
+                ('target_id', models.IntegerField()),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='auditevent',
+            index=models.Index(fields=['created_at'], name='audit_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditevent',
+            index=models.Index(fields=['actor_id', 'created_at'], name='audit_actor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditevent',
+            index=models.Index(fields=['target_type', 'target_id', 'created_at'], name='audit_target_idx'),
+        ),
+    ]
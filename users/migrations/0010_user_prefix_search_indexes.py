@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# istartswith compiles to UPPER(column::text) LIKE UPPER(%s) on PostgreSQL,
+# which only an index on the same expression serves; text_pattern_ops lets
+# it serve LIKE whatever the database collation is
+POSTGRESQL_SQL = [
+    'CREATE INDEX user_email_upper_idx ON users_user (UPPER("email"::text) text_pattern_ops)',
+    'CREATE INDEX user_full_name_upper_idx ON users_user (UPPER("full_name"::text) text_pattern_ops)',
+]
+
+# SQLite's LIKE is case insensitive, it only uses an index when the index
+# compares with NOCASE
+SQLITE_SQL = [
+    'CREATE INDEX user_email_nocase_idx ON users_user ("email" COLLATE NOCASE)',
+    'CREATE INDEX user_full_name_nocase_idx ON users_user ("full_name" COLLATE NOCASE)',
+]
+
+INDEX_NAMES = {
+    'postgresql': ['user_email_upper_idx', 'user_full_name_upper_idx'],
+    'sqlite': ['user_email_nocase_idx', 'user_full_name_nocase_idx'],
+}
+
+
+def create_prefix_indexes(apps, schema_editor):
+    # MySQL's default collations are case insensitive already, so the plain
+    # indexes serve istartswith there
+    vendor = schema_editor.connection.vendor
+    for sql in {'postgresql': POSTGRESQL_SQL, 'sqlite': SQLITE_SQL}.get(vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    for name in INDEX_NAMES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_audit_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
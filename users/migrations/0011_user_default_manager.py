@@ -0,0 +1,39 @@
+# Generated by Django 3.1.7 on 2026-10-18 14:24
+
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.manager
+
+
+def recount_members(apps, schema_editor):
+    # 0003 counted every user, since 0005 member_count only counts the
+    # active ones
+    Department = apps.get_model('users', 'Department')
+    User = apps.get_model('users', 'User')
+    members = (User._base_manager.filter(department=OuterRef('pk'), is_active=True)
+               .order_by().values('department')
+               .annotate(total=Count('pk')).values('total'))
+    Department._base_manager.update(
+        member_count=Coalesce(Subquery(members, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_user_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='user',
+            options={'default_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RunPython(recount_members, migrations.RunPython.noop),
+    ]
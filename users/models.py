@@ -1,15 +1,51 @@
 from django.db import models
+from django.db.models import DEFERRED, F
 from django import forms
 from django.contrib.auth.models import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin
 
-from users.managers import CustomUserManager
+from users.hashing import check_password_with_rehash
+from users.managers import ActiveUserManager, CustomUserManager, DepartmentManager
 
 class Department(models.Model):
     department = models.CharField(max_length=40, null=False)
+    # Kept up to date by users.signals and users.departments
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+    # Set while a background job deletes the department's members
+    is_deleted = models.BooleanField(default=False, editable=False)
+
+    objects = DepartmentManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.department
+
+
+class DepartmentDeletionJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    # Not a foreign key, the job outlives the department
+    department_id = models.IntegerField(db_index=True)
+    department_name = models.CharField(max_length=40)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return '%s (%s)' % (self.department_name, self.status)
         
 class User(AbstractBaseUser, PermissionsMixin):
    full_name = models.CharField(max_length=60, null=False)
@@ -18,11 +54,122 @@ class User(AbstractBaseUser, PermissionsMixin):
    is_active = models.BooleanField(default=True)
    email = models.EmailField(max_length=60, null=False, unique=True)
    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True)
+   # Set when the user deleted his profile, purge_users removes him later
+   deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+   # Bumped by every save and update of the row, the ETag of UserUpdateProfile
+   version = models.PositiveIntegerField(default=1, editable=False)
 
    USERNAME_FIELD = 'email'
    REQUIRED_FIELDS = ['full_name', 'password']
 
-   objects = CustomUserManager()
+   # Active users only, all_objects also sees the deactivated ones
+   objects = ActiveUserManager()
+   all_objects = CustomUserManager()
+
+   class Meta:
+       # What Django uses on its own, in uniqueness checks, the admin,
+       # createsuperuser and authentication backends, must see every user
+       default_manager_name = 'all_objects'
+       indexes = [
+           # Directory listing filtered by department and paged by id
+           models.Index(fields=['department', 'id'], name='user_department_id_idx'),
+           # Exact matches on the name. The case insensitive prefix search on
+           # the name and the email uses the expression indexes of migration
+           # 0010, which Django 3.1 can't declare here
+           models.Index(fields=['full_name'], name='user_full_name_idx'),
+           # Same listing restricted to the active users, the filter of
+           # User.objects, and small enough not to grow with deleted users
+           models.Index(fields=['department', 'id'], name='user_active_department_id_idx',
+                        condition=models.Q(is_active=True)),
+           # Soft deleted users waiting for purge_users
+           models.Index(fields=['deleted_at'], name='user_deleted_at_idx',
+                        condition=models.Q(is_active=False)),
+       ]
 
    def __str__(self):
-       return self.email
\ No newline at end of file
+       return self.email
+
+   @classmethod
+   def from_db(cls, db, field_names, values):
+       instance = super().from_db(db, field_names, values)
+       # Lets the member count signal see a change of department on save
+       instance._loaded_department_id = instance.counted_department_id()
+       return instance
+
+   def refresh_from_db(self, using=None, fields=None):
+       super().refresh_from_db(using, fields)
+       # The member count now includes what was just read, not what was
+       # loaded before
+       if fields is None or {'is_active', 'department', 'department_id'} & set(fields):
+           self._loaded_department_id = self.counted_department_id()
+
+   def save(self, *args, **kwargs):
+       """Saves the user, moving an existing one to a new version, so the
+       admin, password changes and soft deletes change the ETag too."""
+       if self._state.adding:
+           return super().save(*args, **kwargs)
+
+       # Incremented by the database, a concurrent update isn't overwritten
+       self.version = F('version') + 1
+       update_fields = kwargs.get('update_fields')
+       if update_fields is not None:
+           kwargs['update_fields'] = set(update_fields) | {'version'}
+       try:
+           super().save(*args, **kwargs)
+       finally:
+           # Deferred, read again on first use
+           self.__dict__.pop('version', None)
+
+   def counted_department_id(self):
+       """The department whose member_count includes this user: his own
+       while he is active, None otherwise, DEFERRED when a field isn't loaded."""
+       if 'is_active' not in self.__dict__ or 'department_id' not in self.__dict__:
+           return DEFERRED
+       return self.department_id if self.is_active else None
+
+   def check_password(self, raw_password):
+       """Checks the password, an outdated hash is upgraded in the
+       background instead of on the request thread."""
+       return check_password_with_rehash(self, raw_password)
+
+
+class AuthToken(models.Model):
+    """ An API token that stops working at expires_at, which every use
+    pushes back (see users.tokens) """
+    # Longer than the 40 characters of rest_framework.authtoken keys, so
+    # the length of a key tells which table it is in
+    KEY_LENGTH = 48
+
+    key = models.CharField(max_length=KEY_LENGTH, primary_key=True)
+    user = models.ForeignKey(User, related_name='auth_tokens', on_delete=models.CASCADE)
+    created = models.DateTimeField(auto_now_add=True)
+    # Indexed for the sweep of expired tokens
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class AuditEvent(models.Model):
+    """ Who changed what, written in batches by users.audit """
+    id = models.BigAutoField(primary_key=True)
+    # Set when the event is recorded, lets a replayed spool skip the
+    # events that were already written
+    event_id = models.UUIDField(unique=True, editable=False)
+    # Plain ids rather than foreign keys, events outlive the rows they name
+    actor_id = models.IntegerField(null=True)
+    action = models.CharField(max_length=40)
+    target_type = models.CharField(max_length=20)
+    target_id = models.IntegerField()
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='audit_created_at_idx'),
+            models.Index(fields=['actor_id', 'created_at'], name='audit_actor_idx'),
+            models.Index(fields=['target_type', 'target_id', 'created_at'], name='audit_target_idx'),
+        ]
+
+    def __str__(self):
+        return '%s %s:%s' % (self.action, self.target_type, self.target_id)
@@ -0,0 +1,98 @@
+"""Read replica routing.
+
+Reads go to a replica only inside replica_reads(), which the read-only
+views enter for safe methods. A request that writes, and the requests the
+same client sends for the next USERS_DATABASE_PIN_SECONDS, read from the
+primary so they always see their own writes (see PrimaryPinningMiddleware).
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = contextvars.ContextVar('users_replica_reads', default=False)
+_state = contextvars.ContextVar('users_database_state', default=None)
+
+
+class RequestState:
+    """ Whether the request must read from the primary, and whether it wrote """
+
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_aliases():
+    return getattr(settings, 'USERS_DATABASE_REPLICAS', ())
+
+
+def start_request(pinned=False):
+    """Starts tracking the writes of the current request.
+
+    Returns:
+        tuple: The RequestState and the token to pass to finish_request
+    """
+    state = RequestState(pinned)
+    return state, _state.set(state)
+
+
+def finish_request(token):
+    _state.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """Lets the queries run inside the block read from a replica."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaReadMixin:
+    """ Safe requests to the view may read from a replica """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    """Sends reads made inside replica_reads() to a random replica,
+    everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or not _replica_reads.get():
+            return None
+
+        state = _state.get()
+        if state is not None and (state.pinned or state.wrote):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Explicit, otherwise an instance read from a replica would be
+        # saved back to it.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
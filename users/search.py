@@ -0,0 +1,285 @@
+"""Search of the active users by name or email.
+
+The default backend is a trigram index held in memory: every word of a
+name, and the whole email, is indexed by its trigrams, padded at the start
+so that one and two letter queries match the beginning of words. A user
+matches when he has at least USERS_SEARCH_MIN_SIMILARITY of the query's
+trigrams; results are ranked by that share, names and emails starting with
+the query first.
+
+The index is read from the database on the first search, streamed with
+values_list, and kept current by the User signals of this process once
+their transaction commits (see users.signals). Writes made by other
+processes show up once it is older than USERS_SEARCH_INDEX_MAX_AGE seconds
+and read again. A new index is built aside, by the one search that found
+the index too old while the others keep using it, and swapped in; changes
+made meanwhile are applied to both.
+
+On SQLite, USERS_SEARCH_BACKEND = 'fts5' searches the FTS5 table kept in
+sync with users_user by the triggers of migration 0008 instead.
+"""
+import heapq
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from users.models import User
+
+FTS_TABLE = 'users_user_search'
+
+INDEXED_FIELDS = ('pk', 'full_name', 'email', 'department_id', 'is_active')
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def index_trigrams(word):
+    padded = '  %s ' % word
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def query_trigrams(word):
+    if len(word) < 3:
+        # Only the start of words, '  j' or ' jo'
+        return {('  ' + word)[-3:]}
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def result(pk, full_name, email, department_id):
+    return {'id': pk, 'full_name': full_name, 'email': email, 'department': department_id}
+
+
+class TrigramIndex:
+    """ Trigram index of the active users of this process """
+
+    def __init__(self):
+        self._users = {}
+        self._trigrams = defaultdict(set)
+        self._built_at = None
+        # Changes applied while a build runs, replayed on the new index
+        self._changes = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    @property
+    def max_age(self):
+        return getattr(settings, 'USERS_SEARCH_INDEX_MAX_AGE', 300)
+
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """Reads every active user into a new index, then swaps it in.
+
+        Searches and updates go on with the current index while the users
+        are read, only the swap holds the lock.
+        """
+        with self._build_lock:
+            self._build()
+
+    def clear(self):
+        with self._lock:
+            self._users = {}
+            self._trigrams = defaultdict(set)
+            self._built_at = None
+
+    def update_user(self, user):
+        """Indexes a saved user, or drops him once he is inactive."""
+        if any(name not in user.__dict__ for name in ('full_name', 'email', 'department_id', 'is_active')):
+            self.refresh([user.pk])
+            return
+        entry = (user.full_name, user.email, user.department_id) if user.is_active else None
+        self._apply([(user.pk, entry)])
+
+    def remove_user(self, pk):
+        self._apply([(pk, None)])
+
+    def refresh(self, values, field='pk', chunk_size=500):
+        """Reads some users again after writes that send no signals.
+
+        Args:
+            values (iterable): Primary keys, or values of field
+            field (str): The unique column the values belong to
+        """
+        if not self._is_tracking():
+            return
+        values = list(values)
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start:start + chunk_size]
+            rows = list(User.all_objects.filter(**{field + '__in': chunk})
+                        .values_list(*INDEXED_FIELDS))
+            # Users that are gone
+            changes = [(pk, None) for pk in chunk] if field == 'pk' else []
+            for pk, full_name, email, department_id, is_active in rows:
+                changes.append((pk, (full_name, email, department_id) if is_active else None))
+            self._apply(changes)
+
+    def search(self, query, limit=20, department_id=None):
+        """Ranks the users matching the query.
+
+        Args:
+            query (str): Part of a name or email
+            limit (int): Maximum number of results
+            department_id (int): Only users of this department when given
+
+        Returns:
+            list: Dicts with the id, full_name, email and department
+        """
+        query = normalize(query)
+        trigrams = set()
+        for word in query.split():
+            trigrams |= query_trigrams(word)
+        if not trigrams:
+            return []
+
+        if not self.is_built():
+            with self._build_lock:
+                if not self.is_built():
+                    self._build()
+        elif self._is_stale() and self._build_lock.acquire(blocking=False):
+            # The other searches use the current index meanwhile
+            try:
+                self._build()
+            finally:
+                self._build_lock.release()
+
+        with self._lock:
+            matches = Counter()
+            for trigram in trigrams:
+                matches.update(self._trigrams.get(trigram, ()))
+
+            min_similarity = getattr(settings, 'USERS_SEARCH_MIN_SIMILARITY', 0.6)
+            ranked = []
+            for pk, count in matches.items():
+                score = count / len(trigrams)
+                if score < min_similarity:
+                    continue
+                full_name, email, user_department_id = self._users[pk]
+                if department_id is not None and user_department_id != department_id:
+                    continue
+                name = full_name.lower()
+                if name.startswith(query) or email.lower().startswith(query):
+                    score += 1
+                ranked.append((-score, name, pk))
+            best = heapq.nsmallest(limit, ranked)
+            return [result(pk, *self._users[pk]) for _, _, pk in best]
+
+    def _build(self):
+        with self._lock:
+            self._changes = []
+        users, trigrams = {}, defaultdict(set)
+        try:
+            for pk, full_name, email, department_id in self._rows():
+                self._add(users, trigrams, pk, (full_name, email, department_id))
+        except BaseException:
+            with self._lock:
+                self._changes = None
+            raise
+        with self._lock:
+            for pk, entry in self._changes:
+                self._set(users, trigrams, pk, entry)
+            self._users, self._trigrams = users, trigrams
+            self._changes = None
+            self._built_at = time.monotonic()
+
+    def _is_stale(self):
+        max_age = self.max_age
+        return max_age is not None and time.monotonic() - self._built_at > max_age
+
+    def _is_tracking(self):
+        return self.is_built() or self._changes is not None
+
+    def _rows(self):
+        return (User.objects.order_by().values_list('pk', 'full_name', 'email', 'department_id')
+                .iterator(chunk_size=2000))
+
+    def _apply(self, changes):
+        """Sets the entries of (pk, entry) pairs, None removing the user, in
+        the current index and in the one being built."""
+        with self._lock:
+            if self._changes is not None:
+                self._changes.extend(changes)
+            if self.is_built():
+                for pk, entry in changes:
+                    self._set(self._users, self._trigrams, pk, entry)
+
+    def _set(self, users, trigrams, pk, entry):
+        self._remove(users, trigrams, pk)
+        if entry is not None:
+            self._add(users, trigrams, pk, entry)
+
+    def _add(self, users, trigrams, pk, entry):
+        users[pk] = entry
+        for trigram in self._user_trigrams(entry[0], entry[1]):
+            trigrams[trigram].add(pk)
+
+    def _remove(self, users, trigrams, pk):
+        entry = users.pop(pk, None)
+        if entry is None:
+            return
+        for trigram in self._user_trigrams(entry[0], entry[1]):
+            pks = trigrams.get(trigram)
+            if pks is not None:
+                pks.discard(pk)
+                if not pks:
+                    del trigrams[trigram]
+
+    @staticmethod
+    def _user_trigrams(full_name, email):
+        trigrams = index_trigrams(normalize(email))
+        for word in normalize(full_name).split():
+            trigrams |= index_trigrams(word)
+        return trigrams
+
+
+class FTS5Index:
+    """Searches the SQLite FTS5 table of migration 0008.
+
+    The table is external content kept in sync by triggers on users_user,
+    so it also follows QuerySet.update and bulk_create. Queries shorter
+    than a trigram fall back to a prefix match on users_user.
+    """
+
+    def search(self, query, limit=20, department_id=None):
+        query = normalize(query)
+        if not query:
+            return []
+
+        if len(query) < 3:
+            sql = ('SELECT u.id, u.full_name, u.email, u.department_id FROM users_user u '
+                   "WHERE (u.full_name LIKE %s ESCAPE '!' OR u.email LIKE %s ESCAPE '!') "
+                   'AND u.is_active')
+            prefix = query.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+            params = [prefix, prefix]
+            order = ' ORDER BY u.full_name'
+        else:
+            sql = ('SELECT u.id, u.full_name, u.email, u.department_id FROM {table} s '
+                   'JOIN users_user u ON u.id = s.rowid '
+                   'WHERE {table} MATCH %s AND u.is_active').format(table=FTS_TABLE)
+            params = ['"%s"' % query.replace('"', '""')]
+            order = ' ORDER BY s.rank'
+
+        if department_id is not None:
+            sql += ' AND u.department_id = %s'
+            params.append(department_id)
+        sql += order + ' LIMIT %s'
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [result(*row) for row in cursor.fetchall()]
+
+
+user_index = TrigramIndex()
+fts5_index = FTS5Index()
+
+
+def search_users(query, limit=20, department_id=None):
+    """Searches with the backend of USERS_SEARCH_BACKEND."""
+    if getattr(settings, 'USERS_SEARCH_BACKEND', 'memory') == 'fts5':
+        return fts5_index.search(query, limit, department_id)
+    return user_index.search(query, limit, department_id)
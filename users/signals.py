@@ -0,0 +1,102 @@
+import copy
+from functools import partial
+
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.api.authentication import token_cache
+from users import departments, metrics
+from users.api.catalog import department_catalog
+from users.models import AuthToken, Department, User
+from users.search import user_index
+
+
+@receiver(post_delete, sender=Token)
+@receiver(post_delete, sender=AuthToken)
+def forget_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    """Any saved change may be a new password or is_active=False,
+    so the cached credentials of the user are dropped."""
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def count_saved_member(sender, instance, created, raw=False, **kwargs):
+    """Moves the user between department member counts, only active users
+    are counted. What was counted before comes from User.from_db, a user
+    saved without having been loaded, or with a deferred department or
+    is_active, is left alone."""
+    department_id = instance.counted_department_id()
+    if created:
+        loaded_department_id = None
+    else:
+        loaded_department_id = instance.__dict__.get('_loaded_department_id', DEFERRED)
+    instance._loaded_department_id = department_id
+
+    if raw or departments.counting_paused():
+        return
+    if department_id is not DEFERRED and loaded_department_id is not DEFERRED:
+        departments.move_member(loaded_department_id, department_id)
+
+
+@receiver(post_delete, sender=User)
+def count_deleted_member(sender, instance, **kwargs):
+    department_id = instance.counted_department_id()
+    if department_id is not DEFERRED and not departments.counting_paused():
+        departments.add_members(department_id, -1)
+
+
+@receiver(post_save, sender=User)
+def index_saved_user(sender, instance, **kwargs):
+    # Applied once committed, a copy keeps the values that were saved
+    transaction.on_commit(partial(user_index.update_user, copy.copy(instance)))
+
+
+@receiver(post_delete, sender=User)
+def unindex_deleted_user(sender, instance, **kwargs):
+    transaction.on_commit(partial(user_index.remove_user, instance.pk))
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def refresh_department_catalog(sender, **kwargs):
+    department_catalog.invalidate()
+
+
+@receiver(request_started)
+def check_persistent_connections(sender, **kwargs):
+    """Drops persistent connections the server closed while they were idle,
+    so the request opens a new one instead of failing on its first query."""
+    for connection in connections.all():
+        if (connection.connection is not None
+                and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                and not connection.in_atomic_block
+                and not connection.is_usable()):
+            connection.close()
+
+
+@receiver(connection_created)
+def count_request_queries(sender, connection, **kwargs):
+    # First in line, connection.execute_wrapper() pops the last wrapper
+    if metrics.execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, metrics.execute_wrapper)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
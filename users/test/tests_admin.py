@@ -0,0 +1,140 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from users.admin import EstimatedCountPaginator
+from users.lifecycle import soft_delete_user
+from users.api.authentication import token_cache
+from users.models import Department, User
+
+CHANGELIST = '/admin/users/user/'
+
+
+class UserAdminTestCase(TestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.department2 = Department.objects.create(department="Design")
+
+        self.admin = User.objects.create_superuser(
+            'admin@test.com', '123ABCde', full_name='Admin User', department=self.department1)
+        self.client.force_login(self.admin)
+
+        self.user1 = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+        self.user2 = User.objects.create_user(
+            'user2@test.com', '123ABCde', full_name='User Numbertwo', department=self.department1)
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def run_action(self, action, users, **data):
+        data.update({'action': action, '_selected_action': [user.pk for user in users]})
+        return self.client.post(CHANGELIST, data)
+
+    def member_counts(self):
+        return dict(Department.all_objects.values_list('department', 'member_count'))
+
+    def test_changelist(self):
+        """Test the list filters by department without querying each row's department"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CHANGELIST, {'department__id__exact': self.department1.pk})
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, 'user1@test.com')
+
+        department_reads = [query['sql'] for query in queries.captured_queries
+                            if 'WHERE "users_department"."id" =' in query['sql']]
+        self.assertEquals(department_reads, [])
+
+    def test_add_user_with_deleted_email(self):
+        """Test adding a user with the email of a soft deleted one is refused by the form"""
+        soft_delete_user(self.user1)
+
+        response = self.client.post('/admin/users/user/add/', {
+            'email': 'user1@test.com', 'password1': '123ABCde!x', 'password2': '123ABCde!x'})
+        self.assertEquals(response.status_code, 200)
+        self.assertContains(response, 'User with this Email already exists.')
+        self.assertEquals(User.all_objects.filter(email='user1@test.com').count(), 1)
+
+    def test_lists_inactive_users(self):
+        """Test the changelist shows the deactivated users, to activate them again"""
+        soft_delete_user(self.user1)
+        response = self.client.get(CHANGELIST, {'is_active__exact': '0'})
+        self.assertContains(response, 'user1@test.com')
+
+    def test_prefix_search(self):
+        """Test the search matches emails and names by prefix only, ignoring case"""
+        response = self.client.get(CHANGELIST, {'q': 'user1'})
+        self.assertContains(response, 'user1@test.com')
+        self.assertNotContains(response, 'user2@test.com')
+
+        response = self.client.get(CHANGELIST, {'q': 'user numbertwo'})
+        self.assertContains(response, 'user2@test.com')
+
+        response = self.client.get(CHANGELIST, {'q': 'test.com'})
+        self.assertNotContains(response, 'user1@test.com')
+
+    def test_deactivate_action(self):
+        """Test deactivating runs one UPDATE and keeps counts and caches right"""
+        token = Token.objects.create(user=self.user1)
+        token_cache.set(token.key, self.user1, token)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.run_action('deactivate_users', [self.user1, self.user2])
+        user_updates = [query['sql'] for query in queries.captured_queries
+                        if query['sql'].startswith('UPDATE "users_user"')]
+        self.assertEquals(len(user_updates), 1)
+
+        self.assertFalse(User.all_objects.filter(pk__in=[self.user1.pk, self.user2.pk], is_active=True).exists())
+        self.assertEquals(self.member_counts(), {'Creation': 1, 'Design': 0})
+        self.assertIsNone(token_cache.get(token.key))
+
+        self.run_action('activate_users', [self.user1])
+        self.assertTrue(User.objects.filter(pk=self.user1.pk).exists())
+        self.assertEquals(self.member_counts(), {'Creation': 2, 'Design': 0})
+
+    def test_move_action(self):
+        """Test moving users to a department recounts both departments"""
+        self.run_action('move_to_department', [self.user1, self.user2], department=self.department2.pk)
+        self.assertEquals(User.objects.filter(department=self.department2).count(), 2)
+        self.assertEquals(self.member_counts(), {'Creation': 1, 'Design': 2})
+
+        self.user1.refresh_from_db()
+        self.assertEquals(self.user1.version, 2)
+
+    def test_move_action_needs_department(self):
+        """Test the move action does nothing without a department"""
+        response = self.run_action('move_to_department', [self.user1], department='')
+        self.assertEquals(response.status_code, 302)
+        self.assertEquals(User.objects.filter(department=self.department1).count(), 3)
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+
+    def setUp(self):
+
+        self.department1 = Department.objects.create(department="Creation")
+        for number in range(3):
+            User.objects.create_user(
+                'user%d@test.com' % number, '123ABCde', full_name='User', department=self.department1)
+
+    def test_estimate_for_large_table(self):
+        """Test a large unfiltered table is counted from its statistics"""
+        with mock.patch('users.admin.estimated_count', return_value=50000):
+            paginator = EstimatedCountPaginator(User.all_objects.order_by('pk'), 100)
+            with self.assertNumQueries(0):
+                self.assertEquals(paginator.count, 50000)
+
+            paginator = EstimatedCountPaginator(User.all_objects.filter(is_staff=False).order_by('pk'), 100)
+            self.assertEquals(paginator.count, 3)
+
+    def test_exact_count_for_small_table(self):
+        """Test small tables, and databases without estimates, are counted exactly"""
+        with mock.patch('users.admin.estimated_count', return_value=10):
+            self.assertEquals(EstimatedCountPaginator(User.all_objects.order_by('pk'), 100).count, 3)
+        self.assertEquals(EstimatedCountPaginator(User.all_objects.order_by('pk'), 100).count, 3)
@@ -0,0 +1,98 @@
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from users.api.authentication import token_cache
+from users.api.throttling import local_backend
+from users.models import AuthToken, Department, User
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class AsyncViewsTestCase(TransactionTestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        local_backend.clear()
+        self.department1 = Department.objects.create(department="Creation")
+
+        email = 'user1@test.com'
+        password = '123ABCde'
+        extra_fields = {"full_name": 'User Numberone',
+        "department": self.department1}
+
+        self.user = User.objects.create_user(email, password, **extra_fields)
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {'HTTP_AUTHORIZATION': "Token " + str(self.token)}
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def test_read_profile(self):
+        """Test the async profile endpoint"""
+        response = self.client.get('/async/profiles/%d/' % self.user.pk, **self.auth)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.json(), {"id": self.user.pk, "full_name": "User Numberone"})
+
+    def test_read_profile_detail(self):
+        """Test the async profile detail endpoint"""
+        response = self.client.get('/async/profiles/%d/detail/' % self.user.pk, **self.auth)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.json()['email'], 'user1@test.com')
+
+    def test_read_profile_wrong_id(self):
+        """Test endpoint with an id that doesn't exist"""
+        response = self.client.get('/async/profiles/15/', **self.auth)
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_read_profile_unauthenticated(self):
+        """Test if a non logged in user is allowed to get a profile"""
+        response = self.client.get('/async/profiles/%d/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.get(
+            '/async/profiles/%d/' % self.user.pk, HTTP_AUTHORIZATION="Token wrong")
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_departments_non_admin(self):
+        """Test if a non admin user is allowed to list departments"""
+        response = self.client.get('/async/departments/', **self.auth)
+        self.assertEquals(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_departments(self):
+        """Test the async department list for a staff member"""
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.get('/async/departments/', **self.auth)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.json(), [{"id": self.department1.pk, "department": "Creation"}])
+
+    def test_log_in(self):
+        """Test the async token login issues an expiring token"""
+        data = {
+            "username": "user1@test.com",
+            "password": "123ABCde",
+        }
+        response = self.client.post('/async/api-token-auth/', data=data)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(AuthToken.objects.filter(key=response.json()['token'], user=self.user).exists())
+
+        response = self.client.post('/async/api-token-auth/', data=data, content_type='application/json')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+    def test_log_in_wrong_password(self):
+        """Test the async token login with a wrong password or email"""
+        data = {
+            "username": "user1@test.com",
+            "password": "123ABCdf",
+        }
+        response = self.client.post('/async/api-token-auth/', data=data)
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        data["username"] = "nobody@test.com"
+        response = self.client.post('/async/api-token-auth/', data=data)
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post('/async/api-token-auth/', data={})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
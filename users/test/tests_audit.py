@@ -0,0 +1,288 @@
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.api.throttling import local_backend
+from users.audit import audit_log
+from users.models import AuditEvent, Department, User
+
+
+def actions():
+    return list(AuditEvent.objects.order_by('id').values_list('action', flat=True))
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000, USERS_AUDIT_FLUSH_INTERVAL=60,
+                   USERS_AUDIT_BATCH_SIZE=500)
+class AuditLogTestCase(TransactionTestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        local_backend.clear()
+        audit_log.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.admin = User.objects.create_user(
+            'admin@test.com', '123ABCde', full_name='Admin User',
+            department=self.department1, is_staff=True)
+        self.user = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+        self.token = Token.objects.create(user=self.admin)
+        self.auth = {'HTTP_AUTHORIZATION': "Token " + str(self.token)}
+
+    def tearDown(self):
+
+        token_cache.clear()
+        audit_log.clear()
+
+    def test_records_changes(self):
+        """Test the audited endpoints record who changed what once flushed"""
+        self.client.post('/users/create', data={
+            'full_name': 'User Numbertwo', 'email': 'user2@test.com',
+            'password': '123ABCde', 'department': self.department1.pk})
+        self.client.patch('/users/%d/update/' % self.user.pk, data={'full_name': 'User Renamed'},
+                          content_type='application/json', **self.auth)
+        self.client.delete('/users/%d/delete/' % self.user.pk, **self.auth)
+        self.client.put('/users/%d/change_password/' % self.admin.pk, data={
+            'old_password': '123ABCde', 'new_password': '123ABCaa'},
+            content_type='application/json', **self.auth)
+        self.assertEquals(AuditEvent.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEquals(audit_log.flush(), 4)
+        inserts = [query for query in captured if query['sql'].startswith('INSERT')]
+        self.assertEquals(len(inserts), 1)
+
+        self.assertEquals(actions(), ['user.create', 'user.update', 'user.delete', 'user.change_password'])
+        update = AuditEvent.objects.get(action='user.update')
+        self.assertEquals(update.actor_id, self.admin.pk)
+        self.assertEquals((update.target_type, update.target_id), ('user', self.user.pk))
+        self.assertEquals(update.data, {'fields': ['full_name']})
+        self.assertIsNone(AuditEvent.objects.get(action='user.create').actor_id)
+        self.assertEquals(AuditEvent.objects.get(action='user.delete').data, {'hard': False})
+
+    @override_settings(USERS_BULK_IMPORT_HASH_WORKERS=0)
+    def test_bulk_create(self):
+        """Test every user created by a bulk import is recorded, rejected rows aren't"""
+        data = [{'full_name': 'User %s' % name, 'email': '%s@test.com' % name,
+                 'password': '123ABCde', 'department': self.department1.pk}
+                for name in ('two', 'three', 'user1')]
+        response = self.client.post('/users/bulk_create', data=json.dumps(data),
+                                    content_type='application/json', **self.auth)
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEquals(audit_log.flush(), 2)
+        created = User.objects.filter(email__in=['two@test.com', 'three@test.com'])
+        events = AuditEvent.objects.filter(action='user.create')
+        self.assertEquals({event.target_id for event in events}, {user.pk for user in created})
+        self.assertEquals({event.actor_id for event in events}, {self.admin.pk})
+
+    def test_department_delete(self):
+        """Test deleting a department is recorded, a dry run isn't"""
+        url = '/departments/%d/delete/' % self.department1.pk
+        self.client.delete(url + '?dry_run=true', **self.auth)
+        self.client.delete(url, **self.auth)
+        audit_log.flush()
+        event = AuditEvent.objects.get()
+        self.assertEquals((event.action, event.target_id), ('department.delete', self.department1.pk))
+        self.assertEquals(event.data, {'background': False})
+
+    def test_failed_department_delete(self):
+        """Test a department delete that fails records nothing"""
+        url = '/departments/%d/delete/' % self.department1.pk
+        with mock.patch('users.api.viewsets.delete_department', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.client.delete(url, **self.auth)
+        self.assertEquals(audit_log.flush(), 0)
+
+    def test_rollback(self):
+        """Test a rolled back change leaves no event"""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                audit_log.record(self.admin, 'user.update', 'user', self.user.pk)
+                raise RuntimeError
+        self.assertEquals(audit_log.flush(), 0)
+
+    def test_unchanged_update(self):
+        """Test an update changing nothing records nothing"""
+        self.client.patch('/users/%d/update/' % self.user.pk, data={'full_name': 'User Numberone'},
+                          content_type='application/json', **self.auth)
+        self.assertEquals(audit_log.flush(), 0)
+
+    @override_settings(USERS_AUDIT_BATCH_SIZE=2, USERS_AUDIT_FLUSH_INTERVAL=0.05)
+    def test_background_flush(self):
+        """Test the flusher thread writes a full batch without being asked"""
+        for _ in range(2):
+            audit_log.record(self.admin, 'user.update', 'user', self.user.pk)
+
+        deadline = time.monotonic() + 5
+        while AuditEvent.objects.count() < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEquals(AuditEvent.objects.count(), 2)
+
+    @override_settings(USERS_AUDIT_BUFFER_SIZE=2)
+    def test_bounded_buffer(self):
+        """Test the oldest events are dropped once the buffer is full"""
+        for pk in range(3):
+            audit_log.record(self.admin, 'user.update', 'user', pk)
+        self.assertEquals(audit_log.flush(), 2)
+        self.assertEquals(list(AuditEvent.objects.order_by('target_id').values_list('target_id', flat=True)),
+                          [1, 2])
+
+    def test_failed_flush_is_retried(self):
+        """Test events whose write failed are written by the next flush"""
+        audit_log.record(self.admin, 'user.update', 'user', self.user.pk)
+        with mock.patch.object(AuditEvent.objects, 'bulk_create', side_effect=RuntimeError), \
+                self.assertLogs('users.audit', 'ERROR'):
+            self.assertEquals(audit_log.flush(), 0)
+        self.assertEquals(audit_log.flush(), 1)
+        self.assertEquals(actions(), ['user.update'])
+
+
+@override_settings(USERS_AUDIT_FLUSH_INTERVAL=60)
+class AuditSpoolTestCase(TransactionTestCase):
+
+    def setUp(self):
+
+        audit_log.clear()
+        self.spool_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(USERS_AUDIT_SPOOL_DIR=self.spool_dir.name)
+        self.settings.enable()
+
+    def tearDown(self):
+
+        audit_log.clear()
+        self.settings.disable()
+        self.spool_dir.cleanup()
+
+    def spooled(self):
+        return sorted(os.listdir(self.spool_dir.name))
+
+    def test_spool_removed_once_written(self):
+        """Test the spool keeps the events until they are written"""
+        audit_log.record(None, 'user.create', 'user', 1)
+        self.assertEquals(self.spooled(), ['audit-%d.jsonl' % os.getpid()])
+        self.assertEquals(audit_log.flush(), 1)
+        self.assertEquals(self.spooled(), [])
+
+    def test_failed_flush_replayed(self):
+        """Test a batch that failed to be written is replayed from its file"""
+        audit_log.record(None, 'user.create', 'user', 1)
+        with mock.patch.object(AuditEvent.objects, 'bulk_create', side_effect=RuntimeError), \
+                self.assertLogs('users.audit', 'ERROR'):
+            audit_log.flush()
+        self.assertEquals(len(self.spooled()), 1)
+
+        self.assertEquals(audit_log.replay_spool(), 1)
+        self.assertEquals(self.spooled(), [])
+        self.assertEquals(actions(), ['user.create'])
+
+    def test_replay_command(self):
+        """Test the command writes the file of a stopped process once"""
+        event = {
+            'event_id': str(uuid.uuid4()), 'actor_id': None, 'action': 'user.create',
+            'target_type': 'user', 'target_id': 1, 'data': {},
+            'created_at': timezone.now().isoformat()}
+        # Never a running process, pids are far smaller
+        path = os.path.join(self.spool_dir.name, 'audit-999999999.jsonl')
+        with open(path, 'w') as spool:
+            spool.write(json.dumps(event) + '\n')
+            spool.write(json.dumps(event) + '\n')
+
+        out = StringIO()
+        call_command('replay_audit_spool', stdout=out)
+        self.assertIn('Replayed 2 audit events.', out.getvalue())
+        self.assertEquals(AuditEvent.objects.count(), 1)
+        self.assertEquals(self.spooled(), [])
+
+    def test_replay_skips_running_processes(self):
+        """Test the sealed files of other running processes are left to them,
+        and the files claimed by a stopped replay are replayed"""
+        event = {
+            'event_id': str(uuid.uuid4()), 'actor_id': None, 'action': 'user.create',
+            'target_type': 'user', 'target_id': 1, 'data': {},
+            'created_at': timezone.now().isoformat()}
+        running = 'audit-%d.jsonl.1.sealed' % os.getppid()
+        claimed = 'audit-999999999.jsonl.1.sealed.999999999.replaying'
+        for name in (running, claimed):
+            with open(os.path.join(self.spool_dir.name, name), 'w') as spool:
+                spool.write(json.dumps(event) + '\n')
+
+        self.assertEquals(audit_log.replay_spool(), 1)
+        self.assertEquals(self.spooled(), [running])
+        self.assertEquals(actions(), ['user.create'])
+
+
+class AuditEventListTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        self.admin = User.objects.create_user(
+            'admin@test.com', '123ABCde', full_name='Admin User', is_staff=True)
+        self.token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+        self.now = timezone.now()
+        AuditEvent.objects.bulk_create([
+            AuditEvent(event_id=uuid.uuid4(), actor_id=self.admin.pk, action='user.update',
+                       target_type='user', target_id=pk, created_at=self.now - timedelta(hours=pk))
+            for pk in range(1, 4)
+        ] + [
+            AuditEvent(event_id=uuid.uuid4(), actor_id=None, action='department.delete',
+                       target_type='department', target_id=1, created_at=self.now)])
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def targets(self, response):
+        return [(event['target_type'], event['target_id']) for event in response.json()['results']]
+
+    def test_list(self):
+        """Test events are listed newest first, a page at a time"""
+        response = self.client.get('/audit/events/', {'page_size': 3})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(self.targets(response), [('department', 1), ('user', 1), ('user', 2)])
+
+        response = self.client.get(response.json()['next'])
+        self.assertEquals(self.targets(response), [('user', 3)])
+
+    def test_filters(self):
+        """Test the actor, target and time range filters"""
+        response = self.client.get('/audit/events/', {'actor': self.admin.pk})
+        self.assertEquals(len(response.json()['results']), 3)
+
+        response = self.client.get('/audit/events/', {'target_type': 'user', 'target': 2})
+        self.assertEquals(self.targets(response), [('user', 2)])
+
+        since = (self.now - timedelta(hours=2, minutes=30)).isoformat()
+        until = (self.now - timedelta(minutes=30)).isoformat()
+        response = self.client.get('/audit/events/', {'since': since, 'until': until})
+        self.assertEquals(self.targets(response), [('user', 1), ('user', 2)])
+
+    def test_invalid_filters(self):
+        """Test malformed filters are refused"""
+        for params in ({'since': 'yesterday'}, {'actor': 'me'}, {'target': 1}):
+            response = self.client.get('/audit/events/', params)
+            self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_staff_only(self):
+        """Test users that are not staff can't read the events"""
+        user = User.objects.create_user('user1@test.com', '123ABCde', full_name='User Numberone')
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(Token.objects.create(user=user)))
+        response = self.client.get('/audit/events/')
+        self.assertEquals(response.status_code, status.HTTP_403_FORBIDDEN)
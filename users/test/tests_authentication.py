@@ -0,0 +1,138 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users import replicas, tokens
+from users.api.authentication import (CachedTokenAuthentication,
+                                      ExpiringTokenAuthentication, token_cache)
+from users.api.throttling import local_backend
+from users.models import Department, User
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        local_backend.clear()
+        self.department1 = Department.objects.create(department="Creation")
+
+        email = 'user1@test.com'
+        password = '123ABCde'
+        extra_fields = {"full_name": 'User Numberone',
+        "department": self.department1}
+
+        self.user = User.objects.create_user(email, password, **extra_fields)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def get_profile(self):
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/users/%d/profile/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_cached_token_skips_query(self):
+        """Test the token lookup only hits the database once"""
+        first = self.get_profile()
+        second = self.get_profile()
+        self.assertEquals(second, first - 1)
+
+    @override_settings(USERS_DATABASE_REPLICAS=['replica'])
+    def test_tokens_read_from_primary(self):
+        """Test tokens are looked up on the primary inside replica_reads,
+        where a lagging replica would not know them yet"""
+        token = tokens.issue_token(self.user)
+        # Not a configured database, any query sent to it fails
+        with mock.patch('users.replicas.random.choice', return_value='replica'), \
+                replicas.replica_reads():
+            self.assertEquals(CachedTokenAuthentication().authenticate_credentials(self.token.key)[0], self.user)
+            self.assertEquals(ExpiringTokenAuthentication().authenticate_credentials(token.key)[0], self.user)
+
+    def test_deleted_token(self):
+        """Test a deleted token is rejected even after it was cached"""
+        self.get_profile()
+        self.token.delete()
+
+        response = self.client.get('/users/%d/profile/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user(self):
+        """Test the token of a deactivated user is rejected even after it was cached"""
+        self.get_profile()
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get('/users/%d/profile/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_change_password_invalidates(self):
+        """Test a password change drops the cached credentials"""
+        self.get_profile()
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+        data = {
+            "old_password": "123ABCde",
+            "new_password": "123ABCaa"
+        }
+        response = self.client.put('/users/%d/change_password/' % self.user.pk, data=data)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    @override_settings(USERS_TOKEN_CACHE_SIZE=1)
+    def test_lru_eviction(self):
+        """Test the in-process cache never grows past its size"""
+        other = User.objects.create_user(
+            'user2@test.com', '123ABCde', full_name='User Numbertwo', department=self.department1)
+        other_token = Token.objects.create(user=other)
+
+        token_cache.set(self.token.key, self.user, self.token)
+        token_cache.set(other_token.key, other, other_token)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNotNone(token_cache.get(other_token.key))
+
+    @override_settings(USERS_TOKEN_CACHE_ALIAS='default')
+    def test_shared_backend(self):
+        """Test entries are served from the shared cache after a local miss"""
+        self.get_profile()
+        token_cache.clear()
+        user, token = token_cache.get(self.token.key)
+        self.assertEquals(user.pk, self.user.pk)
+
+        token_cache.invalidate_user(self.user.pk)
+        token_cache.clear()
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    @override_settings(USERS_TOKEN_CACHE_ALIAS='default')
+    def test_shared_backend_every_token(self):
+        """Test invalidating a user retires all their shared entries, then caches again"""
+        other_token = Token.objects.create(user=User.objects.create_user(
+            'user2@test.com', '123ABCde', full_name='User Numbertwo', department=self.department1))
+        token_cache.set(self.token.key, self.user, self.token)
+        token_cache.set('second', self.user, self.token)
+        token_cache.set(other_token.key, other_token.user, other_token)
+
+        token_cache.invalidate_user(self.user.pk)
+        token_cache.clear()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNone(token_cache.get('second'))
+        self.assertIsNotNone(token_cache.get(other_token.key))
+
+        token_cache.set(self.token.key, self.user, self.token)
+        token_cache.clear()
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+    @override_settings(USERS_TOKEN_CACHE_TTL=300, USERS_TOKEN_CACHE_LOCAL_TTL=0)
+    def test_local_ttl_capped(self):
+        """Test in-process entries expire after the local TTL"""
+        token_cache.set(self.token.key, self.user, self.token)
+        self.assertIsNone(token_cache.get(self.token.key))
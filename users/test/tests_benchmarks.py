@@ -0,0 +1,66 @@
+from django.test import TestCase, override_settings
+from users.api.authentication import token_cache
+from users.benchmarks import endpoints, serializers
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000, USERS_PASSWORD_REHASH_IN_BACKGROUND=False)
+class EndpointBenchmarkTestCase(TestCase):
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def test_run_suite(self):
+        """Test every scenario runs against seeded data without failures"""
+        results = endpoints.run_suite(users=20, departments=3, requests=3, warmup=1)
+
+        self.assertEquals([result['scenario'] for result in results], list(endpoints.SCENARIOS))
+        for result in results:
+            self.assertEquals(result['failures'], 0, result['scenario'])
+            self.assertGreater(result['requests_per_second'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_delete_runs_last(self):
+        """Test the delete scenario runs after the ones reading its users"""
+        results = endpoints.run_suite(users=20, departments=3, requests=3, warmup=1,
+                                      scenarios=['delete', 'profile_read'])
+        self.assertEquals([result['scenario'] for result in results], ['profile_read', 'delete'])
+        self.assertEquals(results[0]['failures'], 0)
+
+    @override_settings(USERS_DATABASE_REPLICAS=['replica'])
+    def test_ignores_replicas(self):
+        """Test the scenarios read from the seeded database, not the replicas"""
+        results = endpoints.run_suite(users=5, departments=2, requests=2, warmup=1,
+                                      scenarios=['profile_read', 'department_list'])
+        self.assertEquals([result['failures'] for result in results], [0, 0])
+
+    def test_run_suite_not_enough_users(self):
+        """Test the delete scenario refuses to run out of users"""
+        with self.assertRaises(ValueError):
+            endpoints.run_suite(users=2, departments=1, requests=3, scenarios=['delete'])
+
+    def test_compare(self):
+        """Test slower throughput or more queries are flagged as regressions"""
+        baseline = [
+            {'scenario': 'profile_read', 'requests_per_second': 100.0, 'p99_ms': 10.0, 'queries_per_request': 1.0},
+            {'scenario': 'update', 'requests_per_second': 100.0, 'p99_ms': 10.0, 'queries_per_request': 4.0},
+        ]
+        results = [
+            {'scenario': 'profile_read', 'requests_per_second': 98.0, 'p99_ms': 10.5, 'queries_per_request': 1.0},
+            {'scenario': 'update', 'requests_per_second': 100.0, 'p99_ms': 10.0, 'queries_per_request': 5.0},
+        ]
+
+        comparisons = endpoints.compare(results, baseline, threshold=0.1)
+        self.assertEquals([comparison['regression'] for comparison in comparisons], [False, True])
+
+
+class SerializerBenchmarkTestCase(TestCase):
+
+    def test_run(self):
+        """Test every read serializer is measured with and without its plan"""
+        results = serializers.run(sizes=(1, 5), seconds=0.01)
+
+        self.assertEquals(len(results), len(serializers.CASES) * 2 * 2)
+        self.assertEquals({result['variant'] for result in results}, {'model', 'plan'})
+        for result in results:
+            self.assertGreater(result['us_per_row'], 0)
@@ -0,0 +1,140 @@
+import json
+
+from django.contrib.auth.hashers import check_password
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.models import Department, User
+
+
+@override_settings(USERS_BULK_IMPORT_HASH_WORKERS=0)
+class BulkCreateProfileTestCase(APITestCase):
+
+    def setUp(self):
+
+        self.department1 = Department.objects.create(department="Creation")
+        self.department2 = Department.objects.create(department="Development")
+
+        email = 'admin@test.com'
+        password = '123ABCde'
+        extra_fields = {"full_name": 'Admin User',
+        "department": self.department1,
+        "is_staff": True}
+
+        self.admin = User.objects.create_user(email, password, **extra_fields)
+        self.token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def test_bulk_create_json(self):
+        """Test a JSON array where some rows are rejected and the others are created"""
+        data = [
+            {"full_name": "User One", "email": "one@test.com",
+             "password": "123ABCde", "department": self.department1.pk},
+            {"full_name": "User Two", "email": "two@test.com",
+             "password": "weak", "department": self.department1.pk},
+            {"full_name": "User Three", "email": "three@test.com",
+             "password": "123ABCde", "department": 99},
+            {"full_name": "User Four", "email": "admin@test.com",
+             "password": "123ABCde", "department": self.department2.pk},
+            {"full_name": "User Five", "email": "one@test.com",
+             "password": "123ABCde", "department": self.department2.pk},
+        ]
+
+        response = self.client.post('/users/bulk_create', data=data, format='json')
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        self.assertEquals(response.data['created'], 1)
+        self.assertEquals([error['row'] for error in response.data['errors']], [2, 3, 4, 5])
+        self.assertIn('password', response.data['errors'][0]['errors'])
+        self.assertIn('department', response.data['errors'][1]['errors'])
+        self.assertIn('email', response.data['errors'][2]['errors'])
+        self.assertIn('email', response.data['errors'][3]['errors'])
+
+        user = User.objects.get(email='one@test.com')
+        self.assertEquals(user.department, self.department1)
+        self.assertTrue(user.check_password('123ABCde'))
+
+    @override_settings(USERS_BULK_IMPORT_BATCH_SIZE=2)
+    def test_bulk_create_csv(self):
+        """Test a streamed CSV body split across several chunks"""
+        lines = ['full_name,email,password,department']
+        for number in range(5):
+            lines.append('User Csv,csv%d@test.com,123ABCde,%d' % (number, self.department2.pk))
+        body = '\n'.join(lines)
+
+        response = self.client.post('/users/bulk_create', data=body, content_type='text/csv')
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        self.assertEquals(response.data['created'], 5)
+        self.assertEquals(User.objects.filter(department=self.department2).count(), 5)
+
+    def test_bulk_create_jsonl(self):
+        """Test a JSON Lines body with a malformed line"""
+        body = '\n'.join([
+            json.dumps({"full_name": "User Jsonl", "email": "jsonl@test.com",
+                        "password": "123ABCde", "department": self.department1.pk}),
+            '{"full_name": ',
+        ])
+
+        response = self.client.post('/users/bulk_create', data=body, content_type='application/jsonl')
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        self.assertEquals(response.data['created'], 1)
+        self.assertEquals(response.data['errors'][0]['row'], 2)
+
+    def test_bulk_create_mixed_types(self):
+        """Test rows with values that are not strings are reported, not a server error"""
+        data = [
+            {"full_name": 123, "email": "one@test.com",
+             "password": "123ABCde", "department": self.department1.pk},
+            {"full_name": "User Two", "email": 5,
+             "password": "123ABCde", "department": self.department1.pk},
+            {"full_name": "User Three", "email": "three@test.com",
+             "password": 12345678, "department": self.department1.pk},
+            {"full_name": ["User"], "email": "four@test.com",
+             "password": "123ABCde", "department": self.department1.pk},
+            {"full_name": "User Five", "email": "five@test.com",
+             "password": "123ABCde", "department": self.department1.pk},
+        ]
+
+        response = self.client.post('/users/bulk_create', data=data, format='json')
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        self.assertEquals(response.data['created'], 1)
+        self.assertEquals([(error['row'], list(error['errors'])) for error in response.data['errors']],
+                          [(1, ['full_name']), (2, ['email']), (3, ['password']), (4, ['full_name'])])
+        self.assertTrue(User.objects.filter(email='five@test.com').exists())
+
+    def test_bulk_create_all_rows_invalid(self):
+        """Test a batch where every row is rejected"""
+        data = [{"full_name": "User 1", "email": "bad@test.com",
+                 "password": "123ABCde", "department": self.department1.pk}]
+
+        response = self.client.post('/users/bulk_create', data=data, format='json')
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('full_name', response.data['errors'][0]['errors'])
+
+    def test_bulk_create_not_a_list(self):
+        """Test endpoint with a single object instead of a list"""
+        data = {"full_name": "User One", "email": "one@test.com",
+                "password": "123ABCde", "department": self.department1.pk}
+
+        response = self.client.post('/users/bulk_create', data=data, format='json')
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(USERS_BULK_IMPORT_HASH_WORKERS=2)
+    def test_bulk_create_process_pool(self):
+        """Test passwords hashed in the process pool are usable"""
+        data = [{"full_name": "User Pool", "email": "pool%d@test.com" % number,
+                 "password": "123ABCde", "department": self.department1.pk}
+                for number in range(4)]
+
+        response = self.client.post('/users/bulk_create', data=data, format='json')
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        for password in User.objects.filter(email__startswith='pool').values_list('password', flat=True):
+            self.assertTrue(check_password('123ABCde', password))
+
+    def test_bulk_create_non_admin(self):
+        """Test if a non admin user is allowed to import users"""
+        self.admin.is_staff = False
+        self.admin.save()
+
+        response = self.client.post('/users/bulk_create', data=[], format='json')
+        self.assertEquals(response.status_code, status.HTTP_403_FORBIDDEN)
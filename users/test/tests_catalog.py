@@ -0,0 +1,128 @@
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.api.catalog import department_catalog
+from users.models import Department, User
+
+
+class DepartmentCatalogTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        self.department1 = Department.objects.create(department="Creation")
+
+        email = 'user1@test.com'
+        password = '123ABCde'
+        extra_fields = {
+            "full_name": 'User Numberone',
+            "department": self.department1,
+            "is_staff": True
+            }
+
+        self.user = User.objects.create_user(email, password, **extra_fields)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def department_names(self, response):
+
+        return [department['department'] for department in response.json()]
+
+    def test_list_is_cached(self):
+        """Test the second listing doesn't query the departments again"""
+        response = self.client.get('/departments/')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(self.department_names(response), ['Creation'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/departments/')
+        self.assertEquals(self.department_names(response), ['Creation'])
+
+    def test_not_modified(self):
+        """Test a request with the current ETag gets a 304"""
+        etag = self.client.get('/departments/')['ETag']
+
+        response = self.client.get('/departments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEquals(response['ETag'], etag)
+
+        response = self.client.get('/departments/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+    def test_invalidated_on_create(self):
+        """Test a department created through the API is listed right away"""
+        etag = self.client.get('/departments/')['ETag']
+
+        response = self.client.post("/departments/", data={"department": "Development"})
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get('/departments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(self.department_names(response), ['Creation', 'Development'])
+
+    def test_invalidated_on_delete(self):
+        """Test a deleted department disappears from the list"""
+        department2 = Department.objects.create(department="Development")
+        self.client.get('/departments/')
+
+        response = self.client.delete('/departments/%d/delete/' % department2.pk)
+        self.assertEquals(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEquals(self.department_names(self.client.get('/departments/')), ['Creation'])
+
+    def test_invalidated_on_admin_edit(self):
+        """Test a department renamed in the admin is listed with its new name"""
+        self.client.get('/departments/')
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            '/admin/users/department/%d/change/' % self.department1.pk, data={"department": "Design"})
+        self.assertEquals(response.status_code, status.HTTP_302_FOUND)
+        self.assertEquals(self.department_names(self.client.get('/departments/')), ['Design'])
+
+    def test_member_counts_not_cached(self):
+        """Test member counts change without changing the catalog"""
+        etag = self.client.get('/departments/')['ETag']
+        User.objects.create_user('user2@test.com', '123ABCde', full_name='User Numbertwo',
+                                 department=self.department1)
+
+        response = self.client.get('/departments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get('/departments/member_counts/')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.json(), [
+            {"id": self.department1.pk, "department": "Creation", "member_count": 2}])
+
+        response = self.client.get('/departments/%d/' % self.department1.pk)
+        self.assertEquals(response.json()['member_count'], 2)
+
+    def test_local_snapshot_expires(self):
+        """Test without a shared cache a change made by another worker shows
+        up once the snapshot is too old"""
+        first = department_catalog.get()
+        # Another worker's write, which only bumps that worker's version
+        Department.objects.filter(pk=self.department1.pk).update(department="Renamed")
+        self.assertIs(department_catalog.get(), first)
+
+        with mock.patch('users.api.catalog.time.monotonic', return_value=first.built_at + 5):
+            self.assertEquals(department_catalog.get().data[0]['department'], "Renamed")
+
+    @override_settings(USERS_DEPARTMENT_CACHE_ALIAS='default')
+    def test_shared_version(self):
+        """Test a version bumped by another worker rebuilds the snapshot"""
+        first = department_catalog.get()
+        Department.objects.filter(pk=self.department1.pk).update(department="Renamed")
+        self.assertEquals(department_catalog.get().version, first.version)
+
+        department_catalog.shared.incr('users:departments:version')
+        self.assertEquals(department_catalog.get().data[0]['department'], "Renamed")
@@ -0,0 +1,244 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.departments import recount_members, run_deletion_job, schedule_deletion
+from users.jobs import department_deletions
+from users.models import Department, DepartmentDeletionJob, User
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000, USERS_BULK_IMPORT_HASH_WORKERS=0)
+class DepartmentMembersTestCase(APITestCase):
+
+    def setUp(self):
+
+        self.department1 = Department.objects.create(department="Creation")
+        self.department2 = Department.objects.create(department="Development")
+
+        self.admin = User.objects.create_user(
+            'admin@test.com', '123ABCde', full_name='Admin User',
+            department=self.department1, is_staff=True)
+        self.user = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+        self.token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def member_counts(self):
+        return dict(Department.objects.values_list('department', 'member_count'))
+
+    def test_member_count_follows_users(self):
+        """Test creating, moving and deleting users keeps the counts right"""
+        self.assertEquals(self.member_counts(), {'Creation': 2, 'Development': 0})
+
+        user = User.objects.get(pk=self.user.pk)
+        user.department = self.department2
+        user.save()
+        self.assertEquals(self.member_counts(), {'Creation': 1, 'Development': 1})
+
+        user.full_name = 'User Renamed'
+        user.save()
+        self.assertEquals(self.member_counts(), {'Creation': 1, 'Development': 1})
+
+        user.delete()
+        self.assertEquals(self.member_counts(), {'Creation': 1, 'Development': 0})
+
+    def test_member_count_after_refresh(self):
+        """Test a user moved elsewhere and read again is counted from where he is now"""
+        department3 = Department.objects.create(department="Design")
+        stale = User.objects.get(pk=self.user.pk)
+        moved = User.objects.get(pk=self.user.pk)
+        moved.department = self.department2
+        moved.save()
+
+        stale.refresh_from_db()
+        stale.department = department3
+        stale.save()
+        self.assertEquals(self.member_counts(), {'Creation': 1, 'Development': 0, 'Design': 1})
+
+    def test_member_count_update_view(self):
+        """Test moving a user through the API moves the count"""
+        data = {'full_name': 'User Numberone', 'email': 'user1@test.com', 'department': self.department2.pk}
+        response = self.client.put('/users/%d/update/' % self.user.pk, data=data)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(self.member_counts(), {'Creation': 1, 'Development': 1})
+
+    def test_member_count_bulk_import(self):
+        """Test users inserted by bulk_create are counted"""
+        data = [
+            {"full_name": "User Two", "email": "two@test.com",
+             "password": "123ABCde", "department": self.department2.pk},
+            {"full_name": "User Three", "email": "three@test.com",
+             "password": "123ABCde", "department": self.department2.pk},
+        ]
+        response = self.client.post('/users/bulk_create', data=data, format='json')
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        self.assertEquals(self.member_counts(), {'Creation': 2, 'Development': 2})
+
+    def test_recount_members(self):
+        """Test counts that drifted are recomputed from the users table"""
+        Department.objects.update(member_count=7)
+
+        self.assertEquals(recount_members([self.department2.pk]), 1)
+        self.assertEquals(self.member_counts(), {'Creation': 7, 'Development': 0})
+        call_command('recount_members', stdout=StringIO())
+        self.assertEquals(self.member_counts(), {'Creation': 2, 'Development': 0})
+
+    def test_recount_migration(self):
+        """Test the migration recounts the inactive members 0003 counted"""
+        migration = import_module('users.migrations.0011_user_default_manager')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        migration.recount_members(apps, None)
+        self.assertEquals(self.member_counts(), {'Creation': 1, 'Development': 0})
+
+    def test_department_users(self):
+        """Test the members of a department are listed page by page"""
+        User.objects.create_user('user2@test.com', '123ABCde', full_name='User Two', department=self.department2)
+
+        response = self.client.get('/departments/%d/users/' % self.department1.pk, {'page_size': 1})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals([user['email'] for user in response.data['results']], ['admin@test.com'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEquals([user['email'] for user in response.data['results']], ['user1@test.com'])
+        self.assertIsNone(response.data['next'])
+
+    def test_department_users_not_found(self):
+        """Test a department that doesn't exist"""
+        response = self.client.get('/departments/99/users/')
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_department_users_other_department(self):
+        """Test a non staff user can only list his own department"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(token))
+
+        response = self.client.get('/departments/%d/users/' % self.department1.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/departments/%d/users/' % self.department2.pk)
+        self.assertEquals(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_delete_dry_run(self):
+        """Test the preview reports the cascade without deleting anything"""
+        Token.objects.create(user=self.user)
+
+        response = self.client.delete('/departments/%d/delete/?dry_run=true' % self.department1.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.data, {
+            'department': self.department1.pk, 'users': 2, 'tokens': 2,
+            'group_links': 0, 'permission_links': 0})
+        self.assertEquals(User.objects.count(), 2)
+
+    @override_settings(USERS_DEPARTMENT_DELETE_BATCH_SIZE=1)
+    def test_delete_in_batches(self):
+        """Test the members are deleted batch by batch before the department"""
+        User.objects.create_user('user2@test.com', '123ABCde', full_name='User Two', department=self.department2)
+        User.objects.create_user('user3@test.com', '123ABCde', full_name='User Three', department=self.department2)
+
+        response = self.client.delete('/departments/%d/delete/' % self.department2.pk)
+        self.assertEquals(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Department.objects.filter(pk=self.department2.pk).exists())
+        self.assertEquals(User.objects.count(), 2)
+        self.assertEquals(self.member_counts(), {'Creation': 2})
+
+    def test_delete_bad_dry_run(self):
+        """Test an invalid dry_run value"""
+        response = self.client.delete('/departments/%d/delete/?dry_run=maybe' % self.department1.pk)
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class BackgroundDepartmentDeleteTestCase(APITestCase):
+
+    def setUp(self):
+
+        self.department1 = Department.objects.create(department="Creation")
+        self.department2 = Department.objects.create(department="Development")
+
+        self.admin = User.objects.create_user(
+            'admin@test.com', '123ABCde', full_name='Admin User',
+            department=self.department1, is_staff=True)
+        for number in range(3):
+            user = User.objects.create_user(
+                'user%d@test.com' % number, '123ABCde', full_name='User Member', department=self.department2)
+            Token.objects.create(user=user)
+        self.token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def test_background_delete(self):
+        """Test the department is hidden at once and its job deletes it in batches"""
+        response = self.client.delete('/departments/%d/delete/?background=true' % self.department2.pk)
+        self.assertEquals(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEquals(response['Location'], '/departments/jobs/%d/' % response.data['id'])
+        self.assertEquals(response.data['status'], DepartmentDeletionJob.PENDING)
+        self.assertEquals(response.data['total'], 3)
+
+        names = [department['department'] for department in self.client.get('/departments/').json()]
+        self.assertEquals(names, ['Creation'])
+        response = self.client.delete('/departments/%d/delete/?background=true' % self.department2.pk)
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        job = DepartmentDeletionJob.objects.get()
+        run_deletion_job(job.pk, batch_size=2)
+
+        response = self.client.get('/departments/jobs/%d/' % job.pk)
+        self.assertEquals(response.data['status'], DepartmentDeletionJob.DONE)
+        self.assertEquals(response.data['deleted'], 3)
+        self.assertFalse(Department.all_objects.filter(pk=self.department2.pk).exists())
+        self.assertEquals(list(User.objects.values_list('email', flat=True)), ['admin@test.com'])
+        self.assertEquals(Token.objects.count(), 1)
+
+    def test_unfinished_jobs_command(self):
+        """Test the command runs the jobs a stopped process left behind"""
+        job = schedule_deletion(self.department2)
+
+        call_command('run_department_deletions', stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEquals(job.status, DepartmentDeletionJob.DONE)
+        self.assertEquals(User.objects.count(), 1)
+
+    def test_job_status_staff_only(self):
+        """Test a non staff user can't see the jobs"""
+        job = schedule_deletion(self.department2)
+        user = User.objects.create_user('user9@test.com', '123ABCde', full_name='User Nine')
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(token))
+
+        response = self.client.get('/departments/jobs/%d/' % job.pk)
+        self.assertEquals(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class DepartmentDeletionQueueTestCase(TransactionTestCase):
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def test_job_runs_after_commit(self):
+        """Test the queued job deletes the department once the request commits"""
+        department = Department.objects.create(department="Development")
+        User.objects.create_user('user1@test.com', '123ABCde', full_name='User Numberone', department=department)
+
+        job = schedule_deletion(department)
+        department_deletions.join()
+
+        job.refresh_from_db()
+        self.assertEquals(job.status, DepartmentDeletionJob.DONE)
+        self.assertEquals(job.deleted, 1)
+        self.assertFalse(User.objects.exists())
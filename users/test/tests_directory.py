@@ -0,0 +1,111 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from django.test import override_settings
+from users.api.authentication import token_cache
+from users.models import Department, User
+
+
+class UserDirectoryTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.department2 = Department.objects.create(department="Development")
+
+        email = 'admin@test.com'
+        password = '123ABCde'
+        extra_fields = {"full_name": 'Admin User',
+        "department": self.department1,
+        "is_staff": True}
+
+        self.admin = User.objects.create_user(email, password, **extra_fields)
+        self.token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+        users = []
+        for number in range(6):
+            users.append(User(
+                email='user%d@test.com' % number,
+                full_name='Member Number%d' % number,
+                department=self.department1 if number % 2 else self.department2,
+                is_active=number != 5))
+        User.objects.bulk_create(users)
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def test_directory_filters(self):
+        """Test the department, is_active and search filters"""
+        response = self.client.get('/users/', {'department': self.department1.pk})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(len(response.data['results']), 4)
+
+        response = self.client.get('/users/', {'is_active': 'false'})
+        self.assertEquals([user['email'] for user in response.data['results']], ['user5@test.com'])
+
+        response = self.client.get('/users/', {'is_staff': 'true'})
+        self.assertEquals([user['email'] for user in response.data['results']], ['admin@test.com'])
+
+        response = self.client.get('/users/', {'search': 'member number1'})
+        self.assertEquals([user['email'] for user in response.data['results']], ['user1@test.com'])
+
+        response = self.client.get('/users/', {'search': 'USER3'})
+        self.assertEquals([user['email'] for user in response.data['results']], ['user3@test.com'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plan')
+    def test_directory_search_uses_indexes(self):
+        """Test the case insensitive prefix search doesn't scan the table"""
+        plan = User.objects.filter(
+            Q(email__istartswith='user') | Q(full_name__istartswith='user')).explain()
+        self.assertIn('user_email_nocase_idx', plan)
+        self.assertIn('user_full_name_nocase_idx', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def test_directory_invalid_filter(self):
+        """Test endpoint with filter values that can't be parsed"""
+        response = self.client.get('/users/', {'is_active': 'maybe'})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/users/', {'department': 'abc'})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(USERS_DIRECTORY_PAGE_SIZE=3)
+    def test_directory_cursor_pages(self):
+        """Test walking every page of the directory with the cursor links"""
+        emails = []
+        url = '/users/'
+        while url:
+            # token and the page
+            with self.assertNumQueries(2 if url == '/users/' else 1):
+                response = self.client.get(url)
+            self.assertEquals(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('password', response.data['results'][0])
+            emails.extend(user['email'] for user in response.data['results'])
+            url = response.data['next']
+
+        self.assertEquals(len(emails), 7)
+        self.assertEquals(len(set(emails)), 7)
+
+    def test_directory_non_staff(self):
+        """Test a non staff user only lists his own department"""
+        user = User.objects.get(email='user0@test.com')
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(token))
+
+        response = self.client.get('/users/')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(
+            {user['department'] for user in response.data['results']}, {self.department2.pk})
+
+    def test_directory_unauthenticated(self):
+        """Test if a non logged in user is allowed to list users"""
+        self.client.credentials()
+        response = self.client.get('/users/')
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.models import Department, User
+
+
+class UserExportTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        self.department1 = Department.objects.create(department="Creation")
+
+        email = 'admin@test.com'
+        password = '123ABCde'
+        extra_fields = {"full_name": 'Admin User',
+        "department": self.department1,
+        "is_staff": True}
+
+        self.admin = User.objects.create_user(email, password, **extra_fields)
+        self.token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+        User.objects.bulk_create([
+            User(email='user%d@test.com' % number, full_name='User Ção', department=None)
+            for number in range(3)])
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def test_export_csv(self):
+        """Test the CSV export streams a header and one line per user"""
+        response = self.client.get('/users/export/')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        body = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEquals(len(rows), 4)
+        self.assertEquals(rows[0]['department'], 'Creation')
+        self.assertEquals(rows[1]['full_name'], 'User Ção')
+        self.assertNotIn('password', rows[0])
+
+    def test_export_jsonl(self):
+        """Test the JSON Lines export"""
+        response = self.client.get('/users/export/', {'output': 'jsonl'})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEquals(len(lines), 4)
+        self.assertEquals(json.loads(lines[0])['email'], 'admin@test.com')
+        self.assertIsNone(json.loads(lines[1])['department'])
+
+    def test_export_wrong_format(self):
+        """Test endpoint with an output format that doesn't exist"""
+        response = self.client.get('/users/export/', {'output': 'xml'})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_non_admin(self):
+        """Test if a non admin user is allowed to export users"""
+        self.admin.is_staff = False
+        self.admin.save()
+
+        response = self.client.get('/users/export/')
+        self.assertEquals(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_command(self):
+        """Test the export_users management command"""
+        out = io.StringIO()
+        call_command('export_users', '--format', 'jsonl', '--chunk-size', '2', stdout=out)
+        self.assertEquals(len(out.getvalue().splitlines()), 4)
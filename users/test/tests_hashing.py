@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import check_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.api.throttling import local_backend
+from users.hashing import (check_password_async, get_process_pool, hash_passwords,
+                            make_password_async)
+from users.models import Department, User
+
+
+def iterations_of(encoded):
+    return int(encoded.split('$')[1])
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class RehashOnLoginTestCase(APITestCase):
+
+    def setUp(self):
+
+        local_backend.clear()
+        self.department1 = Department.objects.create(department="Creation")
+
+        email = 'user1@test.com'
+        password = '123ABCde'
+        extra_fields = {"full_name": 'User Numberone',
+        "department": self.department1}
+
+        self.user = User.objects.create_user(email, password, **extra_fields)
+
+    def log_in(self):
+
+        data = {
+            "username": "user1@test.com",
+            "password": "123ABCde",
+        }
+        return self.client.post('/api-token-auth/', data=data)
+
+    def test_hash_uses_configured_cost(self):
+        """Test new passwords are hashed with USERS_PBKDF2_ITERATIONS"""
+        self.assertEquals(iterations_of(self.user.password), 1000)
+
+    @override_settings(USERS_PBKDF2_ITERATIONS=2000, USERS_PASSWORD_REHASH_IN_BACKGROUND=False)
+    def test_rehash_on_login(self):
+        """Test a login upgrades a password hashed with an old cost"""
+        response = self.log_in()
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertEquals(iterations_of(self.user.password), 2000)
+        self.assertTrue(self.user.check_password('123ABCde'))
+
+    @override_settings(USERS_PBKDF2_ITERATIONS=2000)
+    def test_rehash_in_background(self):
+        """Test the upgrade is handed to the pool instead of delaying the response"""
+        with mock.patch('users.hashing.get_thread_pool') as get_thread_pool:
+            response = self.log_in()
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(get_thread_pool.return_value.submit.called)
+
+        self.user.refresh_from_db()
+        self.assertEquals(iterations_of(self.user.password), 1000)
+
+    @override_settings(USERS_PBKDF2_ITERATIONS=2000, USERS_PASSWORD_REHASH_IN_BACKGROUND=False)
+    def test_rehash_skips_changed_password(self):
+        """Test a rehash never overwrites a password changed in the meantime"""
+        stale = User.objects.get(pk=self.user.pk)
+        self.user.set_password('123ABCaa')
+        self.user.save()
+
+        self.assertTrue(stale.check_password('123ABCde'))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('123ABCaa'))
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class AsyncHashingTestCase(TestCase):
+
+    def test_make_and_check_password_async(self):
+        """Test hashing and checking through the pool from async code"""
+        encoded = async_to_sync(make_password_async)('123ABCde')
+        self.assertTrue(check_password('123ABCde', encoded))
+
+        user = User(email='user1@test.com', password=encoded)
+        self.assertTrue(async_to_sync(check_password_async)(user, '123ABCde'))
+        self.assertFalse(async_to_sync(check_password_async)(user, '123ABCdf'))
+
+    def test_one_process_pool_per_size(self):
+        """Test threads asking for a pool at the same time share one"""
+        def slow_pool(**kwargs):
+            time.sleep(0.05)
+            return mock.Mock()
+
+        pools = []
+        with mock.patch('users.hashing.ProcessPoolExecutor', side_effect=slow_pool) as executor, \
+                mock.patch.dict('users.hashing._process_pools', clear=True):
+            threads = [threading.Thread(target=lambda: pools.append(get_process_pool(3)))
+                       for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEquals(executor.call_count, 1)
+        self.assertEquals(len({id(pool) for pool in pools}), 1)
+
+    def test_hash_passwords_chunks(self):
+        """Test the batch is split by the worker count given"""
+        executor = mock.Mock()
+        executor.map.side_effect = lambda function, passwords, chunksize: map(function, passwords)
+        encoded = hash_passwords(['123ABCde'] * 16, executor, workers=2)
+        self.assertEquals(executor.map.call_args[1]['chunksize'], 2)
+        self.assertTrue(check_password('123ABCde', encoded[0]))
+
+    def test_benchmark_command(self):
+        """Test the benchmark reports each configuration and saves JSON"""
+        path = os.path.join(tempfile.mkdtemp(), 'hashing.json')
+        out = io.StringIO()
+        call_command('benchmark_hashing', '--iterations', '100,200', '--workers', '1,2',
+                     '--seconds', '0.01', '--json', path, stdout=out)
+
+        with open(path) as results_file:
+            results = json.load(results_file)['results']
+        self.assertEquals(len([result for result in results if result['algorithm'] == 'pbkdf2_sha256']), 4)
+        self.assertIn('hashes/sec', out.getvalue())
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.api.throttling import local_backend
+from users.lifecycle import purge_users
+from users.models import Department, User
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class SoftDeleteTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        local_backend.clear()
+        self.department1 = Department.objects.create(department="Creation")
+
+        self.admin = User.objects.create_user(
+            'admin@test.com', '123ABCde', full_name='Admin User',
+            department=self.department1, is_staff=True)
+        self.admin_token = Token.objects.create(user=self.admin)
+
+        self.user = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def test_soft_delete(self):
+        """Test deleting a profile deactivates the user and revokes his tokens"""
+        self.client.get('/profiles/%d/' % self.user.pk)
+
+        response = self.client.delete('/users/%d/delete/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        user = User.all_objects.get(pk=self.user.pk)
+        self.assertFalse(user.is_active)
+        self.assertIsNotNone(user.deleted_at)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Token.objects.filter(user=user).exists())
+        self.assertEquals(Department.objects.get().member_count, 1)
+
+        response = self.client.get('/profiles/%d/' % self.admin.pk)
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_hard_delete(self):
+        """Test hard=true deletes the user right away"""
+        response = self.client.delete('/users/%d/delete/?hard=true' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(User.all_objects.filter(pk=self.user.pk).exists())
+        self.assertEquals(Department.objects.get().member_count, 1)
+
+    def test_inactive_user_hidden(self):
+        """Test a deactivated user can't log in and isn't found by the profile views"""
+        self.client.delete('/users/%d/delete/' % self.user.pk)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.admin_token))
+
+        response = self.client.get('/profiles/%d/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post('/api-token-auth/', data={'username': 'user1@test.com', 'password': '123ABCde'})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/users/', {'is_active': 'false'})
+        self.assertEquals([user['email'] for user in response.data['results']], ['user1@test.com'])
+
+    def test_inactive_token_rejected(self):
+        """Test a token whose user was deactivated another way is refused"""
+        User.all_objects.filter(pk=self.user.pk).update(is_active=False)
+
+        response = self.client.get('/profiles/%d/' % self.admin.pk)
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_email_still_taken(self):
+        """Test the email of a deactivated user can't be reused before the purge"""
+        self.client.delete('/users/%d/delete/' % self.user.pk)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.admin_token))
+
+        data = {'full_name': 'Admin User', 'email': 'user1@test.com', 'department': self.department1.pk}
+        response = self.client.put('/users/%d/update/' % self.admin.pk, data=data)
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', response.data)
+
+    def test_purge(self):
+        """Test only users deleted long enough ago are purged"""
+        self.client.delete('/users/%d/delete/' % self.user.pk)
+        old = User.all_objects.create_user('old@test.com', '123ABCde', full_name='Old User')
+        User.all_objects.filter(pk=old.pk).update(
+            is_active=False, deleted_at=timezone.now() - timedelta(days=40))
+        deactivated = User.all_objects.create_user('off@test.com', '123ABCde', full_name='Off User')
+        User.all_objects.filter(pk=deactivated.pk).update(is_active=False)
+
+        self.assertEquals(purge_users(days=30, batch_size=1), 1)
+        self.assertFalse(User.all_objects.filter(pk=old.pk).exists())
+
+        call_command('purge_users', days=0, stdout=StringIO())
+        self.assertEquals(
+            sorted(User.all_objects.values_list('email', flat=True)), ['admin@test.com', 'off@test.com'])
@@ -0,0 +1,136 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users import metrics
+from users.api.authentication import token_cache
+from users.models import Department, User
+
+
+class MetricsMiddlewareTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        metrics.registry.reset()
+        self.department1 = Department.objects.create(department="Creation")
+
+        email = 'user1@test.com'
+        password = '123ABCde'
+        extra_fields = {
+            "full_name": 'User Numberone',
+            "department": self.department1,
+            "is_staff": True
+            }
+
+        self.user = User.objects.create_user(email, password, **extra_fields)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+        metrics.registry.reset()
+
+    def test_records_endpoint(self):
+        """Test a request is recorded under its route with its queries"""
+        response = self.client.get('/users/%d/profile/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+        key = ('users/<int:pk>/profile/', 'GET')
+        self.assertEquals(metrics.registry.requests[key + ('200',)], 1)
+        self.assertEquals(metrics.registry.queries[key].sum, 2)
+        self.assertGreater(metrics.registry.serializer_time[key], 0)
+
+    def test_prometheus_endpoint(self):
+        """Test the metrics are exposed in the Prometheus text format"""
+        self.client.get('/users/%d/profile/' % self.user.pk)
+
+        response = self.client.get('/metrics/')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn(
+            'users_http_requests_total{endpoint="users/<int:pk>/profile/",method="GET",status="200"} 1', body)
+        self.assertIn('users_http_request_duration_seconds_bucket{endpoint="users/<int:pk>/profile/"', body)
+
+    def test_metrics_non_admin(self):
+        """Test if a non admin user is allowed to read the metrics"""
+        self.user.is_staff = False
+        self.user.save()
+
+        response = self.client.get('/metrics/')
+        self.assertEquals(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(USERS_METRICS_SAMPLE_RATE=0)
+    def test_sampling_disabled(self):
+        """Test nothing is recorded with a sample rate of 0"""
+        self.client.get('/users/%d/profile/' % self.user.pk)
+        self.assertEquals(len(metrics.registry.requests), 0)
+
+    @override_settings(USERS_METRICS_JSON_LOG=True)
+    def test_json_log_report(self):
+        """Test the report command summarizes the JSON log"""
+        with self.assertLogs('users.metrics.requests') as logs:
+            self.client.get('/users/%d/profile/' % self.user.pk)
+            self.client.get('/users/%d/profile/' % self.user.pk)
+
+        path = os.path.join(tempfile.mkdtemp(), 'requests.log')
+        with open(path, 'w') as log_file:
+            log_file.write('\n'.join(logs.output))
+
+        out = io.StringIO()
+        call_command('metrics_report', path, '--json', stdout=out)
+        summary = json.loads(out.getvalue())[0]
+        self.assertEquals(summary['endpoint'], 'users/<int:pk>/profile/')
+        self.assertEquals(summary['requests'], 2)
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class PercentileTestCase(SimpleTestCase):
+
+    def test_nearest_rank(self):
+        """Test the percentiles are nearest rank ones"""
+        values = list(range(1, 101))
+        self.assertEquals(metrics.percentile(values, 0.99), 99)
+        self.assertEquals(metrics.percentile(values, 0.50), 50)
+        self.assertEquals(metrics.percentile(values, 1.0), 100)
+        self.assertEquals(metrics.percentile([1, 2, 3], 0.50), 2)
+        self.assertEquals(metrics.percentile(values, 0.07), 7)
+        self.assertEquals(metrics.percentile([7], 0.99), 7)
+        self.assertEquals(metrics.percentile([], 0.99), 0.0)
+
+
+class AsyncMetricsTestCase(TransactionTestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        metrics.registry.reset()
+        self.user = User.objects.create_user('user1@test.com', '123ABCde', full_name='User Numberone')
+        self.token = Token.objects.create(user=self.user)
+
+    def tearDown(self):
+
+        token_cache.clear()
+        metrics.registry.reset()
+
+    def get(self, path):
+        # AsyncClient sends its extra arguments as headers, under their own name
+        return self.async_client.get(path, authorization="Token " + str(self.token))
+
+    async def test_records_async_queries(self):
+        """Test the queries of requests served through ASGI are counted"""
+        response = await self.get('/async/profiles/%d/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        response = await self.get('/users/%d/profile/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+        self.assertGreater(metrics.registry.queries[('async/profiles/<int:pk>/', 'GET')].sum, 0)
+        # The profile itself, the token was cached by the first request
+        self.assertEquals(metrics.registry.queries[('users/<int:pk>/profile/', 'GET')].sum, 1)
@@ -0,0 +1,115 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.models import Department, User
+
+
+class ObjectPermissionsQueryTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.department2 = Department.objects.create(department="Development")
+
+        email = 'user1@test.com'
+        password = '123ABChj'
+        extra_fields = {"full_name": 'User Numberone',
+        "department": self.department1}
+
+        self.user1 = User.objects.create_user(email, password, **extra_fields)
+        self.token1 = Token.objects.create(user=self.user1)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token1))
+
+        email = 'user2@test.com'
+        extra_fields = {"full_name": 'User Numbertwo',
+        "department": self.department1}
+
+        self.user2 = User.objects.create_user(email, password, **extra_fields)
+
+        email = 'user3@test.com'
+        extra_fields = {"full_name": 'User Numberthree',
+        "department": self.department2}
+
+        self.user3 = User.objects.create_user(email, password, **extra_fields)
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def target_user_reads(self, queries, pk):
+        """Counts the SELECTs that load the target user row, through the
+        default manager's is_active filter"""
+        target = re.compile(r'WHERE \(?("users_user"."is_active" AND )?"users_user"."id" = %d\b' % pk)
+        return [query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith('SELECT') and target.search(query['sql'])]
+
+    def test_update_loads_target_once(self):
+        """Test an update reads the target user a single time, with its department"""
+        data = {
+            "full_name": "User Numbertwo Update",
+            "email": "user2_update@teste.com.br",
+            "department": self.department1.pk
+            }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put('/users/%d/update/' % self.user2.pk, data=data)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+        reads = self.target_user_reads(queries, self.user2.pk)
+        self.assertEquals(len(reads), 1)
+        self.assertIn('JOIN "users_department"', reads[0])
+
+    def test_update_query_count(self):
+        """Test the total number of queries of an update"""
+        data = {
+            "full_name": "User Numbertwo Update",
+            "email": "user2_update@teste.com.br",
+            "department": self.department1.pk
+            }
+
+        # token, target user, department field, unique email and the update
+        with self.assertNumQueries(5):
+            response = self.client.put('/users/%d/update/' % self.user2.pk, data=data)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+    def test_update_forbidden_loads_target_once(self):
+        """Test a forbidden update stops after loading the target user"""
+        data = {
+            "full_name": "User Numberthree Update",
+            "email": "user3_update@teste.com.br",
+            "department": self.department2.pk
+            }
+
+        # token and target user
+        with self.assertNumQueries(2):
+            response = self.client.put('/users/%d/update/' % self.user3.pk, data=data)
+        self.assertEquals(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_update_missing_user(self):
+        """Test endpoint with an user id that doesn't exist"""
+        data = {
+            "full_name": "User Update",
+            "email": "user_update@teste.com.br",
+            "department": self.department1.pk
+            }
+
+        response = self.client.put('/users/99/update/', data=data)
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_loads_target_once(self):
+        """Test a delete reads the target user a single time"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete('/users/%d/delete/' % self.user1.pk)
+        self.assertEquals(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEquals(len(self.target_user_reads(queries, self.user1.pk)), 1)
+
+    def test_delete_missing_user(self):
+        """Test endpoint with an user id that doesn't exist"""
+        response = self.client.delete('/users/99/delete/')
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,80 @@
+from django.contrib.auth.models import Group, Permission
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from users.api.plans import FieldPlan, plan_for
+from users.api.serializers import (DepartmentSerializer, ProfileDetailSerializer,
+                                   ProfileListSerializer, UserDirectorySerializer)
+from users.models import Department, User
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class FieldPlanTestCase(TestCase):
+
+    def setUp(self):
+
+        self.department1 = Department.objects.create(department="Creation")
+        Department.objects.create(department="Design")
+        support = Group.objects.create(name="Support")
+        sales = Group.objects.create(name="Sales")
+
+        self.user1 = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+        self.user1.groups.add(sales, support)
+        self.user1.user_permissions.add(*Permission.objects.order_by('id')[:3])
+        self.user1.last_login = timezone.now()
+        self.user1.save()
+
+        self.user2 = User.objects.create_user('user2@test.com', '123ABCde', full_name='User Numbertwo')
+        self.user2.groups.add(support)
+        User.objects.create_user(
+            'user3@test.com', '123ABCde', full_name='User Numberthree', department=self.department1,
+            is_staff=True)
+
+    def assertParity(self, serializer_class, queryset):
+        expected = render(serializer_class(queryset, many=True).data)
+        self.assertEquals(render(plan_for(serializer_class).serialize(queryset)), expected)
+        for instance in queryset:
+            single = queryset.filter(pk=instance.pk)
+            self.assertEquals(render(plan_for(serializer_class).serialize(single)[0]),
+                              render(serializer_class(instance).data))
+
+    def test_parity(self):
+        """Test the plans render the same JSON as the serializers"""
+        users = User.all_objects.order_by('id')
+        self.assertParity(ProfileListSerializer, users)
+        self.assertParity(ProfileDetailSerializer, users)
+        self.assertParity(UserDirectorySerializer, users)
+        self.assertParity(DepartmentSerializer, Department.objects.order_by('id'))
+
+    def test_parity_soft_deleted(self):
+        """Test datetimes and empty many to many fields keep their format"""
+        User.all_objects.filter(pk=self.user2.pk).update(is_active=False, deleted_at=timezone.now())
+        self.user2.groups.clear()
+        self.assertParity(ProfileDetailSerializer, User.all_objects.order_by('id'))
+
+    def test_queries(self):
+        """Test a page costs one query, and one more per many to many field"""
+        with self.assertNumQueries(1):
+            plan_for(ProfileListSerializer).serialize(User.objects.all())
+        with self.assertNumQueries(3):
+            plan_for(ProfileDetailSerializer).serialize(User.objects.all())
+        with self.assertNumQueries(0):
+            self.assertEquals(plan_for(ProfileDetailSerializer).serialize(User.objects.none()), [])
+
+    def test_unsupported_fields(self):
+        """Test fields without a column of their own are refused"""
+        class NestedSerializer(serializers.ModelSerializer):
+            department_name = serializers.CharField(source='department.department')
+
+            class Meta:
+                model = User
+                fields = ['id', 'department_name']
+
+        with self.assertRaises(ImproperlyConfigured):
+            FieldPlan(NestedSerializer)
@@ -0,0 +1,67 @@
+from django.contrib.auth.models import Group
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.models import Department, User
+
+
+class ProfileReadTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        self.department1 = Department.objects.create(department="Creation")
+
+        email = 'user1@test.com'
+        password = '123ABCde'
+        extra_fields = {"full_name": 'User Numberone',
+        "department": self.department1}
+
+        self.user = User.objects.create_user(email, password, **extra_fields)
+        self.user.groups.add(Group.objects.create(name="Support"))
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def test_profile_list_compat(self):
+        """Test the original profile URL still answers with a list, in one query"""
+        # token and user
+        with self.assertNumQueries(2):
+            response = self.client.get('/users/%d/profile/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.json(), [{"id": self.user.pk, "full_name": "User Numberone"}])
+
+    def test_profile_detail_compat(self):
+        """Test the original detail URL still answers with a list"""
+        # token, user, groups and permissions
+        with self.assertNumQueries(4):
+            response = self.client.get('/users/%d/detail/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(len(response.json()), 1)
+
+    def test_retrieve_profile(self):
+        """Test the single object profile endpoint"""
+        with self.assertNumQueries(2):
+            response = self.client.get('/profiles/%d/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.json(), {"id": self.user.pk, "full_name": "User Numberone"})
+
+    def test_retrieve_profile_detail(self):
+        """Test the single object detail endpoint prefetches the many to many fields"""
+        with self.assertNumQueries(4):
+            response = self.client.get('/profiles/%d/detail/' % self.user.pk)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.json()['email'], 'user1@test.com')
+        self.assertEquals(len(response.json()['groups']), 1)
+
+    def test_retrieve_profile_wrong_id(self):
+        """Test endpoint with an id that doesn't exist"""
+        response = self.client.get('/profiles/15/')
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get('/profiles/15/detail/')
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
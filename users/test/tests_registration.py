@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from users.api import idempotency
+from users.checks import check_idempotency_cache
+from users.models import Department, User
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class CreateProfileTestCase(APITestCase):
+
+    def setUp(self):
+
+        idempotency._cache().clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.data = {
+            "full_name": "User Numberone",
+            "email": "user1@test.com",
+            "password": "123ABC8a",
+            "department": self.department1.pk,
+        }
+
+    def tearDown(self):
+
+        idempotency._cache().clear()
+
+    def test_create_user(self):
+        """Test the response is built from the created user without its password"""
+        response = self.client.post('/users/create', data=self.data)
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('password', response.data)
+
+        user = User.objects.get(email='user1@test.com')
+        self.assertEquals(response.data['id'], user.pk)
+        self.assertEquals(response.data['department'], self.department1.pk)
+        self.assertTrue(user.check_password('123ABC8a'))
+
+    def test_create_user_queries(self):
+        """Test a registration costs one read, one INSERT and the member count UPDATE"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/users/create', data=self.data)
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+
+        statements = [query['sql'].split(' ', 1)[0] for query in context.captured_queries]
+        self.assertEquals(statements.count('SELECT'), 1)
+        self.assertEquals(statements.count('INSERT'), 1)
+        self.assertEquals(statements.count('UPDATE'), 1)
+
+    def test_create_user_duplicate_email(self):
+        """Test a taken email is reported by the insert as a 400"""
+        self.client.post('/users/create', data=self.data)
+
+        response = self.client.post('/users/create', data=self.data)
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', response.data)
+
+    def test_idempotent_retry(self):
+        """Test a retry with the same key replays the first response"""
+        first = self.client.post('/users/create', data=self.data, HTTP_IDEMPOTENCY_KEY='retry-1')
+        second = self.client.post('/users/create', data=self.data, HTTP_IDEMPOTENCY_KEY='retry-1')
+
+        self.assertEquals(first.status_code, status.HTTP_201_CREATED)
+        self.assertEquals(second.status_code, status.HTTP_201_CREATED)
+        self.assertEquals(second.data, first.data)
+        self.assertEquals(second['Idempotent-Replayed'], 'true')
+        self.assertEquals(User.objects.filter(email='user1@test.com').count(), 1)
+
+    def test_idempotent_key_reused(self):
+        """Test a key sent again with another payload is refused"""
+        self.client.post('/users/create', data=self.data, HTTP_IDEMPOTENCY_KEY='retry-1')
+
+        data = dict(self.data, email='user2@test.com')
+        response = self.client.post('/users/create', data=data, HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEquals(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(User.objects.filter(email='user2@test.com').exists())
+
+    def test_idempotent_in_progress(self):
+        """Test a retry sent while the first request is running gets a 409"""
+        request = SimpleNamespace(user=AnonymousUser())
+        key = idempotency._cache_key('users:create', request, 'retry-1')
+        idempotency._cache().set(key, {'state': 'pending', 'fingerprint': ''})
+
+        response = self.client.post('/users/create', data=self.data, HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEquals(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(User.objects.exists())
+
+    def test_idempotent_errors_are_replayed(self):
+        """Test a rejected payload is replayed without validating it again"""
+        data = dict(self.data, password='weak')
+        first = self.client.post('/users/create', data=data, HTTP_IDEMPOTENCY_KEY='retry-2')
+        second = self.client.post('/users/create', data=data, HTTP_IDEMPOTENCY_KEY='retry-2')
+
+        self.assertEquals(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEquals(second.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEquals(second['Idempotent-Replayed'], 'true')
+
+    def test_idempotency_key_too_long(self):
+        """Test an oversized key is rejected"""
+        key = 'k' * (idempotency.MAX_KEY_LENGTH + 1)
+        response = self.client.post('/users/create', data=self.data, HTTP_IDEMPOTENCY_KEY=key)
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.exists())
+
+    @override_settings(USERS_IDEMPOTENCY_CACHE_ALIAS='default')
+    def test_idempotency_cache_check(self):
+        """Test a per-process idempotency cache fails the system checks"""
+        self.assertEquals([error.id for error in check_idempotency_cache(None)], ['users.E002'])
+
+        with override_settings(USERS_IDEMPOTENCY_CACHE_ALIAS='missing'):
+            self.assertEquals([error.id for error in check_idempotency_cache(None)], ['users.E001'])
+
+        with override_settings(USERS_IDEMPOTENCY_CACHE_ALIAS='shared'):
+            self.assertEquals(check_idempotency_cache(None), [])
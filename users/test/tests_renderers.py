@@ -0,0 +1,131 @@
+import datetime
+import io
+import json
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.api.encoding import dumps
+from users.api.parsers import FastJSONParser
+from users.api.renderers import FastJSONRenderer, StreamingJSONRenderer
+from users.models import Department, User
+
+DATA = OrderedDict([
+    ('id', 1),
+    ('name', 'Ção \u2028 "quoted"'),
+    ('when', datetime.datetime(2021, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)),
+    ('day', datetime.date(2021, 3, 1)),
+    ('at', datetime.time(12, 30)),
+    ('amount', Decimal('10.50')),
+    ('uuid', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+    ('lazy', gettext_lazy('This field is required.')),
+    ('errors', [ErrorDetail('Invalid.', code='invalid')]),
+    ('keys', {1: 'one'}),
+    ('empty', None),
+    ('nested', [{'a': [True, False, 1.5]}, ()]),
+])
+
+
+class FastJSONTestCase(SimpleTestCase):
+
+    def test_render_parity(self):
+        """Test the rendered bytes are JSONRenderer's, with and without orjson"""
+        expected = JSONRenderer().render(DATA)
+        self.assertEquals(FastJSONRenderer().render(DATA), expected)
+        # Refused by orjson
+        self.assertEquals(FastJSONRenderer().render({'huge': 2 ** 70}), JSONRenderer().render({'huge': 2 ** 70}))
+        with mock.patch('users.api.encoding.orjson', None):
+            self.assertEquals(FastJSONRenderer().render(DATA), expected)
+
+    def test_render_floats(self):
+        """Test floats are spelled as JSONRenderer does, and non-finite ones refused"""
+        data = {'large': [1e20, 1e-7], 'user': {'email': 'a1e2@test.com'}}
+        self.assertEquals(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        for value in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'nested': [value]})
+
+    def test_render_indent(self):
+        """Test indented output is still available"""
+        media_type = 'application/json; indent=2'
+        self.assertEquals(FastJSONRenderer().render(DATA, media_type),
+                          JSONRenderer().render(DATA, media_type))
+        self.assertEquals(FastJSONRenderer().render(None), b'')
+
+    def test_parse(self):
+        """Test bodies are parsed as JSONParser does, errors included"""
+        body = json.dumps({'name': 'Ção', 'huge': 2 ** 70, 'items': [1, 2.5, None]}).encode('utf-8')
+        self.assertEquals(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+        for body in (b'{"name": ', b'{"value": NaN}'):
+            with self.assertRaises(ParseError) as fast:
+                FastJSONParser().parse(io.BytesIO(body))
+            with self.assertRaises(ParseError) as stdlib:
+                JSONParser().parse(io.BytesIO(body))
+            self.assertEquals(str(fast.exception), str(stdlib.exception))
+
+        body = '{"name": "Ção"}'.encode('latin-1')
+        self.assertEquals(FastJSONParser().parse(io.BytesIO(body), parser_context={'encoding': 'latin-1'}),
+                          {'name': 'Ção'})
+
+    def test_stream(self):
+        """Test the streamed array is the list rendered at once"""
+        items = [{'id': number, 'name': 'User %d' % number} for number in range(3)]
+        pieces = list(StreamingJSONRenderer().stream(iter(items)))
+        self.assertEquals(len(pieces), 4)
+        self.assertEquals(b''.join(pieces), dumps(items))
+        self.assertEquals(b''.join(StreamingJSONRenderer().stream([])), b'[]')
+
+
+class NegotiationTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.admin = User.objects.create_user(
+            'admin@test.com', '123ABCde', full_name='Admin Ção', department=self.department1, is_staff=True)
+        self.token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def test_json(self):
+        """Test JSON responses and bodies go through the fast classes"""
+        response = self.client.get('/profiles/%d/' % self.admin.pk, HTTP_ACCEPT='application/json')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEquals(response.content, '{"id":%d,"full_name":"Admin Ção"}'.encode('utf-8') % self.admin.pk)
+
+        response = self.client.patch('/users/%d/update/' % self.admin.pk,
+                                     data={'full_name': 'Admin Renamed'}, format='json')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.data['full_name'], 'Admin Renamed')
+
+    def test_unsupported_media_type(self):
+        """Test a format without a renderer is still refused"""
+        response = self.client.get('/profiles/%d/' % self.admin.pk, HTTP_ACCEPT='application/xml')
+        self.assertEquals(response.status_code, status.HTTP_406_NOT_ACCEPTABLE)
+
+    def test_export_json_array(self):
+        """Test the export streams the users as one JSON array"""
+        response = self.client.get('/users/export/', {'output': 'json'})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        users = json.loads(b''.join(response.streaming_content))
+        self.assertEquals([user['email'] for user in users], ['admin@test.com'])
+        self.assertEquals(users[0]['department'], 'Creation')
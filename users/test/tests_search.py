@@ -0,0 +1,200 @@
+import threading
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.lifecycle import update_users
+from users.models import Department, User
+from users.search import fts5_index, user_index
+
+
+def emails(results):
+    return [user['email'] for user in results]
+
+
+class TrigramIndexFixtures:
+
+    def setUp(self):
+
+        user_index.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.department2 = Department.objects.create(department="Design")
+        self.john = User.objects.create_user(
+            'john.smith@test.com', '123ABCde', full_name='John Smith', department=self.department1)
+        self.joan = User.objects.create_user(
+            'joan@test.com', '123ABCde', full_name='Joan Johnson', department=self.department2)
+        self.mary = User.objects.create_user(
+            'mary@test.com', '123ABCde', full_name='Mary Jones', department=self.department1)
+
+    def tearDown(self):
+
+        user_index.clear()
+
+
+class TrigramIndexTestCase(TrigramIndexFixtures, TestCase):
+
+    def test_prefix(self):
+        """Test one and two letter queries match the start of words"""
+        self.assertEquals(emails(user_index.search('m')), ['mary@test.com'])
+        self.assertEquals(set(emails(user_index.search('jo'))),
+                          {'john.smith@test.com', 'joan@test.com', 'mary@test.com'})
+
+    def test_ranking(self):
+        """Test names and emails starting with the query rank first"""
+        results = emails(user_index.search('john'))
+        self.assertEquals(results[0], 'john.smith@test.com')
+        self.assertIn('joan@test.com', results)
+
+    def test_substring_and_typo(self):
+        """Test matches inside words and with a wrong letter"""
+        self.assertEquals(emails(user_index.search('mith')), ['john.smith@test.com'])
+        self.assertEquals(emails(user_index.search('Johnsonn')), ['joan@test.com'])
+
+    def test_limit_and_department(self):
+        """Test the number of results and the department filter"""
+        self.assertEquals(len(user_index.search('test.com', limit=2)), 2)
+        self.assertEquals(set(emails(user_index.search('test.com', department_id=self.department1.pk))),
+                          {'john.smith@test.com', 'mary@test.com'})
+
+    def test_follows_bulk_updates(self):
+        """Test updates without signals refresh the users they touch"""
+        user_index.search('john')
+        update_users(User.objects.filter(pk=self.joan.pk), is_active=False)
+        self.assertEquals(emails(user_index.search('joan')), [])
+
+    @override_settings(USERS_SEARCH_INDEX_MAX_AGE=0)
+    def test_max_age(self):
+        """Test an old index is read again, with the writes of other processes"""
+        user_index.search('john')
+        User.objects.filter(pk=self.mary.pk).update(full_name='Mary Poppins')
+        self.assertEquals(emails(user_index.search('poppins')), ['mary@test.com'])
+
+
+class TrigramIndexSignalsTestCase(TrigramIndexFixtures, TransactionTestCase):
+
+    def test_follows_signals(self):
+        """Test saves and deletes keep the built index current"""
+        user_index.search('john')
+
+        User.objects.create_user('peter@test.com', '123ABCde', full_name='Peter Pan', department=self.department1)
+        self.assertEquals(emails(user_index.search('peter')), ['peter@test.com'])
+
+        self.mary.full_name = 'Mary Poppins'
+        self.mary.save()
+        self.assertEquals(emails(user_index.search('poppins')), ['mary@test.com'])
+        self.assertEquals(emails(user_index.search('jones')), [])
+
+        self.mary.is_active = False
+        self.mary.save(update_fields=['is_active'])
+        self.assertEquals(emails(user_index.search('mary')), [])
+
+        self.john.delete()
+        self.assertEquals(emails(user_index.search('smith')), [])
+
+    def test_rollback(self):
+        """Test a save that is rolled back never reaches the index"""
+        user_index.search('john')
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.mary.full_name = 'Mary Poppins'
+                self.mary.save()
+                raise RuntimeError
+        self.assertEquals(emails(user_index.search('poppins')), [])
+
+    def test_build_doesnt_block_updates(self):
+        """Test users saved while the index is read are kept, without waiting for the build"""
+        rows = user_index._rows
+
+        def rows_with_save():
+            for row in rows():
+                if row[0] == self.mary.pk:
+                    self.mary.full_name = 'Mary Poppins'
+                    saver = threading.Thread(target=self.mary.save)
+                    saver.start()
+                    saver.join(5)
+                    self.assertFalse(saver.is_alive())
+                yield row
+
+        with mock.patch.object(user_index, '_rows', rows_with_save):
+            user_index.build()
+        self.assertEquals(emails(user_index.search('poppins')), ['mary@test.com'])
+        self.assertEquals(emails(user_index.search('jones')), [])
+
+
+@override_settings(USERS_SEARCH_BACKEND='fts5')
+class FTS5SearchTestCase(TestCase):
+
+    def setUp(self):
+
+        self.department1 = Department.objects.create(department="Creation")
+        User.objects.create_user(
+            'john.smith@test.com', '123ABCde', full_name='John Smith', department=self.department1)
+        User.objects.create_user('joan@test.com', '123ABCde', full_name='Joan Johnson')
+
+    def test_search(self):
+        """Test the FTS5 table follows inserts and updates made without signals"""
+        self.assertEquals(emails(fts5_index.search('smith')), ['john.smith@test.com'])
+        self.assertEquals(emails(fts5_index.search('jo', department_id=self.department1.pk)),
+                          ['john.smith@test.com'])
+
+        User.objects.filter(email='joan@test.com').update(full_name='Joan Smithers')
+        self.assertEquals(set(emails(fts5_index.search('smith'))), {'john.smith@test.com', 'joan@test.com'})
+
+        User.objects.filter(email='joan@test.com').update(is_active=False)
+        self.assertEquals(emails(fts5_index.search('smith')), ['john.smith@test.com'])
+
+
+class UserSearchTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        user_index.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.department2 = Department.objects.create(department="Design")
+
+        self.user = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+        User.objects.create_user(
+            'user2@test.com', '123ABCde', full_name='User Numbertwo', department=self.department2)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+        user_index.clear()
+
+    def test_search_own_department(self):
+        """Test users only find the members of their department"""
+        response = self.client.get('/users/search/', {'q': 'user'})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.json(), [{
+            'id': self.user.pk, 'full_name': 'User Numberone',
+            'email': 'user1@test.com', 'department': self.department1.pk}])
+
+    def test_search_staff(self):
+        """Test staff members find every user"""
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/users/search/', {'q': 'user', 'limit': 1})
+        self.assertEquals(len(response.json()), 1)
+
+        response = self.client.get('/users/search/', {'q': 'numbertwo'})
+        self.assertEquals(emails(response.json()), ['user2@test.com'])
+
+    def test_search_validation(self):
+        """Test the query is required and the limit a positive number"""
+        self.assertEquals(self.client.get('/users/search/').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/users/search/', {'q': 'user', 'limit': 'all'})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_unauthenticated(self):
+        """Test the search needs a token"""
+        self.client.credentials()
+        response = self.client.get('/users/search/', {'q': 'user'})
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,203 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.api.throttling import CacheBackend, LocalBackend, local_backend, parse_rate
+from users.models import Department, User
+
+LOGIN_RATES = {'login_ip': '100/m', 'login_email': '3/m'}
+
+
+class SlidingWindowTestCase(SimpleTestCase):
+
+    def test_parse_rate(self):
+        """Test rates with and without a window multiplier"""
+        self.assertEquals(parse_rate('10/m'), (10, 60))
+        self.assertEquals(parse_rate('100/hour'), (100, 3600))
+        self.assertEquals(parse_rate('5/15m'), (5, 900))
+        with self.assertRaises(ValueError):
+            parse_rate('5 per minute')
+
+    def test_local_window(self):
+        """Test the previous window is weighted by the part still inside the sliding window"""
+        backend = LocalBackend()
+        for _ in range(4):
+            self.assertIsNone(backend.hit('key', 4, 60, now=0))
+        wait = backend.hit('key', 4, 60, now=30)
+        self.assertAlmostEqual(wait, 30)
+
+        # Half of the previous window counts, rejected hits don't
+        self.assertIsNone(backend.hit('key', 4, 60, now=90))
+        self.assertIsNone(backend.hit('key', 4, 60, now=90))
+        self.assertIsNotNone(backend.hit('key', 4, 60, now=90))
+
+        # Two windows later nothing counts
+        self.assertIsNone(backend.hit('key', 1, 60, now=200))
+
+    def test_local_keys_bounded(self):
+        """Test the least recently used keys are evicted"""
+        backend = LocalBackend()
+        with override_settings(USERS_THROTTLE_MAX_KEYS=2):
+            backend.hit('a', 1, 60, now=0)
+            backend.hit('b', 1, 60, now=0)
+            backend.hit('a', 1, 60, now=0)
+            backend.hit('c', 1, 60, now=0)
+
+            self.assertEquals(list(backend._entries), ['a', 'c'])
+            self.assertIsNone(backend.hit('b', 1, 60, now=0))
+
+    def test_cache_window(self):
+        """Test the shared backend counts the same way"""
+        cache = caches['default']
+        cache.clear()
+        backend = CacheBackend(cache)
+        for _ in range(4):
+            self.assertIsNone(backend.hit('key', 4, 60, now=0))
+        self.assertAlmostEqual(backend.hit('key', 4, 60, now=30), 30)
+        self.assertIsNone(backend.hit('key', 4, 60, now=90))
+        self.assertIsNone(backend.hit('key', 4, 60, now=90))
+        self.assertIsNotNone(backend.hit('key', 4, 60, now=90))
+        cache.clear()
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class LoginThrottleTestCase(APITestCase):
+
+    def setUp(self):
+
+        local_backend.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.user = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+
+    def tearDown(self):
+
+        local_backend.clear()
+
+    def log_in(self, username, password='123ABCdf'):
+        return self.client.post('/api-token-auth/', data={'username': username, 'password': password})
+
+    @override_settings(USERS_THROTTLE_RATES=LOGIN_RATES)
+    def test_email_limit(self):
+        """Test an email is locked out before its password is hashed again"""
+        for _ in range(3):
+            self.assertEquals(self.log_in('user1@test.com').status_code, status.HTTP_400_BAD_REQUEST)
+
+        with mock.patch('django.contrib.auth.hashers.PBKDF2PasswordHasher.encode') as encode:
+            response = self.log_in('User1@test.com ', '123ABCde')
+        self.assertEquals(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        encode.assert_not_called()
+
+        # Other emails are still let in
+        self.assertEquals(self.log_in('user2@test.com').status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(USERS_THROTTLE_RATES={'login_ip': '2/m'})
+    def test_ip_limit(self):
+        """Test one address can't try many emails"""
+        self.log_in('user2@test.com')
+        self.log_in('user3@test.com')
+        self.assertEquals(self.log_in('user4@test.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        response = self.client.post('/api-token-auth/', data={
+            'username': 'user1@test.com', 'password': '123ABCde'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(USERS_THROTTLE_RATES=LOGIN_RATES)
+    def test_body_not_an_object(self):
+        """Test a JSON body that isn't an object is refused, not counted by email"""
+        for path in ('/api-token-auth/', '/async/api-token-auth/'):
+            response = self.client.post(path, data='["user1@test.com"]', content_type='application/json')
+            self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('non_field_errors', response.json())
+
+    @override_settings(USERS_THROTTLE_RATES={})
+    def test_no_limits(self):
+        """Test scopes without a rate are not limited"""
+        for _ in range(5):
+            self.assertEquals(self.log_in('user1@test.com').status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(USERS_THROTTLE_RATES=LOGIN_RATES, USERS_THROTTLE_CACHE_ALIAS='default')
+    def test_shared_backend(self):
+        """Test the limits kept in a Django cache"""
+        caches['default'].clear()
+        for _ in range(3):
+            self.log_in('user1@test.com')
+        self.assertEquals(self.log_in('user1@test.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEquals(len(local_backend._entries), 0)
+        caches['default'].clear()
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000)
+class PasswordChangeThrottleTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        local_backend.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.user = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+    def tearDown(self):
+
+        token_cache.clear()
+        local_backend.clear()
+
+    @override_settings(USERS_THROTTLE_RATES={'password_change_user': '2/15m'})
+    def test_user_limit(self):
+        """Test the old password of a user can't be guessed over and over"""
+        url = '/users/%d/change_password/' % self.user.pk
+        data = {'old_password': '123ABCdf', 'new_password': '123ABCdg'}
+        for _ in range(2):
+            self.assertEquals(self.client.put(url, data=data).status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.put(url, data=data)
+        self.assertEquals(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_unauthenticated_not_counted(self):
+        """Test requests refused by the permissions don't use up the limit"""
+        self.client.credentials()
+        url = '/users/%d/change_password/' % self.user.pk
+        data = {'old_password': '123ABCdf', 'new_password': '123ABCdg'}
+        with override_settings(USERS_THROTTLE_RATES={'password_change_user': '1/m'}):
+            for _ in range(3):
+                self.assertEquals(self.client.put(url, data=data).status_code,
+                                  status.HTTP_401_UNAUTHORIZED)
+            self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+            self.assertEquals(self.client.put(url, data=data).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(USERS_THROTTLE_RATES=LOGIN_RATES)
+class AsyncLoginThrottleTestCase(TransactionTestCase):
+
+    def setUp(self):
+
+        local_backend.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+
+    def tearDown(self):
+
+        local_backend.clear()
+
+    def test_email_limit(self):
+        """Test the async login applies the same limits"""
+        data = {'username': 'user1@test.com', 'password': '123ABCdf'}
+        for _ in range(3):
+            response = self.client.post('/async/api-token-auth/', data=data)
+            self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with mock.patch('users.api.async_views.check_password_async') as check:
+            response = self.client.post('/async/api-token-auth/', data=data)
+        self.assertEquals(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        check.assert_not_called()
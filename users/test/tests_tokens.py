@@ -0,0 +1,139 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.api.throttling import local_backend
+from users.models import AuthToken, Department, User
+from users.tokens import issue_token, sweep_expired_tokens
+
+
+@override_settings(USERS_PBKDF2_ITERATIONS=1000, USERS_TOKEN_TTL=3600)
+class ExpiringTokenTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        local_backend.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.user = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def get_profile(self, key):
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + key)
+        return self.client.get('/users/%d/profile/' % self.user.pk)
+
+    def test_log_in_issues_expiring_token(self):
+        """Test the login issues a token that authenticates the user"""
+        response = self.client.post('/api-token-auth/', data={
+            'username': 'user1@test.com', 'password': '123ABCde'})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+        token = AuthToken.objects.get(key=response.data['token'])
+        self.assertEquals(token.user, self.user)
+        self.assertAlmostEqual(token.expires_at, timezone.now() + timedelta(hours=1),
+                               delta=timedelta(minutes=1))
+        self.assertEquals(self.get_profile(token.key).status_code, status.HTTP_200_OK)
+
+    def test_expired_token(self):
+        """Test an expired token is rejected, even once cached"""
+        token = issue_token(self.user)
+        self.assertEquals(self.get_profile(token.key).status_code, status.HTTP_200_OK)
+
+        AuthToken.objects.filter(pk=token.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        token_cache.get(token.key)[1].expires_at = timezone.now() - timedelta(seconds=1)
+
+        response = self.get_profile(token.key)
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEquals(response.data['detail'], 'Token has expired.')
+
+    def test_sliding_expiry(self):
+        """Test the expiry is only pushed back once half of it is used up"""
+        token = issue_token(self.user)
+        expires_at = token.expires_at
+        self.get_profile(token.key)
+        token.refresh_from_db()
+        self.assertEquals(token.expires_at, expires_at)
+
+        token_cache.clear()
+        AuthToken.objects.filter(pk=token.pk).update(expires_at=timezone.now() + timedelta(minutes=10))
+        self.assertEquals(self.get_profile(token.key).status_code, status.HTTP_200_OK)
+        token.refresh_from_db()
+        self.assertGreater(token.expires_at, timezone.now() + timedelta(minutes=50))
+
+    def test_legacy_token(self):
+        """Test tokens issued before tokens expired keep working"""
+        token = Token.objects.create(user=self.user)
+        self.assertEquals(self.get_profile(token.key).status_code, status.HTTP_200_OK)
+
+    def test_change_password_rotates_tokens(self):
+        """Test a password change revokes every token and returns a new one"""
+        legacy = Token.objects.create(user=self.user)
+        token = issue_token(self.user)
+        self.get_profile(token.key)
+
+        response = self.client.put('/users/%d/change_password/' % self.user.pk, data={
+            'old_password': '123ABCde', 'new_password': '123ABCaa'})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+        self.assertFalse(Token.objects.filter(pk=legacy.pk).exists())
+        self.assertEquals(list(AuthToken.objects.filter(user=self.user).values_list('key', flat=True)),
+                          [response.data['token']])
+        self.assertEquals(self.get_profile(token.key).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEquals(self.get_profile(response.data['token']).status_code, status.HTTP_200_OK)
+
+    def test_change_other_password_revokes_tokens(self):
+        """Test changing another user's password revokes his tokens without handing one out"""
+        admin = User.objects.create_user(
+            'admin@test.com', '123ABCde', full_name='Admin User', department=self.department1, is_staff=True)
+        admin_token = issue_token(admin)
+        token = issue_token(self.user)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + admin_token.key)
+        response = self.client.put('/users/%d/change_password/' % self.user.pk, data={
+            'old_password': '123ABCde', 'new_password': '123ABCaa'})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('token', response.data)
+
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+        self.assertEquals(self.get_profile(token.key).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEquals(self.get_profile(admin_token.key).status_code, status.HTTP_200_OK)
+
+    def test_sweep(self):
+        """Test only the expired tokens are deleted, in batches"""
+        expired = [issue_token(self.user) for _ in range(5)]
+        AuthToken.objects.filter(pk__in=[token.pk for token in expired]).update(
+            expires_at=timezone.now() - timedelta(seconds=1))
+        valid = issue_token(self.user)
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEquals(sweep_expired_tokens(batch_size=2), 5)
+        deletes = [query for query in captured if query['sql'].startswith('DELETE')]
+        self.assertEquals(len(deletes), 3)
+        self.assertEquals(list(AuthToken.objects.values_list('key', flat=True)), [valid.key])
+
+    def test_sweep_command(self):
+        """Test the sweep command and its dry run"""
+        token = issue_token(self.user)
+        AuthToken.objects.filter(pk=token.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        out = StringIO()
+        call_command('sweep_tokens', '--dry-run', stdout=out)
+        self.assertIn('1 tokens would be deleted.', out.getvalue())
+        self.assertTrue(AuthToken.objects.exists())
+
+        out = StringIO()
+        call_command('sweep_tokens', stdout=out)
+        self.assertIn('Deleted 1 expired tokens.', out.getvalue())
+        self.assertFalse(AuthToken.objects.exists())
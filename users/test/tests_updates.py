@@ -0,0 +1,135 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from users.api.authentication import token_cache
+from users.api.viewsets import UserUpdateProfile
+from users.models import Department, User
+
+
+class PartialUpdateTestCase(APITestCase):
+
+    def setUp(self):
+
+        token_cache.clear()
+        self.department1 = Department.objects.create(department="Creation")
+        self.department2 = Department.objects.create(department="Design")
+
+        self.admin = User.objects.create_user(
+            'admin@test.com', '123ABCde', full_name='Admin User',
+            department=self.department1, is_staff=True)
+        self.token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + str(self.token))
+
+        self.user = User.objects.create_user(
+            'user1@test.com', '123ABCde', full_name='User Numberone', department=self.department1)
+        self.url = '/users/%d/update/' % self.user.pk
+
+    def tearDown(self):
+
+        token_cache.clear()
+
+    def updates(self, queries):
+        return [query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith('UPDATE "users_user"')]
+
+    def test_patch_writes_changed_column(self):
+        """Test a PATCH only writes the field it changes, and the version"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, data={'full_name': 'User Renamed'})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.data['full_name'], 'User Renamed')
+        self.assertEquals(response.data['email'], 'user1@test.com')
+        self.assertEquals(response['ETag'], '"2"')
+
+        updates = self.updates(queries)
+        self.assertEquals(len(updates), 1)
+        self.assertIn('"full_name"', updates[0])
+        self.assertIn('"version"', updates[0])
+        self.assertNotIn('"password"', updates[0])
+        self.assertNotIn('"email"', updates[0])
+
+        self.user.refresh_from_db()
+        self.assertEquals(self.user.full_name, 'User Renamed')
+        self.assertEquals(self.user.version, 2)
+
+    def test_unchanged_update_skips_write(self):
+        """Test sending the current values doesn't write anything"""
+        data = {'full_name': 'User Numberone', 'email': 'user1@test.com', 'department': self.department1.pk}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(self.url, data=data)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(self.updates(queries), [])
+        self.assertEquals(response['ETag'], '"1"')
+
+    def test_patch_department_moves_member(self):
+        """Test a PATCH of the department keeps the member counts right"""
+        response = self.client.patch(self.url, data={'department': self.department2.pk})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.data['department'], self.department2.pk)
+
+        self.department1.refresh_from_db()
+        self.department2.refresh_from_db()
+        self.assertEquals(self.department1.member_count, 1)
+        self.assertEquals(self.department2.member_count, 1)
+
+    def test_patch_invalidates_cached_token(self):
+        """Test the update still drops the cached credentials of the user"""
+        token = Token.objects.create(user=self.user)
+        token_cache.set(token.key, self.user, token)
+
+        self.client.patch(self.url, data={'email': 'user1_renamed@test.com'})
+        self.assertIsNone(token_cache.get(token.key))
+
+    def test_if_match(self):
+        """Test an update with a stale ETag is refused"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, data={'full_name': 'User First'}, HTTP_IF_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.patch(self.url, data={'full_name': 'User Second'}, HTTP_IF_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.user.refresh_from_db()
+        self.assertEquals(self.user.full_name, 'User First')
+
+    def test_saves_change_etag(self):
+        """Test changes made outside the update endpoint invalidate the ETag too"""
+        etag = self.client.get(self.url)['ETag']
+        self.user.set_password('123ABCaa')
+        self.user.save()
+        response = self.client.patch(self.url, data={'full_name': 'User First'}, HTTP_IF_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+        etag = self.client.get(self.url)['ETag']
+        self.user.full_name = 'User Admin'
+        self.user.save(update_fields=['full_name'])
+        self.assertEquals(self.user.version, int(etag.strip('"')) + 1)
+        response = self.client.patch(self.url, data={'full_name': 'User First'}, HTTP_IF_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_concurrent_update(self):
+        """Test an update racing with another one doesn't overwrite it"""
+        get_object = UserUpdateProfile.get_object
+
+        def get_object_then_race(view):
+            instance = get_object(view)
+            User.objects.filter(pk=instance.pk).update(full_name='User Other', version=F('version') + 1)
+            return instance
+
+        with mock.patch.object(UserUpdateProfile, 'get_object', get_object_then_race):
+            response = self.client.patch(self.url, data={'full_name': 'User Mine'})
+        self.assertEquals(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.user.refresh_from_db()
+        self.assertEquals(self.user.full_name, 'User Other')
+
+    def test_patch_validates(self):
+        """Test the fields sent with a PATCH are still validated"""
+        User.objects.create_user(
+            'user2@test.com', '123ABCde', full_name='User Numbertwo', department=self.department1)
+        response = self.client.patch(self.url, data={'email': 'user2@test.com'})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', response.data)
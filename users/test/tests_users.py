@@ -4,12 +4,14 @@ from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import (APIRequestFactory, APITestCase,
                                  force_authenticate)
+from users.api.throttling import local_backend
 from users.models import Department, User
 
 class AuthenticatedUsersTestCase(APITestCase):
 
     def setUp(self):
 
+        local_backend.clear()
         email = 'user1@test.com'
         password = '123ABCde'
         extra_fields = {"full_name": 'User Numberone'}
@@ -123,6 +125,7 @@ class UnauthenticatedUsersTestCase(APITestCase):
 
     def setUp(self):
 
+        local_backend.clear()
         self.department1 = Department.objects.create(department="Creation")
 
         email = 'user2@test.com'
@@ -0,0 +1,58 @@
+from django.test import SimpleTestCase
+from users.api.serializers import UserSerializer
+from users.api.validators import (email_validator, full_name_validator,
+                                  password_validator, validate_columns)
+from users.benchmarks import validators
+
+
+class ValidatorsTestCase(SimpleTestCase):
+
+    def test_full_name_validator(self):
+        """Test names made of letters and spaces are accepted"""
+        names = ['Ana', 'User Numberone', 'José da Silva', 'R2D2', 'User_One', '', ' ']
+        expected = [True, True, True, False, False, False, False]
+
+        self.assertEquals([full_name_validator(name) for name in names], expected)
+        self.assertEquals(full_name_validator.validate_many(names), expected)
+
+    def test_password_validator(self):
+        """Test the password rules, single and batch, match the original pattern"""
+        passwords = ['123ABCde', 'Abcdefg1', 'abcdefg1', 'ABCDEFG1', 'Abcdefgh',
+                     'Ab1', 'Abcdefghijklmno12', 'Abcdefghijklmn12', 'Abcdef1\n']
+        expected = [True, True, False, False, False, False, False, True, False]
+
+        self.assertEquals([password_validator(password) for password in passwords], expected)
+        self.assertEquals(password_validator.validate_many(passwords), expected)
+
+    def test_email_validator(self):
+        """Test addresses must be valid and fit in the email column"""
+        emails = ['one@test.com', 'not-an-email', '', 'x' * 60 + '@test.com']
+
+        self.assertEquals(email_validator.validate_many(emails), [True, False, False, False])
+
+    def test_validate_columns(self):
+        """Test only the columns given are validated"""
+        results = validate_columns(full_names=['Ana', 'R2D2'], passwords=['123ABCde'])
+
+        self.assertEquals(results, {'full_name': [True, False], 'password': [True]})
+
+    def test_validate_batch(self):
+        """Test each row reports the same error UserSerializer.validate raises"""
+        rows = [
+            {'full_name': 'User One', 'password': '123ABCde', 'department': None},
+            {'full_name': 'User One', 'password': '123ABCde'},
+            {'full_name': 'User 1', 'password': 'weak', 'department': None},
+            {'full_name': 'User One', 'password': 'weak', 'department': None},
+        ]
+
+        errors = UserSerializer.validate_batch(rows)
+        self.assertIsNone(errors[0])
+        self.assertEquals([list(error) for error in errors[1:]], [['department'], ['full_name'], ['password']])
+
+    def test_benchmark(self):
+        """Test the micro-benchmark measures every validator"""
+        results = validators.run(rows=50, seconds=0)
+
+        self.assertEquals(len(results), len(list(validators.implementations())))
+        for result in results:
+            self.assertGreater(result['ns_per_value'], 0)
@@ -0,0 +1,117 @@
+"""Expiring API tokens.
+
+A token issued at login lives for USERS_TOKEN_TTL seconds after its last
+use. To keep authentication read-only most of the time, expires_at is only
+pushed back once less than half of the TTL is left, so a token in steady
+use costs one UPDATE per half TTL.
+
+Changing a password revokes every token of the user, and issues a new one
+when the user changed his own password.
+Expired tokens are deleted by sweep_expired_tokens, see the
+sweep_tokens command. Tokens of rest_framework.authtoken, issued before
+tokens expired, keep working until they are revoked.
+"""
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from users.models import AuthToken
+
+
+def token_ttl():
+    return timedelta(seconds=getattr(settings, 'USERS_TOKEN_TTL', 1209600))
+
+
+def generate_key():
+    return secrets.token_hex(AuthToken.KEY_LENGTH // 2)
+
+
+def issue_token(user):
+    """Creates a new token for the user.
+
+    Returns:
+        AuthToken: The token, valid for USERS_TOKEN_TTL seconds
+    """
+    return AuthToken.objects.create(
+        key=generate_key(), user=user, expires_at=timezone.now() + token_ttl())
+
+
+def is_expired(token, now=None):
+    """Legacy tokens never expire."""
+    if not isinstance(token, AuthToken):
+        return False
+    return token.expires_at <= (now or timezone.now())
+
+
+def needs_extension(token, now=None):
+    if not isinstance(token, AuthToken):
+        return False
+    return token.expires_at - (now or timezone.now()) < token_ttl() / 2
+
+
+def extend_token(token, now=None):
+    """Pushes the expiry of a token in use back to a full TTL.
+
+    Returns:
+        bool: Whether the token was updated
+    """
+    now = now or timezone.now()
+    if not needs_extension(token, now):
+        return False
+    token.expires_at = now + token_ttl()
+    AuthToken.objects.filter(pk=token.pk).update(expires_at=token.expires_at)
+    return True
+
+
+def revoke_tokens(user):
+    """Deletes every token of the user, legacy ones included."""
+    with transaction.atomic():
+        AuthToken.objects.filter(user=user).delete()
+        Token.objects.filter(user=user).delete()
+
+
+def rotate_tokens(user):
+    """Revokes every token of the user and issues a new one.
+
+    Returns:
+        AuthToken: The new token
+    """
+    with transaction.atomic():
+        revoke_tokens(user)
+        return issue_token(user)
+
+
+def expired_tokens(now=None):
+    return AuthToken.objects.filter(expires_at__lte=now or timezone.now())
+
+
+def sweep_expired_tokens(batch_size=None):
+    """Deletes the expired tokens, one short transaction per batch.
+
+    Batches are read off the expires_at index, so each one only locks the
+    rows it deletes.
+
+    Args:
+        batch_size (int): Tokens deleted per transaction
+
+    Returns:
+        int: Number of tokens deleted
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'USERS_TOKEN_SWEEP_BATCH_SIZE', 1000)
+    batch_size = max(1, int(batch_size))
+    tokens = expired_tokens()
+
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            keys = list(tokens.order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+            if not keys:
+                break
+            AuthToken.objects.filter(pk__in=keys).delete()
+        deleted += len(keys)
+    return deleted